@@ -13,7 +13,13 @@ from ajishio.view import *
 from ajishio.level_loader import *
 from ajishio.sprite_loader import *
 from ajishio.sound_loader import *
+from ajishio.audio import *
 from ajishio.game_object import *
+from ajishio.collision import *
+from ajishio.timers import *
+from ajishio.behaviours import *
+from ajishio.particles import *
+from ajishio.pathfinding import *
 from ajishio.utils import *
 
 
@@ -0,0 +1,226 @@
+from __future__ import annotations
+import pygame as pg
+from dataclasses import dataclass
+from ajishio.game_sound import GameSound, GameMusic
+
+
+@dataclass
+class _Voice:
+    sound: GameSound
+    channel: pg.mixer.Channel
+    priority: int
+    gain: float
+    started: int
+
+
+class AudioManager:
+    _instance: AudioManager | None = None
+
+    def __new__(cls) -> AudioManager:
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        self.num_channels: int = 32
+        self.master_gain: float = 1
+
+        self._channels: list[pg.mixer.Channel] = []
+        self._end_events: dict[int, int] = {}  # end event type -> channel index
+        self._voices: dict[int, _Voice] = {}  # channel index -> voice playing on it
+        self._free_channels: list[int] = []
+        self._playing: dict[GameSound, list[int]] = {}  # sound -> channel indices, oldest first
+        self._group_gains: dict[str, float] = {}
+        self._play_count: int = 0
+
+        self._music: GameMusic | None = None
+        self._music_gain: float = 1
+        self._music_queued: tuple[GameMusic, bool, float, int] | None = None
+        self._music_end_event: int | None = None
+
+    def _init_channels(self) -> None:
+        pg.mixer.set_num_channels(self.num_channels)
+        for i in range(self.num_channels):
+            channel = pg.mixer.Channel(i)
+            end_event = pg.event.custom_type()
+            channel.set_endevent(end_event)
+            self._channels.append(channel)
+            self._end_events[end_event] = i
+        # Pop from the end so that the lowest channels get used first
+        self._free_channels = list(reversed(range(self.num_channels)))
+
+        self._music_end_event = pg.event.custom_type()
+        pg.mixer.music.set_endevent(self._music_end_event)
+
+    def audio_play_sound(
+        self,
+        index: GameSound,
+        loop: bool = False,
+        gain: float = 1,
+        priority: int | None = None,
+        fade_ms: int = 0,
+    ) -> None:
+        if not self._channels:
+            self._init_channels()
+
+        if isinstance(index, GameMusic):
+            self._play_music(index, loop, gain, fade_ms)
+            return
+        assert index.sound is not None
+
+        if priority is None:
+            priority = index.priority
+
+        # Rapid-fire effects recycle their own oldest voice once they hit their limit
+        voices = self._playing.get(index)
+        if index.max_voices is not None and voices and len(voices) >= index.max_voices:
+            channel_index = voices[0]
+            self._release(channel_index, reuse=True)
+        elif self._free_channels:
+            channel_index = self._free_channels.pop()
+        else:
+            stolen = self._find_voice_to_steal(priority)
+            if stolen is None:
+                return
+            channel_index = stolen
+            self._release(channel_index, reuse=True)
+
+        channel = self._channels[channel_index]
+        self._play_count += 1
+        voice = _Voice(index, channel, priority, gain, self._play_count)
+        self._voices[channel_index] = voice
+        self._playing.setdefault(index, []).append(channel_index)
+
+        channel.set_volume(self._voice_volume(voice))
+        channel.play(index.sound, -1 if loop else 0, fade_ms=fade_ms)
+
+    def audio_is_playing(self, index: GameSound) -> bool:
+        if isinstance(index, GameMusic):
+            return index is self._music
+        return index in self._playing
+
+    def audio_stop_sound(self, index: GameSound, fade_ms: int = 0) -> None:
+        if isinstance(index, GameMusic):
+            if index is self._music:
+                self._stop_music(fade_ms)
+            return
+        for channel_index in self._playing.get(index, []).copy():
+            self._release(channel_index)
+
+    def audio_stop_all(self) -> None:
+        for channel_index in list(self._voices):
+            self._release(channel_index)
+        if self._music is not None:
+            self._stop_music()
+
+    def audio_group_set_gain(self, group: str, gain: float) -> None:
+        self._group_gains[group] = gain
+        self._update_volumes()
+
+    def audio_group_get_gain(self, group: str) -> float:
+        return self._group_gains.get(group, 1)
+
+    def audio_master_gain(self, gain: float) -> None:
+        self.master_gain = gain
+        self._update_volumes()
+
+    def _play_music(self, music: GameMusic, loop: bool, gain: float, fade_ms: int) -> None:
+        # There is only one music stream, so cross-fading means fading the current track out and
+        # starting the next one from the end event once it has gone quiet
+        if self._music is not None and fade_ms > 0:
+            self._music_queued = (music, loop, gain, fade_ms)
+            pg.mixer.music.fadeout(fade_ms)
+            return
+
+        self._music_queued = None
+        self._music = music
+        self._music_gain = gain
+        pg.mixer.music.load(str(music.path))
+        pg.mixer.music.set_volume(self._music_volume())
+        pg.mixer.music.play(-1 if loop else 0, fade_ms=fade_ms)
+
+    def _stop_music(self, fade_ms: int = 0) -> None:
+        self._music_queued = None
+        if fade_ms > 0:
+            pg.mixer.music.fadeout(fade_ms)
+        else:
+            self._music = None
+            pg.mixer.music.stop()
+
+    def _music_volume(self) -> float:
+        if self._music is None:
+            return 0
+        return self._music_gain * self.audio_group_get_gain(self._music.group) * self.master_gain
+
+    def _find_voice_to_steal(self, priority: int) -> int | None:
+        # Steal the oldest of the least important voices, but never one more important than us
+        candidate: _Voice | None = None
+        candidate_index: int | None = None
+        for channel_index, voice in self._voices.items():
+            if voice.priority > priority:
+                continue
+            if candidate is None or (voice.priority, voice.started) < (
+                candidate.priority,
+                candidate.started,
+            ):
+                candidate = voice
+                candidate_index = channel_index
+        return candidate_index
+
+    def _voice_volume(self, voice: _Voice) -> float:
+        return voice.gain * self.audio_group_get_gain(voice.sound.group) * self.master_gain
+
+    def _update_volumes(self) -> None:
+        for voice in self._voices.values():
+            voice.channel.set_volume(self._voice_volume(voice))
+        if self._music is not None:
+            pg.mixer.music.set_volume(self._music_volume())
+
+    def _release(self, channel_index: int, reuse: bool = False) -> None:
+        voice: _Voice | None = self._voices.pop(channel_index, None)
+        if voice is None:
+            return
+
+        voices = self._playing[voice.sound]
+        voices.remove(channel_index)
+        if not voices:
+            del self._playing[voice.sound]
+
+        if voice.channel.get_busy():
+            voice.channel.stop()
+        if not reuse:
+            self._free_channels.append(channel_index)
+
+    def _process_events(self, events: list[pg.event.Event]) -> None:
+        for event in events:
+            if event.type == self._music_end_event:
+                self._on_music_end()
+                continue
+
+            channel_index: int | None = self._end_events.get(event.type)
+            if channel_index is None:
+                continue
+            # Stopping or stealing a channel also posts its end event, by which time the channel
+            # may already be busy with its next sound, so only free channels that are really idle
+            if not self._channels[channel_index].get_busy():
+                self._release(channel_index)
+
+    def _on_music_end(self) -> None:
+        if pg.mixer.music.get_busy():
+            return
+        self._music = None
+        if self._music_queued is not None:
+            music, loop, gain, fade_ms = self._music_queued
+            self._play_music(music, loop, gain, fade_ms)
+
+
+_audio: AudioManager = AudioManager()
+
+# These do not need to be evaluated at runtime, since they are references to methods, so they go here
+audio_play_sound = _audio.audio_play_sound
+audio_is_playing = _audio.audio_is_playing
+audio_stop_sound = _audio.audio_stop_sound
+audio_stop_all = _audio.audio_stop_all
+audio_group_set_gain = _audio.audio_group_set_gain
+audio_group_get_gain = _audio.audio_group_get_gain
+audio_master_gain = _audio.audio_master_gain
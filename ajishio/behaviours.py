@@ -0,0 +1,209 @@
+from __future__ import annotations
+from functools import partial
+from typing import Callable, Coroutine, Generator, Iterator, Union
+from ajishio.timers import Timer, _timers
+
+# Import classes only for type hinting, must avoid circular imports
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ajishio.game_object import GameObject
+
+
+class Wait:
+    """Yield or await to sleep for `seconds` of game time."""
+
+    def __init__(self, seconds: float) -> None:
+        self.seconds: float = seconds
+
+    def __await__(self) -> Iterator[Wait]:
+        yield self
+
+
+class WaitUntil:
+    """Yield or await to sleep until `predicate` returns true, checked once per frame."""
+
+    def __init__(self, predicate: Callable[[], bool]) -> None:
+        self.predicate: Callable[[], bool] = predicate
+
+    def __await__(self) -> Iterator[WaitUntil]:
+        yield self
+
+
+class NextFrame:
+    """Yield or await to sleep until the next frame. Yielding None does the same."""
+
+    def __await__(self) -> Iterator[NextFrame]:
+        yield self
+
+
+Wake = Union[Wait, WaitUntil, NextFrame, None]
+BehaviourFunction = Union[Generator[Wake, None, object], Coroutine[Wake, None, object]]
+
+
+class Behaviour:
+    """A generator or `async def` coroutine being run by the engine. Stop it early with `stop`."""
+
+    def __init__(self, function: BehaviourFunction, owner: GameObject | None) -> None:
+        self.function: BehaviourFunction = function
+        self.owner: GameObject | None = owner
+        self.done: bool = False
+        self._running: bool = False
+        self._suspended: bool = False
+        self._timer: Timer | None = None
+
+        # Set aside while suspended, with what it's waiting on, None for the next frame
+        self._parked: bool = False
+        self._parked_predicate: Callable[[], bool] | None = None
+
+    def stop(self) -> None:
+        _behaviours.stop(self)
+
+
+class Behaviours:
+    _instance: Behaviours | None = None
+
+    def __new__(cls) -> Behaviours:
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        # Behaviours sleeping for a while wait on the timer heap, so they're only touched once
+        # they're due. Only those waiting for the next frame or for a condition are seen every frame
+        self._next_frame: list[Behaviour] = []
+        self._waiting_until: list[tuple[Behaviour, Callable[[], bool]]] = []
+
+    def start(self, function: BehaviourFunction, owner: GameObject | None = None) -> Behaviour:
+        """Run `function` up to its first `yield` or `await`, then resume it whenever what it's
+        waiting for happens. If `owner` is given, it's stopped when the owner is destroyed."""
+        behaviour = Behaviour(function, owner)
+        if owner is not None:
+            owner._behaviours[:] = [b for b in owner._behaviours if not b.done]
+            owner._behaviours.append(behaviour)
+        self._resume(behaviour)
+        return behaviour
+
+    def stop(self, behaviour: Behaviour) -> None:
+        if behaviour.done:
+            return
+        behaviour.done = True
+        if behaviour._timer is not None:
+            behaviour._timer.cancel()
+
+        # A behaviour stopping itself can't be closed until it next waits
+        if not behaviour._running:
+            behaviour.function.close()
+
+    def stop_owned(self, owner: GameObject) -> None:
+        """Stop every behaviour belonging to `owner`."""
+        for behaviour in owner._behaviours:
+            self.stop(behaviour)
+        owner._behaviours.clear()
+
+    def suspend_owned(self, owner: GameObject) -> None:
+        """Pause every behaviour belonging to `owner` until `resume_owned`. Sleeping behaviours are
+        paused along with the owner's timers."""
+        for behaviour in owner._behaviours:
+            behaviour._suspended = True
+
+    def resume_owned(self, owner: GameObject) -> None:
+        for behaviour in owner._behaviours:
+            behaviour._suspended = False
+            if not behaviour._parked:
+                continue
+            behaviour._parked = False
+            predicate: Callable[[], bool] | None = behaviour._parked_predicate
+            behaviour._parked_predicate = None
+            if behaviour.done:
+                continue
+            if predicate is None:
+                self._next_frame.append(behaviour)
+            else:
+                self._waiting_until.append((behaviour, predicate))
+
+    def advance(self, destroyed: set[GameObject]) -> None:
+        """Resume the behaviours waiting for this frame and those whose condition has come true.
+        Behaviours belonging to objects in `destroyed` are left waiting to be stopped."""
+        if self._next_frame:
+            next_frame: list[Behaviour] = self._next_frame
+            self._next_frame = []
+            for behaviour in next_frame:
+                if behaviour.done:
+                    continue
+                if behaviour._suspended:
+                    self._park(behaviour, None)
+                elif behaviour.owner in destroyed:
+                    self._next_frame.append(behaviour)
+                else:
+                    self._resume(behaviour)
+
+        if self._waiting_until:
+            waiting_until: list[tuple[Behaviour, Callable[[], bool]]] = self._waiting_until
+            self._waiting_until = []
+            for behaviour, predicate in waiting_until:
+                if behaviour.done:
+                    continue
+                if behaviour._suspended:
+                    self._park(behaviour, predicate)
+                elif behaviour.owner in destroyed or not predicate():
+                    self._waiting_until.append((behaviour, predicate))
+                else:
+                    self._resume(behaviour)
+
+    @staticmethod
+    def _park(behaviour: Behaviour, predicate: Callable[[], bool] | None) -> None:
+        # Parked behaviours are only kept by their owner, so they're let go along with it
+        behaviour._parked = True
+        behaviour._parked_predicate = predicate
+
+    def _resume(self, behaviour: Behaviour) -> None:
+        behaviour._timer = None
+        behaviour._running = True
+        try:
+            wake: Wake = behaviour.function.send(None)
+        except StopIteration:
+            behaviour.done = True
+            return
+        except BaseException:
+            behaviour.done = True
+            raise
+        finally:
+            behaviour._running = False
+
+        if behaviour.done:
+            behaviour.function.close()
+            return
+
+        if wake is None or isinstance(wake, NextFrame):
+            self._next_frame.append(behaviour)
+        elif isinstance(wake, Wait):
+            behaviour._timer = _timers.schedule(
+                wake.seconds, partial(self._resume, behaviour), behaviour.owner
+            )
+        elif isinstance(wake, WaitUntil):
+            self._waiting_until.append((behaviour, wake.predicate))
+        else:
+            self.stop(behaviour)
+            raise TypeError(
+                f"Behaviours can only wait on wait, wait_until or next_frame, not {wake!r}"
+            )
+
+
+def wait(seconds: float) -> Wait:
+    return Wait(seconds)
+
+
+def wait_until(predicate: Callable[[], bool]) -> WaitUntil:
+    return WaitUntil(predicate)
+
+
+def next_frame() -> NextFrame:
+    return NextFrame()
+
+
+_behaviours: Behaviours = Behaviours()
+
+# These do not need to be evaluated at runtime, since they are references to methods, so they go
+# here
+behaviour_start = _behaviours.start
@@ -0,0 +1,427 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from math import hypot, inf
+from operator import itemgetter
+from typing import Callable, Iterable, Iterator
+from uuid import UUID
+
+# Import classes only for type hinting, must avoid circular imports
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ajishio.game_object import GameObject
+
+CollisionHandler = Callable[["GameObject", "GameObject"], None]
+
+# Every collision mask is on one layer, given as a single bit, and collides with the layers set in
+# its `collides_with` bits
+layer_default: int = 1
+layer_all: int = (1 << 32) - 1
+
+# A collidable object's bounding box, which pairs it can be part of and its layers: left, right,
+# top, bottom, bits of the pairs it can be first in, bits of the pairs it can be second in, layer,
+# layers it collides with, then the object
+_Box = tuple[float, float, float, float, int, int, int, int, "GameObject"]
+
+
+@dataclass
+class _CollisionPair:
+    first: type[GameObject]
+    second: type[GameObject]
+    handler: CollisionHandler | None
+
+
+@dataclass
+class RaycastHit:
+    obj: GameObject
+    x: float
+    y: float
+    distance: float
+
+
+def _segment_enters_box(
+    x: float, y: float, dx: float, dy: float, left: float, top: float, right: float, bottom: float
+) -> float | None:
+    """How far along the segment from (x, y) to (x + dx, y + dy) it first enters the box, from 0
+    to 1, or None if it misses. Like `place_meeting`, only touching the box's edge isn't a hit."""
+    t_enter: float = 0
+    t_exit: float = 1
+    for start, delta, low, high in ((x, dx, left, right), (y, dy, top, bottom)):
+        if delta == 0:
+            if not low < start < high:
+                return None
+            continue
+        t_low: float = (low - start) / delta
+        t_high: float = (high - start) / delta
+        if t_low > t_high:
+            t_low, t_high = t_high, t_low
+        t_enter = max(t_enter, t_low)
+        t_exit = min(t_exit, t_high)
+        if t_enter >= t_exit:
+            return None
+    return t_enter
+
+
+class Collisions:
+    """Finds every overlapping pair of objects once per frame, rather than each object asking about
+    the classes it cares about with `place_meeting`. Only pairs of classes registered with
+    `collision_pair` are reported, and nothing is checked until at least one is registered.
+
+    Also keeps the objects in the room indexed by collision layer for `place_meeting`. Objects on
+    static layers are indexed by position too, so queries and the collision pass only look at the
+    ones nearby, and static objects are never tested against each other."""
+
+    _instance: Collisions | None = None
+
+    # Static layers are indexed in a grid of square cells this many pixels across
+    static_cell_size: int = 64
+
+    def __new__(cls) -> Collisions:
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        self._pairs: list[_CollisionPair] = []
+
+        # For each class of object, bits set for the pairs it can be first in and second in
+        self._class_bits: dict[type[GameObject], tuple[int, int]] = {}
+
+        self._objects: dict[UUID, GameObject] = {}
+        self._static_layers: int = 0
+
+        # Objects with a mask are grouped by layer, and for static layers by the grid cells they
+        # overlap too. Each layer is rebuilt only once objects on it are added, removed or given a
+        # new mask, so spawning on one layer doesn't grid the static ones again
+        self._dirty_layers: int = layer_all
+        self._layer_objects: dict[int, list[GameObject]] = {}
+        self._layer_cells: dict[int, dict[tuple[int, int], list[GameObject]]] = {}
+
+    def set_objects(self, objects: dict[UUID, GameObject]) -> None:
+        self._objects = objects
+        self._dirty_layers = layer_all
+
+    def invalidate(self, layers: int = layer_all) -> None:
+        """Index the objects on `layers` again before they're next looked up. Needed after changing
+        the `layer` of a mask which is already in use."""
+        self._dirty_layers |= layers
+
+    def invalidate_objects(self, objects: Iterable[GameObject]) -> None:
+        """Index the layers of `objects` again, after they're added to or removed from the room."""
+        for obj in objects:
+            mask = obj.collision_mask
+            if mask is not None:
+                self._dirty_layers |= mask.layer
+
+    def collision_pair(
+        self,
+        first: type[GameObject],
+        second: type[GameObject],
+        handler: CollisionHandler | None = None,
+    ) -> None:
+        """Report overlaps between instances of `first` and `second` once per frame, after every
+        object has stepped. `handler` is called with the `first` instance then the `second` if it's
+        given, otherwise each instance's `on_collision` is called with the other. Objects are only
+        reported if each one's layer is in the other's `collides_with`."""
+        self._pairs.append(_CollisionPair(first, second, handler))
+        self._class_bits.clear()
+
+    def collision_pair_remove(self, first: type[GameObject], second: type[GameObject]) -> None:
+        self._pairs = [pair for pair in self._pairs if (pair.first, pair.second) != (first, second)]
+        self._class_bits.clear()
+
+    def collision_layer_set_static(self, layer: int, static: bool = True) -> None:
+        """Index objects on `layer` by position when they're added to the room. They mustn't move
+        or change size afterwards, but finding the ones near a point no longer means looking at
+        every one of them."""
+        self._static_layers = (
+            self._static_layers | layer if static else self._static_layers & ~layer
+        )
+        self._dirty_layers |= layer
+
+    def _bits(self, cls: type[GameObject]) -> tuple[int, int]:
+        bits: tuple[int, int] | None = self._class_bits.get(cls)
+        if bits is None:
+            first_bits: int = 0
+            second_bits: int = 0
+            for i, pair in enumerate(self._pairs):
+                if issubclass(cls, pair.first):
+                    first_bits |= 1 << i
+                if issubclass(cls, pair.second):
+                    second_bits |= 1 << i
+            bits = self._class_bits[cls] = (first_bits, second_bits)
+        return bits
+
+    def _cells(
+        self, left: float, top: float, right: float, bottom: float
+    ) -> Iterator[tuple[int, int]]:
+        size: int = self.static_cell_size
+        for row in range(int(top // size), int(bottom // size) + 1):
+            for column in range(int(left // size), int(right // size) + 1):
+                yield (column, row)
+
+    def _refresh_index(self) -> None:
+        dirty: int = self._dirty_layers
+        if not dirty:
+            return
+        self._dirty_layers = 0
+
+        for layer in [layer for layer in self._layer_objects if layer & dirty]:
+            del self._layer_objects[layer]
+            self._layer_cells.pop(layer, None)
+
+        rebuilt: dict[int, list[GameObject]] = {}
+        for obj in self._objects.values():
+            mask = obj.collision_mask
+            if mask is not None and mask.layer & dirty:
+                rebuilt.setdefault(mask.layer, []).append(obj)
+        self._layer_objects.update(rebuilt)
+
+        for layer, objects in rebuilt.items():
+            if not layer & self._static_layers:
+                continue
+            cells: dict[tuple[int, int], list[GameObject]] = {}
+            for obj in objects:
+                mask = obj.collision_mask
+                assert mask is not None
+                for cell in self._cells(
+                    obj.x + mask.bbleft,
+                    obj.y + mask.bbtop,
+                    obj.x + mask.bbright,
+                    obj.y + mask.bbbottom,
+                ):
+                    cells.setdefault(cell, []).append(obj)
+            self._layer_cells[layer] = cells
+
+    def query(
+        self, left: float, top: float, right: float, bottom: float, layers: int
+    ) -> Iterator[GameObject]:
+        """Every object on one of `layers` which might overlap the given box. All the objects on
+        dynamic layers are returned, but only those in the nearby grid cells on static layers."""
+        self._refresh_index()
+        for layer, objects in self._layer_objects.items():
+            if not layer & layers:
+                continue
+            cells: dict[tuple[int, int], list[GameObject]] | None = self._layer_cells.get(layer)
+            if cells is None:
+                yield from objects
+                continue
+
+            seen: set[GameObject] = set()
+            for cell in self._cells(left, top, right, bottom):
+                for obj in cells.get(cell, ()):
+                    if obj not in seen:
+                        seen.add(obj)
+                        yield obj
+
+    def raycast(
+        self,
+        x1: float,
+        y1: float,
+        x2: float,
+        y2: float,
+        obj: type[GameObject] | int,
+        exclude: GameObject | None = None,
+    ) -> RaycastHit | None:
+        """The first instance of the class `obj`, or object on one of the layers in the bitmask
+        `obj`, which the line from (x1, y1) to (x2, y2) meets, along with where and how far along
+        the line that is. Static layers are walked cell by cell from the start of the line, so
+        only the objects near it are tested."""
+        self._refresh_index()
+        cls: type = object
+        layers: int = layer_all
+        if isinstance(obj, int):
+            layers = obj
+        else:
+            cls = obj
+
+        dx: float = x2 - x1
+        dy: float = y2 - y1
+        best_t: float = inf
+        best: GameObject | None = None
+
+        def test(candidate: GameObject) -> None:
+            nonlocal best_t, best
+            mask = candidate.collision_mask
+            if candidate is exclude or mask is None or not isinstance(candidate, cls):
+                return
+            t: float | None = _segment_enters_box(
+                x1,
+                y1,
+                dx,
+                dy,
+                candidate.x + mask.bbleft,
+                candidate.y + mask.bbtop,
+                candidate.x + mask.bbright,
+                candidate.y + mask.bbbottom,
+            )
+            if t is not None and t < best_t:
+                best_t = t
+                best = candidate
+
+        static_layers: int = 0
+        for layer in self._layer_cells:
+            if layer & layers:
+                static_layers |= layer
+
+        for candidate in self.query(
+            min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2), layers & ~static_layers
+        ):
+            test(candidate)
+
+        if static_layers:
+            # Walk the cells the line passes through in order, stopping at the first with a hit
+            # which is closer than the next cell
+            size: int = self.static_cell_size
+            column: int = int(x1 // size)
+            row: int = int(y1 // size)
+            end: tuple[int, int] = (int(x2 // size), int(y2 // size))
+            step_x: int = 1 if dx > 0 else -1
+            step_y: int = 1 if dy > 0 else -1
+            t_delta_x: float = size / abs(dx) if dx else inf
+            t_delta_y: float = size / abs(dy) if dy else inf
+            t_next_x: float = ((column + (dx > 0)) * size - x1) / dx if dx else inf
+            t_next_y: float = ((row + (dy > 0)) * size - y1) / dy if dy else inf
+            seen: set[GameObject] = set()
+            while True:
+                for layer, cells in self._layer_cells.items():
+                    if layer & static_layers:
+                        for candidate in cells.get((column, row), ()):
+                            if candidate not in seen:
+                                seen.add(candidate)
+                                test(candidate)
+
+                t_exit: float = min(t_next_x, t_next_y)
+                if best_t <= t_exit or (column, row) == end or t_exit > 1:
+                    break
+                if t_next_x < t_next_y:
+                    column += step_x
+                    t_next_x += t_delta_x
+                else:
+                    row += step_y
+                    t_next_y += t_delta_y
+
+        if best is None:
+            return None
+        return RaycastHit(best, x1 + dx * best_t, y1 + dy * best_t, hypot(dx, dy) * best_t)
+
+    def collision_line(
+        self,
+        x1: float,
+        y1: float,
+        x2: float,
+        y2: float,
+        obj: type[GameObject] | int,
+        exclude: GameObject | None = None,
+    ) -> GameObject | None:
+        hit: RaycastHit | None = self.raycast(x1, y1, x2, y2, obj, exclude)
+        return None if hit is None else hit.obj
+
+    def _box(self, obj: GameObject) -> _Box | None:
+        mask = obj.collision_mask
+        if mask is None:
+            return None
+        first_bits, second_bits = self._bits(type(obj))
+        if not (first_bits or second_bits):
+            return None
+        return (
+            obj.x + mask.bbleft,
+            obj.x + mask.bbright,
+            obj.y + mask.bbtop,
+            obj.y + mask.bbbottom,
+            first_bits,
+            second_bits,
+            mask.layer,
+            mask.collides_with,
+            obj,
+        )
+
+    def collision_pass(self, destroyed: set[GameObject]) -> None:
+        if not self._pairs:
+            return
+        self._refresh_index()
+
+        boxes: list[_Box] = []
+        for layer, objects in self._layer_objects.items():
+            if layer & self._static_layers:
+                continue
+            for obj in objects:
+                if obj not in destroyed and (box := self._box(obj)) is not None:
+                    boxes.append(box)
+
+        # Sweep and prune: with the boxes sorted by their left edge, each only needs testing against
+        # the earlier ones whose right edge it hasn't passed yet
+        boxes.sort(key=itemgetter(0))
+        overlaps: list[tuple[_Box, _Box, int]] = []
+        active: list[_Box] = []
+        for box in boxes:
+            left, right, top, bottom, first_bits, second_bits, layer, collides_with, _ = box
+            active = [other for other in active if other[1] > left]
+            for other in active:
+                matched: int = (first_bits & other[5]) | (second_bits & other[4])
+                if (
+                    matched
+                    and layer & other[7]
+                    and other[6] & collides_with
+                    and right > other[0]
+                    and top < other[3]
+                    and bottom > other[2]
+                ):
+                    overlaps.append((box, other, matched))
+            active.append(box)
+
+        # Objects on static layers are found from the grid around each dynamic object instead
+        static_layers: int = 0
+        for layer in self._layer_cells:
+            static_layers |= layer
+        if static_layers:
+            for box in boxes:
+                left, right, top, bottom, first_bits, second_bits, layer, collides_with, _ = box
+                if not collides_with & static_layers:
+                    continue
+                for obj in self.query(left, top, right, bottom, collides_with & static_layers):
+                    other_box: _Box | None = self._box(obj)
+                    if other_box is None or obj in destroyed:
+                        continue
+                    matched = (first_bits & other_box[5]) | (second_bits & other_box[4])
+                    if (
+                        matched
+                        and layer & other_box[7]
+                        and left < other_box[1]
+                        and right > other_box[0]
+                        and top < other_box[3]
+                        and bottom > other_box[2]
+                    ):
+                        overlaps.append((box, other_box, matched))
+
+        # Handlers are only called once every overlap is found, so they can move or destroy objects
+        # without changing what else collides this frame. Objects they destroy collide no further
+        for box, other, matched in overlaps:
+            notify: bool = False
+            while matched:
+                bit: int = matched & -matched
+                matched ^= bit
+                if box[8] in destroyed or other[8] in destroyed:
+                    break
+                pair: _CollisionPair = self._pairs[bit.bit_length() - 1]
+                if pair.handler is None:
+                    notify = True
+                elif box[4] & bit and other[5] & bit:
+                    pair.handler(box[8], other[8])
+                else:
+                    pair.handler(other[8], box[8])
+
+            if notify and box[8] not in destroyed and other[8] not in destroyed:
+                box[8].on_collision(other[8])
+                other[8].on_collision(box[8])
+
+
+_collisions: Collisions = Collisions()
+
+# These do not need to be evaluated at runtime, since they are references to methods, so they go
+# here
+collision_pair = _collisions.collision_pair
+collision_pair_remove = _collisions.collision_pair_remove
+collision_layer_set_static = _collisions.collision_layer_set_static
+raycast = _collisions.raycast
+collision_line = _collisions.collision_line
@@ -1,8 +1,13 @@
 from __future__ import annotations
+from collections import OrderedDict
 from uuid import UUID
 from ajishio.input import _input
 from ajishio.view import _view
 from ajishio.rendering import _renderer
+from ajishio.audio import _audio
+from ajishio.collision import _collisions
+from ajishio.timers import _timers
+from ajishio.behaviours import _behaviours
 from ajishio.level_loader import GameLevel
 import pygame as pg
 import sys
@@ -13,10 +18,13 @@ from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from ajishio.game_object import GameObject
-    from ajishio.sound_loader import GameSound
 
 epsilon: float = 0.00001
 
+# A room left while rooms are cached: its objects, and its background layers split into chunks
+_BackgroundChunks = list[list[list[pg.Surface | None]]]
+_SuspendedRoom = tuple[list["GameObject"], _BackgroundChunks]
+
 
 class Engine:
     _instance: Engine | None = None
@@ -34,6 +42,11 @@ class Engine:
         self.room: int = 0
         self.delta_time: float
         self.fps_real: float
+        self.tick_time: float = 0
+
+        # How many rooms left behind are kept suspended, least recently left first out, so going
+        # back to one restores it as it was instead of building it again. 0 keeps none
+        self.room_cache_size: int = 0
 
         self.room_set_size(
             _view.view_wport[_view.view_current], _view.view_hport[_view.view_current]
@@ -46,10 +59,15 @@ class Engine:
         self._game_objects: dict[UUID, GameObject] = {}
         self._game_objects_to_destroy: set[GameObject] = set()
         self._game_objects_to_add: list[GameObject] = []
+        self._game_objects_to_suspend: set[GameObject] = set()
         self._game_running: bool
+        _collisions.set_objects(self._game_objects)
 
         self._rooms: list[GameLevel] = []
-        self._audio_playing: list[GameSound] = []
+
+        # Classes made by rooms, by the layer or entity type name they're made for
+        self._object_classes: dict[str, type[GameObject]] = {}
+        self._suspended_rooms: OrderedDict[int, _SuspendedRoom] = OrderedDict()
 
         self._logger = logging.getLogger(__name__)
         logging.basicConfig(level=logging.DEBUG)
@@ -59,56 +77,70 @@ class Engine:
 
     def register_objects(self, *objects: type[GameObject]) -> None:
         for obj in objects:
-            globals()[obj.__name__] = obj
+            self._object_classes[obj.__name__] = obj
 
     def room_goto(self, index) -> None:
-        # Remove just the non-persistent instances
-        for instance in self._game_objects.values():
-            if not instance.persistent:
+        # Restarting a room always builds it again
+        self._room_change(index, self.room_cache_size > 0 and index != self.room)
+
+    def _room_change(self, index: int, keep: bool) -> None:
+        # Take the room being entered out of the cache first, so leaving this one can't push it out
+        suspended: _SuspendedRoom | None = self._suspended_rooms.pop(index, None)
+
+        # Remove just the non-persistent instances, suspending them to come back to if `keep` is set
+        leaving: list[GameObject] = [
+            instance
+            for instance in self._game_objects.values()
+            if not instance.persistent and instance not in self._game_objects_to_destroy
+        ]
+        if keep:
+            self._room_suspend(self.room, leaving)
+        else:
+            for instance in leaving:
                 self.instance_destroy(instance)
 
         level: GameLevel = self._rooms[index]
 
         self.room_set_size(*level.level_size)
 
+        if suspended is not None:
+            self._room_resume(*suspended)
+            self.room = index
+            return
+
         # Draw the level
         _renderer.set_background_images(list(level.background_surfaces.values()))
 
-        # Load the tilemaps
+        # Load the tilemaps, with each layer's class making all of its tiles in one go
         for layer, tilemap in level.tilemaps.items():
-            tile_size: tuple[int, int] = level.tile_sizes[layer]
-
-            for y, row in enumerate(tilemap):
-                for x, cell in enumerate(row):
-                    if cell:
-                        try:
-                            tile_cls: type = globals()[layer]
-                        except KeyError:
-                            raise ValueError(
-                                f"{layer} object not found in engine namespace. Make sure you have "
-                                f"registered it with `aj.register_objects({layer})"
-                            )
-                        tile_cls(
-                            x * tile_size[0],
-                            y * tile_size[1],
-                            width=tile_size[0],
-                            height=tile_size[1],
-                        )
+            if not any(map(any, tilemap)):
+                continue
+            tile_cls: type[GameObject] | None = self._object_classes.get(layer)
+            if tile_cls is None:
+                raise ValueError(
+                    f"{layer} object not registered. Make sure you have registered it with "
+                    f"`aj.register_objects({layer})`"
+                )
+            tile_cls.from_tiles(tilemap, level.tile_sizes[layer])
 
         # Load the entities
         for entity_type, entities in level.entities.items():
-            for entity in entities:
-                try:
-                    entity_cls: type[GameObject] = globals()[entity_type]
-                except KeyError:
-                    self._logger.warning(
-                        f"{entity_type} object not found in engine namespace. Make sure you have "
-                        f"registered it with `aj.register_objects({entity_type})"
-                    )
+            entity_cls: type[GameObject] | None = self._object_classes.get(entity_type)
+            if entity_cls is None:
+                self._logger.warning(
+                    f"{entity_type} object not registered. Make sure you have registered it with "
+                    f"`aj.register_objects({entity_type})`"
+                )
+                continue
+
+            # There's only ever one of a persistent object, which may have come from another room
+            if entity_cls.persistent:
+                if self.instance_exists(entity_cls):
                     continue
+                entities = entities[:1]
 
-                if not (self.instance_exists(entity_cls) and entity_cls.persistent):
-                    entity_cls(**entity)
+            for entity in entities:
+                entity_cls(**entity)
 
         self.room = index
 
@@ -124,7 +156,10 @@ class Engine:
     def game_restart(self) -> None:
         for obj in self._game_objects.values():
             self.instance_destroy(obj)
-        self.room_goto(0)
+        for objects, _ in self._suspended_rooms.values():
+            self._discard_objects(objects)
+        self._suspended_rooms.clear()
+        self._room_change(0, False)
 
     def game_end(self) -> None:
         self._game_running = False
@@ -151,12 +186,39 @@ class Engine:
     def room_set_background(self, color: pg.Color) -> None:
         self.room_background_color = color
 
-    def audio_play_sound(self, index: GameSound, loop: bool = False, gain: float = 1) -> None:
-        self._audio_playing.append(index)
-        index._play(loop=loop, gain=gain)
+    def room_set_cache_size(self, size: int) -> None:
+        """Keep up to `size` rooms suspended after leaving them, so that going back to one restores
+        its objects as they were left, timers and behaviours included, instead of building the
+        room again. Rooms over the limit are forgotten, least recently left first."""
+        self.room_cache_size = size
+        while len(self._suspended_rooms) > size:
+            self._discard_objects(self._suspended_rooms.popitem(last=False)[1][0])
+
+    def _room_suspend(self, index: int, objects: list[GameObject]) -> None:
+        for obj in objects:
+            _timers.suspend_owned(obj)
+            _behaviours.suspend_owned(obj)
+        self._game_objects_to_suspend.update(objects)
+
+        # The background's chunks are kept too, as splitting it up again is most of a room's set up
+        self._suspended_rooms[index] = (objects, _renderer._background_chunks)
+        self._suspended_rooms.move_to_end(index)
+        self.room_set_cache_size(self.room_cache_size)
+
+    def _room_resume(self, objects: list[GameObject], background_chunks: _BackgroundChunks) -> None:
+        _renderer._background_chunks = background_chunks
+        for obj in objects:
+            _timers.resume_owned(obj)
+            _behaviours.resume_owned(obj)
+
+        # Coming straight back to a room means some of its objects may not have left yet
+        self._game_objects_to_suspend.difference_update(objects)
+        self._game_objects_to_add += [obj for obj in objects if obj.id not in self._game_objects]
 
-    def audio_is_playing(self, index: GameSound) -> bool:
-        return index in self._audio_playing
+    def _discard_objects(self, objects: list[GameObject]) -> None:
+        for obj in objects:
+            _behaviours.stop_owned(obj)
+            _timers.cancel_owned(obj)
 
     def add_object(self, obj: GameObject) -> None:
         self._game_objects_to_add.append(obj)
@@ -164,11 +226,14 @@ class Engine:
     def instance_destroy(self, obj: GameObject) -> None:
         self._game_objects_to_destroy.add(obj)
 
+    def _is_leaving(self, obj: GameObject) -> bool:
+        return obj in self._game_objects_to_destroy or obj in self._game_objects_to_suspend
+
     def instance_count(self, obj: type[GameObject]) -> int:
         count: int = 0
         all_objects = list(self._game_objects.values()) + self._game_objects_to_add
         for g_o in all_objects:
-            if issubclass(type(g_o), obj) and g_o not in self._game_objects_to_destroy:
+            if issubclass(type(g_o), obj) and not self._is_leaving(g_o):
                 count += 1
         return count
 
@@ -176,18 +241,19 @@ class Engine:
         return self.instance_count(obj) > 0
 
     def instance_find(self, obj: type[GameObject] | str, n: int = 0) -> GameObject | None:
+        all_objects = list(self._game_objects.values()) + self._game_objects_to_add
+
         # If obj is a IID, find the object with that IID (it is unique)
         if isinstance(obj, str):
-            all_objects = list(self._game_objects.values()) + self._game_objects_to_add
             for g_o in all_objects:
-                if g_o.iid == obj and g_o not in self._game_objects_to_destroy:
+                if g_o.iid == obj and not self._is_leaving(g_o):
                     return g_o
             return None
 
         # If obj is a type, find the nth object of that type
         count: int = 0
         for g_o in all_objects:
-            if issubclass(type(g_o), obj) and g_o not in self._game_objects_to_destroy:
+            if issubclass(type(g_o), obj) and not self._is_leaving(g_o):
                 if count == n:
                     return g_o
                 count += 1
@@ -201,13 +267,17 @@ class Engine:
         while self._game_running:
 
             try:
-                _input.events += pg.event.get()
+                events: list[pg.event.Event] = pg.event.get()
+                _audio._process_events(events)
+                _input.events += events
 
                 if any(event.type == pg.QUIT for event in _input.events):
                     self.game_end()
 
                 self.delta_time = self._clock.tick(self.room_speed) / 1000  # ms to seconds
                 self.fps_real = self._clock.get_fps()
+                # Time spent on the last frame, not counting the wait to cap the frame rate
+                self.tick_time = self._clock.get_rawtime() / 1000
 
                 if self.room_speed == 0:
                     continue
@@ -221,9 +291,15 @@ class Engine:
                     self._add_pending_objects()
                     self._free_destroyed_objects()
 
+                    # Behaviours resumed by timers and waiting for the next frame must wait for it
+                    _behaviours.advance(self._game_objects_to_destroy)
+                    _timers.advance(self.delta_time, self._game_objects_to_destroy)
+
                     for obj in self._game_objects.values():
                         obj.step()
 
+                    _collisions.collision_pass(self._game_objects_to_destroy)
+
                     draw_buffer = sorted(
                         self._game_objects.values(),
                         key=lambda obj: obj.depth,
@@ -240,10 +316,6 @@ class Engine:
                     pg.display.update()
                     _renderer.draw_display()
 
-                for audio in self._audio_playing:
-                    if audio._is_finished():
-                        self._audio_playing.remove(audio)
-
             except KeyboardInterrupt:
                 self._game_running = False
 
@@ -251,7 +323,27 @@ class Engine:
         sys.exit()
 
     def _free_destroyed_objects(self) -> None:
+        if self._game_objects_to_destroy or self._game_objects_to_suspend:
+            _collisions.invalidate_objects(self._game_objects_to_destroy)
+            _collisions.invalidate_objects(self._game_objects_to_suspend)
+
+        # Objects destroyed after their room was left mustn't come back with it
+        destroyed_leaving: set[GameObject] = (
+            self._game_objects_to_suspend & self._game_objects_to_destroy
+        )
+        if destroyed_leaving:
+            for index, (objects, chunks) in self._suspended_rooms.items():
+                objects = [obj for obj in objects if obj not in destroyed_leaving]
+                self._suspended_rooms[index] = (objects, chunks)
+
+        for obj in self._game_objects_to_suspend:
+            self._game_objects.pop(obj.id, None)
+        self._game_objects_to_suspend.clear()
         for obj in self._game_objects_to_destroy:
+            if obj._behaviours:
+                _behaviours.stop_owned(obj)
+            if obj._timers:
+                _timers.cancel_owned(obj)
             try:
                 self._game_objects.pop(obj.id)
             except KeyError:
@@ -259,6 +351,8 @@ class Engine:
         self._game_objects_to_destroy.clear()
 
     def _add_pending_objects(self) -> None:
+        if self._game_objects_to_add:
+            _collisions.invalidate_objects(self._game_objects_to_add)
         for obj in self._game_objects_to_add:
             self._game_objects[obj.id] = obj
         self._game_objects_to_add.clear()
@@ -273,8 +367,10 @@ room_width: int
 room_height: int
 room_background_color: pg.Color
 room: int
+room_cache_size: int
 delta_time: float
 fps_real: float
+tick_time: float
 
 # These do not need to be evaluated at runtime, since they are references to methods, so they go
 # here
@@ -282,6 +378,7 @@ game_set_speed = _engine.game_set_speed
 room_set_width = _engine.room_set_width
 room_set_height = _engine.room_set_height
 room_set_background = _engine.room_set_background
+room_set_cache_size = _engine.room_set_cache_size
 game_start = _engine.game_start
 instance_destroy = _engine.instance_destroy
 instance_count = _engine.instance_count
@@ -295,5 +392,3 @@ room_goto_previous = _engine.room_goto_previous
 room_restart = _engine.room_restart
 game_restart = _engine.game_restart
 game_end = _engine.game_end
-audio_play_sound = _engine.audio_play_sound
-audio_is_playing = _engine.audio_is_playing
@@ -1,8 +1,12 @@
 from __future__ import annotations
 from ajishio.engine import _engine
+from ajishio.collision import _collisions, layer_all, layer_default
 from ajishio.rendering import draw_sprite
 from ajishio.sprite_loader import GameSprite
+from ajishio.timers import Alarms, Timer
+from ajishio.behaviours import Behaviour, BehaviourFunction, _behaviours
 from dataclasses import dataclass
+from itertools import groupby
 from uuid import uuid4, UUID
 from typing import Any
 
@@ -13,11 +17,40 @@ class CollisionMask:
     bbtop: float = 0
     bbright: float = 0
     bbbottom: float = 0
+    layer: int = layer_default
+    collides_with: int = layer_all
+
+
+def _tile_rectangles(tilemap: list[list[bool]]) -> list[list[int]]:
+    """Rectangles covering exactly the solid cells of a tilemap, as x, y, width and height in
+    cells. Each is a run of solid cells along a row, joined with the same run in the rows below."""
+    rectangles: list[list[int]] = []
+    open_runs: dict[tuple[int, int], list[int]] = {}
+    for y, row in enumerate(tilemap):
+        runs: dict[tuple[int, int], list[int]] = {}
+        x: int = 0
+        for solid, cells in groupby(row):
+            length: int = len(list(cells))
+            if solid:
+                rectangle: list[int] | None = open_runs.pop((x, length), None)
+                if rectangle is None:
+                    rectangle = [x, y, length, 0]
+                rectangle[3] += 1
+                runs[(x, length)] = rectangle
+            x += length
+        rectangles += open_runs.values()
+        open_runs = runs
+    rectangles += open_runs.values()
+    return rectangles
 
 
 class GameObject:
     persistent: bool = False
 
+    # Whether `from_tiles` covers a tilemap layer with a few large objects rather than one per tile.
+    # Best for tiles which are only there to be collided with and never change
+    merge_tiles: bool = False
+
     def __init__(
         self,
         x: float = 0,
@@ -32,9 +65,12 @@ class GameObject:
         self.sprite_index: GameSprite | None = sprite_index
         self.image_index: int = 0
         self.image_speed: float = 0
-        self.collision_mask: CollisionMask | None = collision_mask
+        self._collision_mask: CollisionMask | None = collision_mask
         self.depth: int = 0
         self._last_image_update: float = 0
+        self._alarms: Alarms | None = None
+        self._timers: list[Timer] = []
+        self._behaviours: list[Behaviour] = []
 
         self.iid: str | None = kwargs.get("iid", None)
         self.width: float = kwargs.get("width", 0)
@@ -43,6 +79,46 @@ class GameObject:
 
         _engine.add_object(self)
 
+    @classmethod
+    def from_tiles(cls, tilemap: list[list[bool]], tile_size: tuple[int, int]) -> list[GameObject]:
+        """Make the objects for every solid cell of a tilemap layer named after this class, which
+        is how rooms make them when they load. Each is passed its position and, as `width` and
+        `height` keyword arguments, its size."""
+        width, height = tile_size
+        if cls.merge_tiles:
+            return [
+                cls(x * width, y * height, width=w * width, height=h * height)
+                for x, y, w, h in _tile_rectangles(tilemap)
+            ]
+        return [
+            cls(x * width, y * height, width=width, height=height)
+            for y, row in enumerate(tilemap)
+            for x, cell in enumerate(row)
+            if cell
+        ]
+
+    @property
+    def collision_mask(self) -> CollisionMask | None:
+        return self._collision_mask
+
+    @collision_mask.setter
+    def collision_mask(self, collision_mask: CollisionMask | None) -> None:
+        # Objects are indexed by their mask's layer, so a new mask means indexing its old and new
+        # layers again
+        layers: int = 0
+        if self._collision_mask is not None:
+            layers |= self._collision_mask.layer
+        if collision_mask is not None:
+            layers |= collision_mask.layer
+        self._collision_mask = collision_mask
+        _collisions.invalidate(layers)
+
+    @property
+    def alarm(self) -> Alarms:
+        if self._alarms is None:
+            self._alarms = Alarms(self)
+        return self._alarms
+
     @property
     def sprite_width(self) -> int:
         if self.sprite_index is None:
@@ -73,9 +149,26 @@ class GameObject:
     def on_game_end(self) -> None:
         pass
 
+    def start_behaviour(self, behaviour: BehaviourFunction) -> Behaviour:
+        """Run a generator or `async def` coroutine, such as `self.patrol()`, which yields or awaits
+        `wait`, `wait_until` or `next_frame`. It's stopped when this object is destroyed."""
+        return _behaviours.start(behaviour, self)
+
+    def on_alarm(self, index: int) -> None:
+        """Called when alarm `index` goes off, `alarm[index]` seconds after it was set."""
+        pass
+
+    def on_collision(self, other: GameObject) -> None:
+        """Called once per frame for each object this one overlaps, if their classes were
+        registered with `collision_pair` without a handler."""
+        pass
+
     def place_meeting(
-        self, x: float, y: float, obj: GameObject | type[GameObject] | UUID
+        self, x: float, y: float, obj: GameObject | type[GameObject] | UUID | int
     ) -> GameObject | None:
+        """The object `obj`, or the first instance of the class `obj` or object on one of the layers
+        in the bitmask `obj`, that this object would overlap at (x, y). Classes and layers only
+        match objects on layers in this object's `collides_with`."""
         if isinstance(obj, GameObject):
             o: GameObject = obj
             s_msk: CollisionMask | None = self.collision_mask
@@ -97,9 +190,20 @@ class GameObject:
             game_obj = _engine._game_objects[obj]
             return self.place_meeting(x, y, game_obj)
 
-        elif issubclass(obj, GameObject):
-            for g_o in _engine._game_objects.values():
-                if isinstance(g_o, obj):
-                    if self.place_meeting(x, y, g_o):
-                        return g_o
+        msk: CollisionMask | None = self.collision_mask
+        if msk is None:
             return None
+
+        cls: type[GameObject] = GameObject
+        layers: int = msk.collides_with
+        if isinstance(obj, int):
+            layers &= obj
+        elif issubclass(obj, GameObject):
+            cls = obj
+
+        for g_o in _collisions.query(
+            x + msk.bbleft, y + msk.bbtop, x + msk.bbright, y + msk.bbbottom, layers
+        ):
+            if isinstance(g_o, cls) and self.place_meeting(x, y, g_o):
+                return g_o
+        return None
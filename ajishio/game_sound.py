@@ -1,28 +1,36 @@
+from __future__ import annotations
 import pygame as pg
-from ajishio.engine import _engine
+from pathlib import Path
 
 
 class GameSound:
-    def __init__(self, sound: pg.mixer.Sound) -> None:
-        self.sound: pg.mixer.Sound = sound
-        self.duration_ms: float = sound.get_length() * 1000
-        self._time_since_started_playing: float | None = None
-        self._looping: bool = False
-
-    def _play(self, loop: bool = False, gain: float = 1) -> None:
-        self.sound.set_volume(gain)
-        self.sound.play(-1 if loop else 0)
-        self._looping = loop
-        self._time_since_started_playing = 0
-
-    def _is_finished(self) -> bool:
-        if self._looping:
-            return False
-        if self._time_since_started_playing is None:
-            return True
-        self._time_since_started_playing += _engine.delta_time
-        if self._time_since_started_playing > self.duration_ms:
-            self._time_since_started_playing = None
-            self.sound.set_volume(1)
-            return True
-        return False
+    def __init__(
+        self,
+        sound: pg.mixer.Sound | None,
+        group: str = "sfx",
+        priority: int = 0,
+        max_voices: int | None = None,
+    ) -> None:
+        # Both None for music, which isn't decoded until it plays
+        self.sound: pg.mixer.Sound | None = sound
+        self.duration_ms: float | None = None if sound is None else sound.get_length() * 1000
+
+        # Sounds in the same group share a gain set with `audio_group_set_gain`
+        self.group: str = group
+
+        # When we run out of channels, sounds with a higher priority steal from lower ones
+        self.priority: int = priority
+
+        # How many copies of this sound can play at once before the oldest one is cut off
+        self.max_voices: int | None = max_voices
+
+
+class GameMusic(GameSound):
+    """A long track which is streamed from disk by `pg.mixer.music` rather than decoded up front.
+
+    Only one music track can play at a time, so playing another one replaces it.
+    """
+
+    def __init__(self, path: Path, group: str = "music") -> None:
+        super().__init__(None, group, max_voices=1)
+        self.path: Path = path
@@ -4,6 +4,7 @@ import pygame as pg
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
+from ajishio.pixel_format import _pixel_format, optimise_surface
 from ajishio.utils import remove_ext
 
 
@@ -15,6 +16,13 @@ class GameLevel:
     level_size: tuple[int, int]
     entities: dict[str, Any]
 
+    def __post_init__(self) -> None:
+        _pixel_format.track(self)
+
+    def _convert_surfaces(self) -> None:
+        for layer, surface in self.background_surfaces.items():
+            self.background_surfaces[layer] = optimise_surface(surface)
+
 
 def load_ldtk_levels(ldtk_super_simple_export_simplified_path: Path) -> list[GameLevel]:
     alphabetical_level_dirs: list[Path] = sorted(ldtk_super_simple_export_simplified_path.iterdir())
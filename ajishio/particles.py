@@ -0,0 +1,151 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from math import tau
+import pygame as pg
+from ajishio.engine import _engine
+from ajishio.game_object import GameObject
+from ajishio.pixel_format import optimise_surface
+from ajishio.rendering import _renderer
+from ajishio.view import _view
+
+# Particles are optional, so numpy is only needed by games which use them
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore[assignment]
+
+
+@dataclass
+class ParticleType:
+    """What particles look like and how they move. Speeds are in pixels per second, directions in
+    radians like `lengthdir_x`, and lives in seconds. Each particle's life, speed and direction are
+    picked evenly between the two values given. Over its life a particle's colour passes through
+    each of `colors` in turn and its alpha goes from the first value of `alpha` to the second."""
+
+    sprite: pg.Surface | None = None  # drawn if given, otherwise a square `size` pixels across
+    size: int = 4
+    colors: list[pg.Color] = field(default_factory=lambda: [pg.Color(255, 255, 255)])
+    alpha: tuple[float, float] = (1, 1)
+    life: tuple[float, float] = (0.5, 1)
+    speed: tuple[float, float] = (50, 100)
+    direction: tuple[float, float] = (0, tau)
+    gravity: tuple[float, float] = (0, 0)  # pixels per second per second
+    friction: float = 0  # fraction of its speed a particle loses each second
+
+    # Colours and alphas are pre-rendered this many steps apart over a particle's life
+    frames: int = 16
+
+    def render_frames(self) -> list[pg.Surface]:
+        if self.sprite is not None:
+            base: pg.Surface = self.sprite
+        else:
+            base = pg.Surface((self.size, self.size))
+            base.fill(pg.Color(255, 255, 255))
+
+        frames: list[pg.Surface] = []
+        for i in range(self.frames):
+            t: float = i / max(self.frames - 1, 1)
+            position: float = t * (len(self.colors) - 1)
+            index: int = min(int(position), len(self.colors) - 2) if len(self.colors) > 1 else 0
+            color: pg.Color = (
+                self.colors[index].lerp(self.colors[index + 1], position - index)
+                if len(self.colors) > 1
+                else self.colors[0]
+            )
+            tinted: pg.Surface = base.convert_alpha()
+            tinted.fill(color, special_flags=pg.BLEND_MULT)
+            frame: pg.Surface = optimise_surface(tinted)
+            frame.set_alpha(int((self.alpha[0] + (self.alpha[1] - self.alpha[0]) * t) * 255))
+            frames.append(frame)
+        return frames
+
+
+class ParticleSystem(GameObject):
+    """Up to `capacity` particles of one type, kept in numpy arrays so they all move in a few
+    vectorised operations each step and are drawn with one batched blit. However many particles
+    there are, the engine sees one object."""
+
+    persistent: bool = True
+
+    def __init__(self, particle_type: ParticleType, capacity: int = 4096, depth: int = 0) -> None:
+        if np is None:
+            raise ImportError("Particle systems need numpy, install it with `pip install numpy`")
+        super().__init__()
+        self.particle_type: ParticleType = particle_type
+        self.depth = depth
+        self.capacity: int = capacity
+        self.count: int = 0
+
+        self._frames: list[pg.Surface] = particle_type.render_frames()
+        self._half_size: tuple[float, float] = (
+            self._frames[0].get_width() / 2,
+            self._frames[0].get_height() / 2,
+        )
+        self._rng = np.random.default_rng()
+        self._positions = np.zeros((capacity, 2), dtype=np.float32)
+        self._velocities = np.zeros((capacity, 2), dtype=np.float32)
+        self._lives = np.zeros(capacity, dtype=np.float32)
+        self._max_lives = np.ones(capacity, dtype=np.float32)
+
+    def burst(self, x: float, y: float, count: int) -> None:
+        """Create `count` particles at (x, y), or as many as there's room for."""
+        count = min(count, self.capacity - self.count)
+        if count <= 0:
+            return
+        part: ParticleType = self.particle_type
+        new = slice(self.count, self.count + count)
+
+        speeds = self._rng.uniform(*part.speed, count)
+        directions = self._rng.uniform(*part.direction, count)
+        self._positions[new] = (x, y)
+        self._velocities[new, 0] = speeds * np.cos(directions)
+        self._velocities[new, 1] = speeds * np.sin(directions)
+        self._lives[new] = self._max_lives[new] = self._rng.uniform(*part.life, count)
+        self.count += count
+
+    def clear(self) -> None:
+        self.count = 0
+
+    def step(self) -> None:
+        if not self.count:
+            return
+        n: int = self.count
+        part: ParticleType = self.particle_type
+        delta_time: float = _engine.delta_time
+
+        lives = self._lives[:n]
+        lives -= delta_time
+        alive = lives > 0
+        if not alive.all():
+            # Keep the living particles together at the front of the arrays
+            n = int(alive.sum())
+            for array in (self._positions, self._velocities, self._lives, self._max_lives):
+                array[:n] = array[: self.count][alive]
+            self.count = n
+
+        velocities = self._velocities[:n]
+        if part.friction:
+            velocities *= max(1 - part.friction * delta_time, 0)
+        if part.gravity != (0, 0):
+            velocities += np.array(part.gravity, dtype=np.float32) * delta_time
+        self._positions[:n] += velocities * delta_time
+
+    def draw(self) -> None:
+        if not self.count:
+            return
+        n: int = self.count
+        frame_indices = (
+            (1 - self._lives[:n] / self._max_lives[:n]) * (len(self._frames) - 1) + 0.5
+        ).astype(np.int32)
+        corners = (self._positions[:n] - self._half_size + _view.offset).astype(np.int32)
+        frames: list[pg.Surface] = self._frames
+        blits: list[tuple[pg.Surface, tuple[int, int]]] = [
+            (frames[i], (x, y)) for i, (x, y) in zip(frame_indices.tolist(), corners.tolist())
+        ]
+
+        # fblits skips the per-blit bookkeeping blits does, but only some versions of pygame have it
+        display: pg.Surface = _renderer._display
+        if hasattr(display, "fblits"):
+            display.fblits(blits)
+        else:
+            display.blits(blits, doreturn=False)
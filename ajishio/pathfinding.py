@@ -0,0 +1,257 @@
+from __future__ import annotations
+from array import array
+from collections import OrderedDict
+from heapq import heappop, heappush
+from math import inf, sqrt
+from ajishio.level_loader import GameLevel
+
+_SQRT2: float = sqrt(2)
+
+
+class FlowField:
+    """The distance from every cell of a `NavGrid` to one goal cell, and which neighbour to step to
+    from each to get there soonest. Computed once, then shared by everything heading for the goal.
+    """
+
+    def __init__(self, grid: NavGrid, goal: tuple[int, int]) -> None:
+        self.goal: tuple[int, int] = goal
+        self._grid: NavGrid = grid
+        size: int = len(grid.blocked)
+        self.distances: list[float] = [inf] * size
+
+        # For each cell, the index of the next cell on the way to the goal, or -1 if there's none
+        self.next_cells: array[int] = array("i", [-1]) * size
+
+        if not grid.walkable(*goal):
+            return
+
+        # Search outwards from the goal. Moving between cells costs the same both ways, so the cell
+        # the search came from is the next step towards the goal
+        goal_index: int = grid.index(*goal)
+        self.distances[goal_index] = 0
+        self.next_cells[goal_index] = goal_index
+        if grid.diagonal:
+            self._dijkstra(goal_index)
+        else:
+            self._breadth_first(goal_index)
+
+    def _breadth_first(self, goal_index: int) -> None:
+        # Every step costs 1 without diagonals, so cells are reached in order of distance anyway
+        blocked: bytearray = self._grid.blocked
+        distances: list[float] = self.distances
+        next_cells: array[int] = self.next_cells
+        offsets: list[int] = [offset for offset, _, _, _ in self._grid.steps]
+        frontier: list[int] = [goal_index]
+        distance: int = 0
+        while frontier:
+            distance += 1
+            next_frontier: list[int] = []
+            for index in frontier:
+                for offset in offsets:
+                    neighbour: int = index + offset
+                    if not blocked[neighbour] and next_cells[neighbour] < 0:
+                        distances[neighbour] = distance
+                        next_cells[neighbour] = index
+                        next_frontier.append(neighbour)
+            frontier = next_frontier
+
+    def _dijkstra(self, goal_index: int) -> None:
+        grid: NavGrid = self._grid
+        distances: list[float] = self.distances
+        closed = bytearray(len(distances))
+        open_heap: list[tuple[float, int]] = [(0, goal_index)]
+        while open_heap:
+            distance, index = heappop(open_heap)
+            if closed[index]:
+                continue
+            closed[index] = 1
+            for neighbour, cost in grid.neighbours(index):
+                new_distance: float = distance + cost
+                if new_distance < distances[neighbour]:
+                    distances[neighbour] = new_distance
+                    self.next_cells[neighbour] = index
+                    heappush(open_heap, (new_distance, neighbour))
+
+    def distance(self, x: int, y: int) -> float:
+        """How far cell (x, y) is from the goal, or infinity if it can't reach it."""
+        if not self._grid.in_bounds(x, y):
+            return inf
+        return self.distances[self._grid.index(x, y)]
+
+    def next_step(self, x: int, y: int) -> tuple[int, int] | None:
+        """The cell to move to from (x, y) to get closer to the goal, which is (x, y) itself at the
+        goal, or None if the goal can't be reached from there."""
+        if not self._grid.in_bounds(x, y):
+            return None
+        index: int = self.next_cells[self._grid.index(x, y)]
+        if index < 0:
+            return None
+        return self._grid.cell(index)
+
+
+class NavGrid:
+    """Pathfinding over one tilemap layer of a `GameLevel`, where the layer's solid tiles can't be
+    walked through. Change tiles with `set_tile` so cached flow fields are thrown away.
+
+    Cells are stored row by row in flat arrays with a border of solid cells all the way round, so
+    searches never need to check whether a neighbour is off the edge of the map."""
+
+    # How many goals' flow fields are kept at once, least recently used first out
+    flow_field_cache_size: int = 16
+
+    def __init__(self, level: GameLevel, layer: str, diagonal: bool = False) -> None:
+        self.tilemap: list[list[bool]] = level.tilemaps[layer]
+        self.tile_size: tuple[int, int] = level.tile_sizes[layer]
+        self.width: int = len(self.tilemap[0]) if self.tilemap else 0
+        self.height: int = len(self.tilemap)
+        self.diagonal: bool = diagonal
+        self._stride: int = self.width + 2
+        self.blocked = bytearray()
+        self._flow_fields: OrderedDict[tuple[int, int], FlowField] = OrderedDict()
+
+        # Offsets from a cell's index to each neighbour's, the cost of moving there, and offsets to
+        # the two cells whose corners a diagonal move passes between, which must both be walkable
+        stride: int = self._stride
+        self.steps: list[tuple[int, float, int, int]] = [
+            (offset, 1, 0, 0) for offset in (1, -1, stride, -stride)
+        ]
+        if diagonal:
+            self.steps += [
+                (dx + dy * stride, _SQRT2, dx, dy * stride) for dx in (1, -1) for dy in (1, -1)
+            ]
+        self.invalidate()
+
+    def index(self, x: int, y: int) -> int:
+        return (y + 1) * self._stride + x + 1
+
+    def cell(self, index: int) -> tuple[int, int]:
+        return (index % self._stride - 1, index // self._stride - 1)
+
+    def in_bounds(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def walkable(self, x: int, y: int) -> bool:
+        return self.in_bounds(x, y) and not self.blocked[self.index(x, y)]
+
+    def set_tile(self, x: int, y: int, solid: bool) -> None:
+        self.tilemap[y][x] = solid
+        self.blocked[self.index(x, y)] = solid
+        self._flow_fields.clear()
+
+    def invalidate(self) -> None:
+        """Re-read the tilemap after changing it directly rather than with `set_tile`."""
+        border = bytearray([1]) * self._stride
+        self.blocked = (
+            border + b"".join(b"\x01" + bytes(row) + b"\x01" for row in self.tilemap) + border
+        )
+        self._flow_fields.clear()
+
+    def neighbours(self, index: int) -> list[tuple[int, float]]:
+        """The walkable cells next to the cell at `index`, and the cost of moving to each. Moving
+        diagonally isn't allowed past the corner of a solid tile."""
+        blocked: bytearray = self.blocked
+        return [
+            (index + offset, cost)
+            for offset, cost, corner_x, corner_y in self.steps
+            if not (
+                blocked[index + offset] or blocked[index + corner_x] or blocked[index + corner_y]
+            )
+        ]
+
+    def _heuristic(self, index: int, goal_x: int, goal_y: int) -> float:
+        x, y = self.cell(index)
+        dx: int = abs(x - goal_x)
+        dy: int = abs(y - goal_y)
+        if self.diagonal:
+            return max(dx, dy) + (_SQRT2 - 1) * min(dx, dy)
+        return dx + dy
+
+    def path(self, start: tuple[int, int], goal: tuple[int, int]) -> list[tuple[int, int]] | None:
+        """The cells from `start` to `goal` inclusive along a shortest path, found with A*, or
+        None if there isn't one."""
+        if not (self.walkable(*start) and self.walkable(*goal)):
+            return None
+
+        size: int = len(self.blocked)
+        start_index: int = self.index(*start)
+        goal_index: int = self.index(*goal)
+        costs: list[float] = [inf] * size
+        came_from: array[int] = array("i", [-1]) * size
+        closed = bytearray(size)
+
+        costs[start_index] = 0
+        open_heap: list[tuple[float, int]] = [(self._heuristic(start_index, *goal), start_index)]
+        while open_heap:
+            _, index = heappop(open_heap)
+            if index == goal_index:
+                cells: list[tuple[int, int]] = []
+                while index != start_index:
+                    cells.append(self.cell(index))
+                    index = came_from[index]
+                cells.append(start)
+                cells.reverse()
+                return cells
+            if closed[index]:
+                continue
+            closed[index] = 1
+            for neighbour, cost in self.neighbours(index):
+                new_cost: float = costs[index] + cost
+                if new_cost < costs[neighbour]:
+                    costs[neighbour] = new_cost
+                    came_from[neighbour] = index
+                    heappush(open_heap, (new_cost + self._heuristic(neighbour, *goal), neighbour))
+        return None
+
+    def flow_field(self, goal: tuple[int, int]) -> FlowField:
+        """The flow field towards `goal`, computed the first time it's asked for and shared by
+        every later caller until a tile changes."""
+        flow_field: FlowField | None = self._flow_fields.get(goal)
+        if flow_field is None:
+            flow_field = self._flow_fields[goal] = FlowField(self, goal)
+            if len(self._flow_fields) > self.flow_field_cache_size:
+                self._flow_fields.popitem(last=False)
+        else:
+            self._flow_fields.move_to_end(goal)
+        return flow_field
+
+    def next_step(self, start: tuple[int, int], goal: tuple[int, int]) -> tuple[int, int] | None:
+        """The cell to move to from `start` to get closer to `goal`, using the shared flow field to
+        `goal`, or None if it can't be reached."""
+        return self.flow_field(goal).next_step(*start)
+
+
+class Pathfinding:
+    _instance: Pathfinding | None = None
+
+    def __new__(cls) -> Pathfinding:
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        # Grids are shared by everything pathfinding over the same layer, so they share flow fields.
+        # Keyed by the level's id, so the level is kept alongside its grids to keep that id unique
+        self._grids: dict[tuple[int, str, bool], tuple[GameLevel, NavGrid]] = {}
+
+    def nav_grid(self, level: GameLevel, layer: str, diagonal: bool = False) -> NavGrid:
+        key: tuple[int, str, bool] = (id(level), layer, diagonal)
+        entry: tuple[GameLevel, NavGrid] | None = self._grids.get(key)
+        if entry is None:
+            entry = self._grids[key] = (level, NavGrid(level, layer, diagonal))
+        return entry[1]
+
+    def tile_set(self, level: GameLevel, layer: str, x: int, y: int, solid: bool) -> None:
+        """Change a tile in `level`'s tilemap, throwing away every flow field it could affect."""
+        level.tilemaps[layer][y][x] = solid
+        for diagonal in (False, True):
+            entry: tuple[GameLevel, NavGrid] | None = self._grids.get((id(level), layer, diagonal))
+            if entry is not None:
+                entry[1].set_tile(x, y, solid)
+
+
+_pathfinding: Pathfinding = Pathfinding()
+
+# These do not need to be evaluated at runtime, since they are references to methods, so they go
+# here
+nav_grid = _pathfinding.nav_grid
+tile_set = _pathfinding.tile_set
@@ -0,0 +1,99 @@
+from __future__ import annotations
+import weakref
+from typing import Protocol
+import pygame as pg
+
+# Tried in order as the colour key for images whose pixels are all either opaque or fully
+# transparent, skipping any which the image's opaque pixels already use
+_COLORKEY_CANDIDATES: list[tuple[int, int, int]] = [
+    (255, 0, 255),
+    (0, 255, 255),
+    (1, 2, 3),
+    (254, 1, 253),
+]
+
+
+class SurfaceOwner(Protocol):
+    def _convert_surfaces(self) -> None: ...
+
+
+def optimise_surface(surface: pg.Surface) -> pg.Surface:
+    """Return a copy of `surface` in the display's pixel format, stored whichever way is quickest to
+    blit: with no transparency if it's fully opaque, with an RLE accelerated colour key if every
+    pixel is either opaque or fully transparent, and with per-pixel alpha otherwise."""
+    colorkey: tuple[int, int, int, int] | None = surface.get_colorkey()
+    if colorkey is not None and not surface.get_flags() & pg.SRCALPHA:
+        keyed: pg.Surface = surface.convert()
+        keyed.set_colorkey(colorkey, pg.RLEACCEL)
+        return keyed
+    if not surface.get_flags() & pg.SRCALPHA:
+        return surface.convert()
+
+    opaque = pg.mask.from_surface(surface, 254)
+    opaque_pixels: int = opaque.count()
+    if opaque_pixels == surface.get_width() * surface.get_height():
+        return surface.convert()
+    if pg.mask.from_surface(surface, 0).count() == opaque_pixels:
+        for key in _COLORKEY_CANDIDATES:
+            uses_key = pg.mask.from_threshold(surface, key, (1, 1, 1, 255))
+            if uses_key.overlap_area(opaque, (0, 0)):
+                continue
+            keyed = pg.Surface(surface.get_size(), 0, pg.display.get_surface())
+            keyed.fill(key)
+            keyed.blit(surface, (0, 0))
+            keyed.set_colorkey(key, pg.RLEACCEL)
+            return keyed
+    return surface.convert_alpha()
+
+
+class PixelFormat:
+    _instance: PixelFormat | None = None
+
+    def __new__(cls) -> PixelFormat:
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        # Everything holding loaded images, so they can be converted again if a new display has a
+        # different pixel format, and those loaded while there was no display to convert them to
+        self._owners: list[weakref.ref[SurfaceOwner]] = []
+        self._unconverted: list[weakref.ref[SurfaceOwner]] = []
+        self._display_format: tuple[int, tuple[int, int, int, int]] | None = None
+
+    def track(self, owner: SurfaceOwner) -> None:
+        """Keep `owner`'s images in the display's pixel format, converting them now if the display
+        exists or as soon as it's created otherwise."""
+        owner_ref: weakref.ref[SurfaceOwner] = weakref.ref(owner)
+        self._owners.append(owner_ref)
+        if self._display_format is not None and pg.display.get_surface() is not None:
+            owner._convert_surfaces()
+        else:
+            self._unconverted.append(owner_ref)
+
+    def display_changed(self) -> None:
+        """Called whenever the display is (re)created, to convert anything loaded before then, or
+        everything if the display's pixel format has changed."""
+        display: pg.Surface | None = pg.display.get_surface()
+        if display is None:
+            return
+        display_format = (display.get_bitsize(), display.get_masks())
+        if display_format != self._display_format:
+            self._display_format = display_format
+            self._owners = self._convert(self._owners)
+        else:
+            self._convert(self._unconverted)
+        self._unconverted = []
+
+    @staticmethod
+    def _convert(owner_refs: list[weakref.ref[SurfaceOwner]]) -> list[weakref.ref[SurfaceOwner]]:
+        alive: list[weakref.ref[SurfaceOwner]] = []
+        for owner_ref in owner_refs:
+            owner: SurfaceOwner | None = owner_ref()
+            if owner is not None:
+                owner._convert_surfaces()
+                alive.append(owner_ref)
+        return alive
+
+
+_pixel_format: PixelFormat = PixelFormat()
@@ -2,12 +2,17 @@ from __future__ import annotations
 import colorsys
 import pygame as pg
 from ajishio.view import _view
+from ajishio.pixel_format import _pixel_format, optimise_surface
 from ajishio.sprite_loader import GameSprite
 
 
 class Renderer:
     _instance: Renderer | None = None
 
+    # Room backgrounds are split into square chunks this many pixels across, so that only the
+    # chunks the view can see are drawn each frame
+    background_chunk_size: int = 256
+
     def __new__(cls) -> Renderer:
         if cls._instance is None:
             cls._instance = super().__new__(cls)
@@ -18,38 +23,115 @@ class Renderer:
         self.set_screen_size(
             _view.view_wport[_view.view_current], _view.view_hport[_view.view_current]
         )
-        self._display: pg.Surface
-        self._background_images: list[pg.Surface] = []
+        self._display: pg.Surface = pg.Surface((0, 0), 0, self._screen)
+
+        # For each background layer, a grid of chunks indexed by row then column. Chunks with
+        # nothing to draw in them are None
+        self._background_chunks: list[list[list[pg.Surface | None]]] = []
+
+        # Whether background layers are composited into one when the room starts, which is only
+        # worth doing if none of them change while the room is running
+        self.background_flatten: bool = False
 
         self.draw_color: pg.Color = pg.Color(255, 255, 255)
         self.draw_font: pg.font.Font = pg.font.Font(None, 32)
 
     def set_screen_size(self, w: float, h: float) -> None:
         self._screen = pg.display.set_mode((w, h))
+        _pixel_format.display_changed()
 
     def draw_display(self) -> None:
         scaled_display: pg.Surface = pg.transform.scale(self._display, self._screen.get_size())
         self._screen.blit(scaled_display, (0, 0))
 
     def fit_display(self) -> None:
-        self._display = pg.Surface(
-            (_view.view_wport[_view.view_current], _view.view_hport[_view.view_current]),
-            flags=pg.SRCALPHA,
+        # The display is in the screen's pixel format, like every loaded image, so nothing drawn
+        # onto it needs converting. It's only made again when the view port or screen changes
+        size: tuple[int, int] = (
+            int(_view.view_wport[_view.view_current]),
+            int(_view.view_hport[_view.view_current]),
         )
+        if (
+            self._display.get_size() != size
+            or self._display.get_bitsize() != self._screen.get_bitsize()
+            or self._display.get_masks() != self._screen.get_masks()
+        ):
+            self._display = pg.Surface(size, 0, self._screen)
 
     def fill_background_color(self, color: pg.Color) -> None:
         self._display.fill(color)
 
     def set_background_images(self, surfaces: list[pg.Surface]) -> None:
-        self._background_images = surfaces
+        if self.background_flatten and len(surfaces) > 1:
+            flattened = pg.Surface(
+                (max(s.get_width() for s in surfaces), max(s.get_height() for s in surfaces)),
+                flags=pg.SRCALPHA,
+            )
+            for surface in surfaces:
+                flattened.blit(surface, (0, 0))
+            surfaces = [flattened]
+
+        self._background_chunks = [self._split_into_chunks(surface) for surface in surfaces]
+
+    def _split_into_chunks(self, surface: pg.Surface) -> list[list[pg.Surface | None]]:
+        size: int = self.background_chunk_size
+        width, height = surface.get_size()
+        rows: list[list[pg.Surface | None]] = []
+        for y in range(0, height, size):
+            row: list[pg.Surface | None] = []
+            for x in range(0, width, size):
+                row.append(
+                    self._make_chunk(
+                        surface.subsurface(
+                            pg.Rect(x, y, min(size, width - x), min(size, height - y))
+                        )
+                    )
+                )
+            rows.append(row)
+        return rows
+
+    @staticmethod
+    def _make_chunk(area: pg.Surface) -> pg.Surface | None:
+        # Chunks which are entirely transparent are never drawn, and the rest are stored however is
+        # quickest to blit them, e.g. without blending at all if they're entirely opaque
+        if pg.mask.from_surface(area, 0).count() == 0:
+            return None
+        return optimise_surface(area)
 
     def draw_background_images(self) -> None:
-        for bg in self._background_images:
-            self._display.blit(bg, _view.offset)
+        if not self._background_chunks:
+            return
+
+        size: int = self.background_chunk_size
+        view_x: float = _view.view_xport[_view.view_current]
+        view_y: float = _view.view_yport[_view.view_current]
+        first_column: int = max(int(view_x // size), 0)
+        last_column: int = int((view_x + _view.view_wport[_view.view_current] - 1) // size)
+        first_row: int = max(int(view_y // size), 0)
+        last_row: int = int((view_y + _view.view_hport[_view.view_current] - 1) // size)
+
+        blits: list[tuple[pg.Surface, tuple[float, float]]] = []
+        for rows in self._background_chunks:
+            for row_index in range(first_row, min(last_row + 1, len(rows))):
+                row = rows[row_index]
+                for column_index in range(first_column, min(last_column + 1, len(row))):
+                    chunk = row[column_index]
+                    if chunk is not None:
+                        blits.append(
+                            (chunk, (column_index * size - view_x, row_index * size - view_y))
+                        )
+        self._display.blits(blits, doreturn=False)
 
 
 _renderer: Renderer = Renderer()
 
+
+def background_set_flatten(flatten: bool) -> None:
+    """Composite all of a room's background layers into one when it starts, rather than drawing
+    each layer separately. Takes effect from the next `room_goto`."""
+    _renderer.background_flatten = flatten
+
+
 Color = pg.Color
 
 c_aqua: Color = Color(0, 255, 255)
@@ -157,7 +239,9 @@ def draw_sprite(
         image = pg.transform.scale(
             image, (int(image.get_width() * x_scale), int(image.get_height() * y_scale))
         )
-    image.set_alpha(int(alpha * 255))
     if color != c_white:
+        # Tint a copy with per-pixel alpha, so neither the sprite's image nor its colour key changes
+        image = image.convert_alpha()
         image.fill(color, special_flags=pg.BLEND_MULT)
+    image.set_alpha(int(alpha * 255))
     _renderer._display.blit(image, (x, y))
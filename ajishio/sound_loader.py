@@ -1,8 +1,12 @@
 import pygame as pg
-from ajishio.game_sound import GameSound
+from ajishio.game_sound import GameSound, GameMusic
 from pathlib import Path
 from ajishio.utils import remove_ext
 
+# Files bigger than this, or named with one of these prefixes, are streamed instead of decoded
+music_stream_threshold: int = 1024 * 1024  # bytes
+music_prefixes: tuple[str, ...] = ("music_", "bgm_")
+
 
 def load_sounds(sounds_directory: Path) -> dict[str, GameSound]:
     return {
@@ -11,6 +15,14 @@ def load_sounds(sounds_directory: Path) -> dict[str, GameSound]:
     }
 
 
-def load_sound(sound_file: Path) -> GameSound:
+def load_sound(sound_file: Path, stream: bool | None = None) -> GameSound:
+    if stream is None:
+        stream = sound_file.name.startswith(music_prefixes) or (
+            sound_file.stat().st_size > music_stream_threshold
+        )
+
+    if stream:
+        return GameMusic(sound_file)
+
     sound: pg.mixer.Sound = pg.mixer.Sound(str(sound_file))
     return GameSound(sound)
@@ -3,6 +3,7 @@ import pygame as pg
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
+from ajishio.pixel_format import _pixel_format, optimise_surface
 
 
 @dataclass
@@ -11,6 +12,12 @@ class GameSprite:
     width: int
     height: int
 
+    def __post_init__(self) -> None:
+        _pixel_format.track(self)
+
+    def _convert_surfaces(self) -> None:
+        self.images[:] = [optimise_surface(image) for image in self.images]
+
 
 def load_aseprite_sprites(sprites_directory: Path) -> dict[str, GameSprite]:
     alphabetical_sprite_dirs: list[Path] = sorted(sprites_directory.iterdir())
@@ -28,10 +35,12 @@ def load_aseprite_sprite(sprite_dir: Path) -> GameSprite:
     sprite_info: dict[str, Any] = json.loads(json_path.read_text())
     frames: dict[str, Any] = sprite_info["frames"]
 
+    with open(png_path, "rb") as f:
+        sheet: pg.Surface = pg.image.load(f)
+
     for data in frames.values():
         dims: dict[str, int] = data["frame"]
         x, y, w, h = dims["x"], dims["y"], dims["w"], dims["h"]
-        with open(png_path, "rb") as f:
-            images.append(pg.image.load(f).subsurface(pg.Rect(x, y, w, h)))
+        images.append(sheet.subsurface(pg.Rect(x, y, w, h)))
 
     return GameSprite(images, w, h)
@@ -0,0 +1,186 @@
+from __future__ import annotations
+from functools import partial
+from heapq import heapify, heappop, heappush
+from itertools import count
+from typing import Callable, Iterator
+
+# Import classes only for type hinting, must avoid circular imports
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ajishio.game_object import GameObject
+
+
+class Timer:
+    """A callback waiting to be called once, or every `interval` seconds, by the engine. Cancel it
+    with `cancel`."""
+
+    def __init__(
+        self,
+        time: float,
+        callback: Callable[[], object],
+        interval: float | None = None,
+        owner: GameObject | None = None,
+    ) -> None:
+        self.time: float = time  # when it next fires, in `Timers.time`
+        self.callback: Callable[[], object] = callback
+        self.interval: float | None = interval
+        self.owner: GameObject | None = owner
+        self.active: bool = True
+        self._suspended: bool = False
+
+        # Which of its entries in the heap is current, as entries left behind by suspending it stay
+        self._order: int = -1
+
+    @property
+    def remaining(self) -> float:
+        """Seconds until the timer next fires."""
+        if self._suspended:
+            return self.time
+        return max(self.time - _timers.time, 0)
+
+    def cancel(self) -> None:
+        _timers.cancel(self)
+
+
+class Alarms:
+    """GameMaker style alarms for one object. Setting `obj.alarm[n] = seconds` calls
+    `obj.on_alarm(n)` once that many seconds later. Reading `obj.alarm[n]` gives the seconds left,
+    or -1 if the alarm isn't set, and setting it to -1 cancels it."""
+
+    def __init__(self, owner: GameObject) -> None:
+        self._owner: GameObject = owner
+        self._timers: dict[int, Timer] = {}
+
+    def __getitem__(self, index: int) -> float:
+        timer: Timer | None = self._timers.get(index)
+        if timer is None or not (timer.active or timer._suspended):
+            return -1
+        return timer.remaining
+
+    def __setitem__(self, index: int, seconds: float) -> None:
+        timer: Timer | None = self._timers.pop(index, None)
+        if timer is not None:
+            timer.cancel()
+        if seconds >= 0:
+            self._timers[index] = _timers.schedule(
+                seconds, partial(self._owner.on_alarm, index), self._owner
+            )
+
+
+class Timers:
+    _instance: Timers | None = None
+
+    def __new__(cls) -> Timers:
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        # Seconds of game time counted so far. Timers are kept in a heap by when they fire, so each
+        # frame only the timers which fire are touched, however many are waiting
+        self.time: float = 0
+        self._heap: list[tuple[float, int, Timer]] = []
+
+        # Breaks ties between timers due at the same time, so they fire in the order they were set
+        self._order: Iterator[int] = count()
+
+        # Cancelled timers stay in the heap until they come up, unless they start to outnumber the
+        # rest
+        self._cancelled: int = 0
+
+    def schedule(
+        self, delay: float, callback: Callable[[], object], owner: GameObject | None = None
+    ) -> Timer:
+        """Call `callback` once, `delay` seconds from now. If `owner` is given, the timer is
+        cancelled when it's destroyed."""
+        return self._add(Timer(self.time + delay, callback, None, owner))
+
+    def every(
+        self, interval: float, callback: Callable[[], object], owner: GameObject | None = None
+    ) -> Timer:
+        """Call `callback` every `interval` seconds, starting `interval` seconds from now. If
+        `owner` is given, the timer is cancelled when it's destroyed."""
+        if interval <= 0:
+            raise ValueError(f"Timer interval must be positive, not {interval}")
+        return self._add(Timer(self.time + interval, callback, interval, owner))
+
+    def cancel(self, timer: Timer) -> None:
+        timer._suspended = False
+        if not timer.active:
+            return
+        timer.active = False
+        self._cancelled += 1
+        if self._cancelled > 64 and self._cancelled * 2 > len(self._heap):
+            self._heap[:] = [entry for entry in self._heap if self._current(entry)]
+            heapify(self._heap)
+            self._cancelled = 0
+
+    def cancel_owned(self, owner: GameObject) -> None:
+        """Cancel every timer and alarm belonging to `owner`."""
+        for timer in owner._timers:
+            timer.cancel()
+        owner._timers.clear()
+
+    def suspend_owned(self, owner: GameObject) -> None:
+        """Stop the clock on every timer and alarm belonging to `owner` until `resume_owned`."""
+        for timer in owner._timers:
+            if timer.active:
+                self.cancel(timer)
+                timer.time -= self.time
+                timer._suspended = True
+
+    def resume_owned(self, owner: GameObject) -> None:
+        for timer in owner._timers:
+            if timer._suspended:
+                timer._suspended = False
+                timer.active = True
+                timer.time += self.time
+                self._push(timer)
+
+    def advance(self, delta_time: float, destroyed: set[GameObject]) -> None:
+        """Move game time on by `delta_time` seconds, calling every timer that comes due in order.
+        Timers belonging to objects in `destroyed` don't fire."""
+        self.time += delta_time
+        heap: list[tuple[float, int, Timer]] = self._heap
+        while heap and heap[0][0] <= self.time:
+            entry: tuple[float, int, Timer] = heappop(heap)
+            timer: Timer = entry[2]
+            if not self._current(entry):
+                self._cancelled -= 1
+                continue
+            if timer.owner is not None and timer.owner in destroyed:
+                timer.active = False
+                continue
+
+            # Reschedule before calling back, so the callback can cancel it
+            if timer.interval is None:
+                timer.active = False
+            else:
+                timer.time += timer.interval
+                self._push(timer)
+            timer.callback()
+
+    def _add(self, timer: Timer) -> Timer:
+        if timer.owner is not None:
+            owned: list[Timer] = timer.owner._timers
+            owned[:] = [t for t in owned if t.active or t._suspended]
+            owned.append(timer)
+        self._push(timer)
+        return timer
+
+    def _push(self, timer: Timer) -> None:
+        timer._order = next(self._order)
+        heappush(self._heap, (timer.time, timer._order, timer))
+
+    @staticmethod
+    def _current(entry: tuple[float, int, Timer]) -> bool:
+        return entry[2].active and entry[1] == entry[2]._order
+
+
+_timers: Timers = Timers()
+
+# These do not need to be evaluated at runtime, since they are references to methods, so they go
+# here
+schedule = _timers.schedule
+every = _timers.every
@@ -0,0 +1,82 @@
+"""Compares drawing room backgrounds by blitting every layer whole each frame against blitting only
+the chunks of each layer the view can see, for rooms of increasing size seen through the same
+view.
+
+Run from the root of the repository with `python -m benchmarks.background_render`.
+"""
+
+from __future__ import annotations
+import os
+import random
+import timeit
+from typing import Callable
+
+# The engine opens a window as soon as it's imported, which isn't needed to time blits
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame as pg
+import ajishio as aj
+from ajishio.rendering import _renderer
+
+FRAMES: int = 200
+VIEW_SIZE: tuple[int, int] = (704, 384)
+
+
+def _random_layer(size: tuple[int, int], rng: random.Random, density: float) -> pg.Surface:
+    """A layer of scattered opaque tiles, like a tilemap, with the rest left transparent."""
+    layer = pg.Surface(size, flags=pg.SRCALPHA)
+    for _ in range(int(size[0] * size[1] * density / 256)):
+        color = pg.Color(rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        layer.fill(color, pg.Rect(rng.randrange(size[0]), rng.randrange(size[1]), 16, 16))
+    return layer
+
+
+def _time_frames(draw: Callable[[], None], room_size: tuple[int, int]) -> float:
+    rng = random.Random(1)
+    width, height = room_size
+
+    def frame() -> None:
+        aj.view_set_xport(aj.view_current, rng.uniform(0, width - VIEW_SIZE[0]))
+        aj.view_set_yport(aj.view_current, rng.uniform(0, height - VIEW_SIZE[1]))
+        draw()
+
+    return timeit.timeit(frame, number=FRAMES) / FRAMES
+
+
+def main() -> None:
+    rng = random.Random(1)
+    aj.view_set_wport(aj.view_current, VIEW_SIZE[0])
+    aj.view_set_hport(aj.view_current, VIEW_SIZE[1])
+    _renderer.fit_display()
+
+    print(f"3 layers seen through a {VIEW_SIZE[0]}x{VIEW_SIZE[1]} view, per frame")
+    print(f"{'room':>12}   {'whole layers':>12} {'chunked':>10} {'flattened':>10}   speedup")
+    for size in ((704, 384), (2048, 2048), (4096, 4096), (8192, 4096)):
+        # A filled in backdrop, then a tile layer, then a sparse layer of decorations
+        layers: list[pg.Surface] = [
+            _random_layer(size, rng, density) for density in (64, 0.3, 0.01)
+        ]
+
+        def draw_whole_layers() -> None:
+            for layer in layers:
+                _renderer._display.blit(layer, aj._view.offset)
+
+        whole: float = _time_frames(draw_whole_layers, size)
+
+        _renderer.background_flatten = False
+        _renderer.set_background_images(layers)
+        chunked: float = _time_frames(_renderer.draw_background_images, size)
+
+        _renderer.background_flatten = True
+        _renderer.set_background_images(layers)
+        flattened: float = _time_frames(_renderer.draw_background_images, size)
+
+        print(
+            f"{size[0]:>5}x{size[1]:<6}   {whole * 1e3:>9.2f} ms {chunked * 1e3:>7.2f} ms "
+            f"{flattened * 1e3:>7.2f} ms   {whole / flattened:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Compares actors which wait, flash, move and wait again as a state machine checked in `step`,
+against the same actors written as behaviours that sleep between actions.
+
+Run from the root of the repository with `python -m benchmarks.behaviours`.
+"""
+
+from __future__ import annotations
+import os
+import random
+import timeit
+from typing import Generator
+
+# The engine opens a window as soon as it's imported, which isn't needed to time stepping
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import ajishio as aj
+from ajishio.behaviours import _behaviours
+from ajishio.engine import _engine
+from ajishio.timers import _timers
+
+FRAMES: int = 120
+
+
+class StateMachine(aj.GameObject):
+    def __init__(self, idle: float, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.idle: float = idle
+        self.state: str = "waiting"
+        self.timer: float = 0
+        self.flashing: bool = False
+        self.moves: int = 0
+
+    def step(self) -> None:
+        super().step()
+        self.timer += _engine.delta_time
+        if self.state == "waiting" and self.timer >= self.idle:
+            self.state = "flashing"
+            self.timer = 0
+            self.flashing = True
+        elif self.state == "flashing" and self.timer >= 0.5:
+            self.state = "waiting"
+            self.timer = 0
+            self.flashing = False
+            self.x += 16
+            self.moves += 1
+
+
+class Behaving(aj.GameObject):
+    def __init__(self, idle: float, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.idle: float = idle
+        self.flashing: bool = False
+        self.moves: int = 0
+        self.start_behaviour(self.patrol())
+
+    def patrol(self) -> Generator[aj.Wake, None, None]:
+        while True:
+            yield aj.wait(self.idle)
+            self.flashing = True
+            yield aj.wait(0.5)
+            self.flashing = False
+            self.x += 16
+            self.moves += 1
+
+
+def frame() -> None:
+    for obj in _engine._game_objects.values():
+        obj.step()
+    _behaviours.advance(_engine._game_objects_to_destroy)
+    _timers.advance(_engine.delta_time, _engine._game_objects_to_destroy)
+
+
+def main() -> None:
+    _engine.delta_time = 1 / 60
+    print(f"{'actors':>7}   {'state machine':>13} {'behaviours':>13}")
+    for count in (100, 1000, 10000):
+        times: list[float] = []
+        moves: list[int] = []
+        for cls in (StateMachine, Behaving):
+            rng = random.Random(1)
+            _engine._game_objects.clear()
+            actors = [cls(rng.uniform(0.5, 3)) for _ in range(count)]
+            _engine._add_pending_objects()
+            times.append(timeit.timeit(frame, number=FRAMES) / FRAMES)
+            moves.append(sum(actor.moves for actor in actors))
+            for actor in actors:
+                _behaviours.stop_owned(actor)
+                _timers.cancel_owned(actor)
+        if abs(moves[0] - moves[1]) > count // 50:
+            raise AssertionError(f"{moves[0]} moves as state machines but {moves[1]} as behaviours")
+        print(f"{count:>7}   {times[0] * 1e3:>10.2f} ms {times[1] * 1e3:>10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Compares finding which bullets hit which invaders by having every bullet call `place_meeting`
+against the invader class, against one broadphase collision pass over all objects, for growing
+numbers of both plus a floor of tiles which neither cares about. Then does the same again with each
+kind of object on its own collision layer, the tiles' layer static, and bullets querying the
+invaders' layer rather than their class.
+
+Run from the root of the repository with `python -m benchmarks.broadphase`.
+"""
+
+from __future__ import annotations
+import os
+import random
+import timeit
+
+# The engine opens a window as soon as it's imported, which isn't needed to check collisions
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import ajishio as aj
+from ajishio.collision import _collisions
+from ajishio.engine import _engine
+
+ITERATIONS: int = 5
+ROOM_SIZE: tuple[int, int] = (1280, 720)
+TILES: int = 400
+
+LAYER_TILES: int = 2
+LAYER_INVADERS: int = 4
+LAYER_BULLETS: int = 8
+
+
+class Bullet(aj.GameObject):
+    def __init__(self, x: float = 0, y: float = 0, **kwargs) -> None:
+        super().__init__(x, y, collision_mask=aj.CollisionMask(0, 0, 4, 8), **kwargs)
+        self.hits: int = 0
+
+    def on_collision(self, other: aj.GameObject) -> None:
+        self.hits += 1
+
+
+class Invader(aj.GameObject):
+    def __init__(self, x: float = 0, y: float = 0, **kwargs) -> None:
+        super().__init__(x, y, collision_mask=aj.CollisionMask(0, 0, 24, 16), **kwargs)
+
+
+class Tile(aj.GameObject):
+    def __init__(self, x: float = 0, y: float = 0, **kwargs) -> None:
+        super().__init__(x, y, collision_mask=aj.CollisionMask(0, 0, 16, 16), **kwargs)
+
+
+def _populate(bullets: int, invaders: int, layered: bool, rng: random.Random) -> list[Bullet]:
+    _engine._game_objects.clear()
+    for _ in range(TILES):
+        Tile(rng.uniform(0, ROOM_SIZE[0]), rng.uniform(0, ROOM_SIZE[1]))
+    for _ in range(invaders):
+        Invader(rng.uniform(0, ROOM_SIZE[0]), rng.uniform(0, ROOM_SIZE[1]))
+    bullet_list = [
+        Bullet(rng.uniform(0, ROOM_SIZE[0]), rng.uniform(0, ROOM_SIZE[1])) for _ in range(bullets)
+    ]
+    _engine._add_pending_objects()
+
+    if layered:
+        for obj in _engine._game_objects.values():
+            assert obj.collision_mask is not None
+            obj.collision_mask.layer = {
+                Tile: LAYER_TILES,
+                Invader: LAYER_INVADERS,
+                Bullet: LAYER_BULLETS,
+            }[type(obj)]
+            if isinstance(obj, Bullet):
+                obj.collision_mask.collides_with = LAYER_INVADERS
+        _collisions.invalidate()
+    return bullet_list
+
+
+def main() -> None:
+    rng = random.Random(1)
+    aj.collision_pair(Bullet, Invader)
+    aj.collision_layer_set_static(LAYER_TILES)
+
+    for layered in (False, True):
+        print(
+            f"{TILES} tiles, {'on their own static layer' if layered else 'no layers'}, per frame"
+        )
+        print(
+            f"{'bullets':>8} {'invaders':>8}   {'place_meeting':>13} {'broadphase':>10}   speedup"
+        )
+        for bullets, invaders in ((10, 10), (50, 55), (200, 100), (500, 300)):
+            bullet_list: list[Bullet] = _populate(bullets, invaders, layered, rng)
+            target: type[aj.GameObject] | int = LAYER_INVADERS if layered else Invader
+
+            def pull() -> int:
+                return sum(
+                    bullet.place_meeting(bullet.x, bullet.y, target) is not None
+                    for bullet in bullet_list
+                )
+
+            def push() -> int:
+                for bullet in bullet_list:
+                    bullet.hits = 0
+                _collisions.collision_pass(set())
+                return sum(bullet.hits > 0 for bullet in bullet_list)
+
+            if pull() != push():
+                raise AssertionError("The broadphase pass found different hits to place_meeting")
+
+            pull_time: float = timeit.timeit(pull, number=ITERATIONS) / ITERATIONS
+            push_time: float = timeit.timeit(push, number=ITERATIONS) / ITERATIONS
+            print(
+                f"{bullets:>8} {invaders:>8}   {pull_time * 1e3:>10.2f} ms "
+                f"{push_time * 1e3:>7.2f} ms   {pull_time / push_time:6.1f}x"
+            )
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Compares the multiplayer demo's packet codec against the original approach of building every
+packet with `struct.pack` format strings, identifying players by 16 byte UUIDs, slicing off the
+header and dispatching with `match` and `isinstance` chains.
+
+Run from the root of the repository with `python -m benchmarks.packet_codec`.
+"""
+
+from __future__ import annotations
+import enum
+from abc import ABC, abstractmethod
+import struct
+import timeit
+from uuid import UUID, uuid4
+import demo_projects.multiplayer.shared.packet as pck
+
+ITERATIONS: int = 100_000
+
+
+class _LegacyMessageType(enum.Enum):
+    PLAYER_X_INPUT = 2
+    OTHER_PLAYER_POSITION = 4
+
+
+class _LegacyPacket(ABC):
+    def __init__(self, message_type: _LegacyMessageType) -> None:
+        self.message_type = message_type
+        self.header = struct.pack("!B", self.message_type.value)
+
+    @abstractmethod
+    def pack(self) -> bytes:
+        pass
+
+
+class _LegacyPlayerXInputPacket(_LegacyPacket):
+    def __init__(self, player_id: UUID, x_input: int) -> None:
+        super().__init__(_LegacyMessageType.PLAYER_X_INPUT)
+        self.player_id = player_id
+        self.x_input = x_input
+
+    def pack(self) -> bytes:
+        return self.header + struct.pack("!16sb", self.player_id.bytes, self.x_input)
+
+    @staticmethod
+    def unpack(data: bytes) -> _LegacyPlayerXInputPacket:
+        player_id, x_input = struct.unpack("!16sb", data)
+        return _LegacyPlayerXInputPacket(UUID(bytes=player_id), x_input)
+
+
+class _LegacyOtherPlayerPositionPacket(_LegacyPacket):
+    def __init__(self, player_id: UUID, x: float, y: float) -> None:
+        super().__init__(_LegacyMessageType.OTHER_PLAYER_POSITION)
+        self.player_id = player_id
+        self.x = x
+        self.y = y
+
+    def pack(self) -> bytes:
+        return self.header + struct.pack("!16sff", self.player_id.bytes, self.x, self.y)
+
+    @staticmethod
+    def unpack(data: bytes) -> _LegacyOtherPlayerPositionPacket:
+        player_id, x, y = struct.unpack("!16sff", data)
+        return _LegacyOtherPlayerPositionPacket(UUID(bytes=player_id), x, y)
+
+
+def _legacy_unpack(data: bytes) -> _LegacyPacket:
+    header_byte, body = data[0], data[1:]
+    match _LegacyMessageType(header_byte):
+        case _LegacyMessageType.PLAYER_X_INPUT:
+            return _LegacyPlayerXInputPacket.unpack(body)
+        case _LegacyMessageType.OTHER_PLAYER_POSITION:
+            return _LegacyOtherPlayerPositionPacket.unpack(body)
+        case _:
+            raise ValueError("Invalid packet type")
+
+
+def _legacy_handle(packet: _LegacyPacket) -> None:
+    if isinstance(packet, _LegacyOtherPlayerPositionPacket):
+        pass
+    elif isinstance(packet, _LegacyPlayerXInputPacket):
+        pass
+
+
+def _report(name: str, legacy: float, codec: float) -> None:
+    per_legacy = legacy / ITERATIONS * 1e9
+    per_codec = codec / ITERATIONS * 1e9
+    print(
+        f"{name:<28} legacy {per_legacy:8.0f} ns   codec {per_codec:8.0f} ns   "
+        f"speedup {legacy / codec:4.1f}x"
+    )
+
+
+def main() -> None:
+    legacy_player_id = uuid4()
+    player_id = 1
+
+    legacy_input = _LegacyPlayerXInputPacket(legacy_player_id, 1)
+    codec_input = pck.PlayerXInputPacket(player_id, 1)
+    legacy_position = _LegacyOtherPlayerPositionPacket(legacy_player_id, 123.5, 456.25)
+    codec_position = pck.OtherPlayerPositionPacket(player_id, 123.5, 456.25)
+
+    legacy_input_data = legacy_input.pack()
+    codec_input_data = codec_input.pack()
+    print(
+        f"{'x input packet size':<28} legacy {len(legacy_input_data):5d} B    "
+        f"codec {len(codec_input_data):5d} B"
+    )
+
+    handlers = pck.PacketHandlers()
+    handlers.register(pck.PlayerXInputPacket, lambda packet: None)
+    handlers.register(pck.OtherPlayerPositionPacket, lambda packet: None)
+
+    buffer = bytearray(64)
+
+    _report(
+        "construct + pack",
+        timeit.timeit(
+            lambda: _LegacyPlayerXInputPacket(legacy_player_id, 1).pack(), number=ITERATIONS
+        ),
+        timeit.timeit(
+            lambda: pck.PlayerXInputPacket(player_id, 1).pack_into(buffer, 0), number=ITERATIONS
+        ),
+    )
+    _report(
+        "pack position",
+        timeit.timeit(legacy_position.pack, number=ITERATIONS),
+        timeit.timeit(lambda: codec_position.pack_into(buffer, 0), number=ITERATIONS),
+    )
+    _report(
+        "unpack + dispatch",
+        timeit.timeit(lambda: _legacy_handle(_legacy_unpack(legacy_input_data)), number=ITERATIONS),
+        timeit.timeit(lambda: handlers.dispatch(pck.unpack(codec_input_data)), number=ITERATIONS),
+    )
+
+    # A datagram as the server would receive it, holding one tick's worth of messages
+    batch: list[pck.Message] = [
+        (packet, i if packet.channel is not pck.Channel.UNRELIABLE else None)
+        for i, packet in enumerate([codec_input, codec_position] * 10)
+    ]
+    legacy_datagrams = [p.pack() for p in [legacy_input, legacy_position] * 10]
+    codec_datagram = bytes(next(pck.pack_batch(batch))[0])
+
+    def legacy_receive() -> None:
+        for data in legacy_datagrams:
+            _legacy_handle(_legacy_unpack(data))
+
+    def codec_receive() -> None:
+        for packet, _ in pck.unpack_batch(codec_datagram):
+            handlers.dispatch(packet)
+
+    _report(
+        "receive 20 messages",
+        timeit.timeit(legacy_receive, number=ITERATIONS // 20) * 20,
+        timeit.timeit(codec_receive, number=ITERATIONS // 20) * 20,
+    )
+
+
+if __name__ == "__main__":
+    main()
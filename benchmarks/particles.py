@@ -0,0 +1,81 @@
+"""Compares stepping and drawing a burst of particles made of one `GameObject` each, drawn with
+`draw_rectangle`, against the same number in one numpy backed `ParticleSystem`.
+
+Run from the root of the repository with `python -m benchmarks.particles`. Needs numpy.
+"""
+
+from __future__ import annotations
+import os
+import random
+import timeit
+
+# The engine opens a window as soon as it's imported, which isn't needed to time drawing
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import ajishio as aj
+from ajishio.engine import _engine
+from ajishio.rendering import _renderer
+
+FRAMES: int = 20
+SPARK = aj.ParticleType(
+    size=3, colors=[aj.c_yellow, aj.c_orange, aj.c_red], alpha=(1, 0), life=(100, 100)
+)
+
+
+class Spark(aj.GameObject):
+    def __init__(self, x: float, y: float, rng: random.Random) -> None:
+        super().__init__(x, y)
+        speed: float = rng.uniform(*SPARK.speed)
+        direction: float = rng.uniform(*SPARK.direction)
+        self.x_velocity: float = aj.lengthdir_x(speed, direction)
+        self.y_velocity: float = aj.lengthdir_y(speed, direction)
+        self.life: float = rng.uniform(*SPARK.life)
+
+    def step(self) -> None:
+        self.x += self.x_velocity * _engine.delta_time
+        self.y += self.y_velocity * _engine.delta_time
+        self.life -= _engine.delta_time
+        if self.life <= 0:
+            aj.instance_destroy(self)
+
+    def draw(self) -> None:
+        aj.draw_rectangle(self.x, self.y, SPARK.size, SPARK.size, color=aj.c_orange, alpha=0.5)
+
+
+def main() -> None:
+    rng = random.Random(1)
+    _engine.delta_time = 1 / 60
+    _renderer.fit_display()
+
+    print(f"{'':>9}   {'step':>21}   {'draw':>21}")
+    print(f"{'particles':>9}   {'objects':>10} {'system':>10}   {'objects':>10} {'system':>10}")
+    for count in (100, 1000, 5000):
+        _engine._game_objects.clear()
+        sparks = [Spark(352, 192, rng) for _ in range(count)]
+        _engine._add_pending_objects()
+        system = aj.ParticleSystem(SPARK, capacity=count)
+        system.burst(352, 192, count)
+
+        def objects_step() -> None:
+            for spark in sparks:
+                spark.step()
+
+        def objects_draw() -> None:
+            for spark in sparks:
+                spark.draw()
+
+        times: list[float] = [
+            timeit.timeit(frame, number=FRAMES) / FRAMES
+            for frame in (objects_step, system.step, objects_draw, system.draw)
+        ]
+        if system.count != count:
+            raise AssertionError(f"{count - system.count} particles died early")
+        print(
+            f"{count:>9}   "
+            + "   ".join(f"{times[i] * 1e3:>7.2f} ms {times[i + 1] * 1e3:>7.2f} ms" for i in (0, 2))
+        )
+
+
+if __name__ == "__main__":
+    main()
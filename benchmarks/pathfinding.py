@@ -0,0 +1,84 @@
+"""Compares sending a crowd of agents after one goal by running A* for every agent against looking
+each one's next step up in a single flow field shared by all of them, on a large random tilemap
+and on the roguelike demo's first room.
+
+Run from the root of the repository with `python -m benchmarks.pathfinding`.
+"""
+
+from __future__ import annotations
+import os
+import random
+import timeit
+from pathlib import Path
+
+# The engine opens a window as soon as it's imported, which isn't needed to find paths
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import ajishio as aj
+
+ITERATIONS: int = 3
+
+_roguelike_rooms: Path = (
+    Path(__file__).parent.parent / "demo_projects" / "roguelike" / "rooms" / "rooms" / "simplified"
+)
+
+
+def _random_level(size: int, rng: random.Random) -> aj.GameLevel:
+    tilemap: list[list[bool]] = [[rng.random() < 0.25 for _ in range(size)] for _ in range(size)]
+    return aj.GameLevel({"Wall": tilemap}, {"Wall": (32, 32)}, {}, (size * 32, size * 32), {})
+
+
+def _walkable_cells(grid: aj.NavGrid) -> list[tuple[int, int]]:
+    return [(x, y) for y in range(grid.height) for x in range(grid.width) if grid.walkable(x, y)]
+
+
+def _compare(name: str, grid: aj.NavGrid, agents: int, rng: random.Random) -> None:
+    cells: list[tuple[int, int]] = _walkable_cells(grid)
+    goal: tuple[int, int] = rng.choice(cells)
+    starts: list[tuple[int, int]] = [rng.choice(cells) for _ in range(agents)]
+
+    # Every agent's path must be as long as the flow field says it is
+    field: aj.FlowField = grid.flow_field(goal)
+    for start in starts:
+        path = grid.path(start, goal)
+        if (path is None) != (field.next_step(*start) is None):
+            raise AssertionError(f"A* and the flow field disagree on whether {start} can reach")
+        if path is not None and len(path) - 1 != field.distance(*start):
+            raise AssertionError(f"A* found a path of a different length from {start}")
+
+    def a_star() -> None:
+        for start in starts:
+            grid.path(start, goal)
+
+    def flow_field() -> None:
+        # Throw the cached field away, as a tile changing would
+        grid.invalidate()
+        for start in starts:
+            grid.next_step(start, goal)
+
+    a_star_time: float = timeit.timeit(a_star, number=ITERATIONS) / ITERATIONS
+    flow_time: float = timeit.timeit(flow_field, number=ITERATIONS) / ITERATIONS
+    print(
+        f"{name:>12} {agents:>7}   {a_star_time * 1e3:>8.2f} ms {flow_time * 1e3:>8.2f} ms   "
+        f"{a_star_time / flow_time:6.1f}x"
+    )
+
+
+def main() -> None:
+    rng = random.Random(1)
+    room: aj.GameLevel = aj.load_ldtk_levels(_roguelike_rooms)[0]
+    grids: dict[str, aj.NavGrid] = {
+        "128x128": aj.nav_grid(_random_level(128, rng), "Wall"),
+        "roguelike": aj.nav_grid(room, "Wall"),
+    }
+
+    print("one goal, with the flow field recomputed every frame as if a tile changed each time")
+    print(f"{'grid':>12} {'agents':>7}   {'A* each':>11} {'flow field':>11}   speedup")
+    for name, grid in grids.items():
+        for agents in (1, 10, 50, 200):
+            _compare(name, grid, agents, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Compares checking line of sight across a room of wall tiles by probing `place_meeting` with a
+one pixel object at every pixel along the line, against one `raycast` over the walls' collision
+layer with the layer dynamic and then static.
+
+Run from the root of the repository with `python -m benchmarks.raycast`.
+"""
+
+from __future__ import annotations
+import math
+import os
+import random
+import timeit
+
+# The engine opens a window as soon as it's imported, which isn't needed to check collisions
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import ajishio as aj
+from ajishio.engine import _engine
+
+RAYS: int = 200
+TILE_SIZE: int = 32
+ROOM_TILES: tuple[int, int] = (40, 30)
+LAYER_WALLS: int = 2
+
+
+class Wall(aj.GameObject):
+    def __init__(self, x: float = 0, y: float = 0, **kwargs) -> None:
+        super().__init__(
+            x,
+            y,
+            collision_mask=aj.CollisionMask(0, 0, TILE_SIZE, TILE_SIZE, LAYER_WALLS),
+            **kwargs,
+        )
+
+
+class Probe(aj.GameObject):
+    def __init__(self, x: float = 0, y: float = 0, **kwargs) -> None:
+        super().__init__(x, y, collision_mask=aj.CollisionMask(0, 0, 1, 1), **kwargs)
+
+
+def main() -> None:
+    rng = random.Random(1)
+    width: int = ROOM_TILES[0] * TILE_SIZE
+    height: int = ROOM_TILES[1] * TILE_SIZE
+    for column in range(ROOM_TILES[0]):
+        for row in range(ROOM_TILES[1]):
+            if rng.random() < 0.08:
+                Wall(column * TILE_SIZE, row * TILE_SIZE)
+    probe = Probe()
+    _engine._add_pending_objects()
+
+    rays: list[tuple[float, float, float, float]] = [
+        (
+            rng.uniform(0, width),
+            rng.uniform(0, height),
+            rng.uniform(0, width),
+            rng.uniform(0, height),
+        )
+        for _ in range(RAYS)
+    ]
+
+    def probe_line(x1: float, y1: float, x2: float, y2: float) -> bool:
+        steps: int = max(int(math.hypot(x2 - x1, y2 - y1)), 1)
+        return any(
+            probe.place_meeting(x1 + (x2 - x1) * i / steps, y1 + (y2 - y1) * i / steps, Wall)
+            for i in range(steps + 1)
+        )
+
+    def probe_all() -> int:
+        return sum(probe_line(*ray) for ray in rays)
+
+    def raycast_all() -> int:
+        return sum(aj.raycast(*ray, LAYER_WALLS) is not None for ray in rays)
+
+    probe_time: float = timeit.timeit(probe_all, number=1) / RAYS
+    print(f"{len(_engine._game_objects) - 1} walls, per line of sight check")
+    print(f"{'place_meeting every pixel':>28}: {probe_time * 1e6:9.1f} us")
+    for static in (False, True):
+        aj.collision_layer_set_static(LAYER_WALLS, static)
+        blocked: int = raycast_all()
+        raycast_time: float = timeit.timeit(raycast_all, number=10) / (10 * RAYS)
+        print(
+            f"{'raycast, ' + ('static' if static else 'dynamic') + ' layer':>28}: "
+            f"{raycast_time * 1e6:9.1f} us   {probe_time / raycast_time:6.1f}x, "
+            f"{blocked}/{RAYS} blocked"
+        )
+    print(f"{'':>28}  place_meeting found {probe_all()}/{RAYS} blocked")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Compares walking back and forth between two rooms when each is built again on arrival against
+keeping the room left behind suspended with `room_set_cache_size`, for rooms of increasing size.
+Every coin runs a behaviour, so suspending and restoring them is timed too.
+
+Run from the root of the repository with `python -m benchmarks.room_cache`.
+"""
+
+from __future__ import annotations
+import os
+import random
+import timeit
+from typing import Generator
+
+# The engine opens a window as soon as it's imported, which isn't needed to change rooms
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame as pg
+import ajishio as aj
+from ajishio.behaviours import _behaviours
+from ajishio.engine import _engine
+
+TRIPS: int = 10
+TILE_SIZE: int = 16
+
+
+class Floor(aj.GameObject):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.collision_mask = aj.CollisionMask(0, 0, self.width, self.height)
+
+
+class Coin(aj.GameObject):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.spins: int = 0
+        self.start_behaviour(self.spin())
+
+    def spin(self) -> Generator[aj.Wake, None, None]:
+        # Waits on each kind of wake which is set aside while the coin's room is suspended
+        while True:
+            yield aj.next_frame()
+            self.spins += 1
+            yield aj.wait_until(lambda: self.spins % 2 == 1)
+
+
+def _room(tiles: int, rng: random.Random) -> aj.GameLevel:
+    tilemap: list[list[bool]] = [[rng.random() < 0.3 for _ in range(tiles)] for _ in range(tiles)]
+    background = pg.Surface((tiles * TILE_SIZE, tiles * TILE_SIZE), flags=pg.SRCALPHA)
+    for y, row in enumerate(tilemap):
+        for x, cell in enumerate(row):
+            if cell:
+                background.fill(pg.Color(90, 60, 40), (x * TILE_SIZE, y * TILE_SIZE, 16, 16))
+    coins: list[dict[str, float]] = [
+        {"x": rng.uniform(0, tiles * TILE_SIZE), "y": rng.uniform(0, tiles * TILE_SIZE)}
+        for _ in range(tiles * 8)
+    ]
+    return aj.GameLevel(
+        {"Floor": tilemap},
+        {"Floor": (TILE_SIZE, TILE_SIZE)},
+        {"Floor": background},
+        (tiles * TILE_SIZE, tiles * TILE_SIZE),
+        {"Coin": coins},
+    )
+
+
+def main() -> None:
+    aj.register_objects(Floor, Coin)
+    print(f"{'room':>9} {'objects':>8}   {'rebuilt':>10} {'cached':>10}")
+    for tiles in (16, 64, 128):
+        rng = random.Random(1)
+        aj.set_rooms([_room(tiles, rng), _room(tiles, rng)])
+
+        def frame() -> None:
+            _engine._add_pending_objects()
+            _engine._free_destroyed_objects()
+            _behaviours.advance(_engine._game_objects_to_destroy)
+
+        def trip() -> None:
+            for room in (1, 0):
+                aj.room_goto(room)
+                frame()
+
+        times: list[float] = []
+        for cache_size in (0, 1):
+            aj.room_set_cache_size(cache_size)
+            aj.game_restart()
+            frame()
+            trip()
+            times.append(timeit.timeit(trip, number=TRIPS) / (2 * TRIPS))
+        print(
+            f"{tiles:>4}x{tiles:<4} {len(_engine._game_objects):>8}   "
+            f"{times[0] * 1e3:>7.2f} ms {times[1] * 1e3:>7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Compares loading a room's tiles and entities the way `room_goto` used to, looking each tile's class
+up by name and checking every entity against every object made so far, against `room_goto` making
+each layer in one `from_tiles` call, with and without `merge_tiles`. Each column gives the time to
+load the room and how many objects it made.
+
+Run from the root of the repository with `python -m benchmarks.room_load`.
+"""
+
+from __future__ import annotations
+import os
+import random
+import timeit
+
+# The engine opens a window as soon as it's imported, which isn't needed to load rooms
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import ajishio as aj
+from ajishio.engine import _engine
+
+LOADS: int = 5
+TILE_SIZE: int = 16
+
+
+class Floor(aj.GameObject):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.collision_mask = aj.CollisionMask(0, 0, self.width, self.height)
+
+
+class Coin(aj.GameObject):
+    pass
+
+
+def _room(tiles: int, rng: random.Random) -> aj.GameLevel:
+    # Mostly solid ground with gaps, like a platformer's floors and walls
+    tilemap: list[list[bool]] = [
+        [y > tiles // 2 and rng.random() < 0.9 for _ in range(tiles)] for y in range(tiles)
+    ]
+    coins: list[dict[str, float]] = [
+        {"x": rng.uniform(0, tiles * TILE_SIZE), "y": rng.uniform(0, tiles * TILE_SIZE)}
+        for _ in range(tiles * 4)
+    ]
+    return aj.GameLevel(
+        {"Floor": tilemap},
+        {"Floor": (TILE_SIZE, TILE_SIZE)},
+        {},
+        (tiles * TILE_SIZE, tiles * TILE_SIZE),
+        {"Coin": coins},
+    )
+
+
+def _load_per_cell(level: aj.GameLevel) -> None:
+    namespace: dict[str, type[aj.GameObject]] = {"Floor": Floor, "Coin": Coin}
+    for layer, tilemap in level.tilemaps.items():
+        tile_size: tuple[int, int] = level.tile_sizes[layer]
+        for y, row in enumerate(tilemap):
+            for x, cell in enumerate(row):
+                if cell:
+                    try:
+                        tile_cls: type = namespace[layer]
+                    except KeyError:
+                        raise ValueError(f"{layer} object not found")
+                    tile_cls(
+                        x * tile_size[0], y * tile_size[1], width=tile_size[0], height=tile_size[1]
+                    )
+    for entity_type, entities in level.entities.items():
+        for entity in entities:
+            entity_cls: type[aj.GameObject] = namespace[entity_type]
+            if not (_engine.instance_exists(entity_cls) and entity_cls.persistent):
+                entity_cls(**entity)
+
+
+def main() -> None:
+    aj.register_objects(Floor, Coin)
+    print(f"{'room':>9}   {'per cell':>18} {'from_tiles':>18} {'merged':>18}")
+    for tiles in (32, 64, 128):
+        level: aj.GameLevel = _room(tiles, random.Random(1))
+        aj.set_rooms([level])
+
+        def load(how: str) -> int:
+            _engine._game_objects.clear()
+            _engine._game_objects_to_add.clear()
+            if how == "per cell":
+                _load_per_cell(level)
+            else:
+                Floor.merge_tiles = how == "merged"
+                aj.room_goto(0)
+            return len(_engine._game_objects_to_add)
+
+        columns: list[str] = []
+        for how in ("per cell", "from_tiles", "merged"):
+            objects: int = load(how)
+            load_time: float = timeit.timeit(lambda: load(how), number=LOADS) / LOADS
+            columns.append(f"{load_time * 1e3:>8.2f} ms {objects:>6}")
+        print(f"{tiles:>4}x{tiles:<4}   " + " ".join(columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Checks the round trip error of the multiplayer demo's quantised positions, and compares how many
+bytes it takes to tell a player where everyone else is: one float32 position message per entity,
+a byte-aligned snapshot of 16-bit fixed point positions, and the bit-packed snapshot actually sent.
+
+Run from the root of the repository with `python -m benchmarks.snapshot_size`.
+"""
+
+from __future__ import annotations
+import random
+import struct
+import timeit
+import demo_projects.multiplayer.shared as shared
+import demo_projects.multiplayer.shared.packet as pck
+import demo_projects.multiplayer.shared.snapshot as snap
+from demo_projects.multiplayer.shared.quantise import POSITION_X, POSITION_Y, Quantiser
+
+SAMPLES: int = 100_000
+ITERATIONS: int = 2_000
+
+# Every message in a datagram is preceded by its length
+_LENGTH_PREFIX_SIZE: int = 2
+
+# The byte-aligned snapshot layout: the same header, then each entity's ID and field mask followed
+# by a u16 per changed field, then a u16 per removed entity
+_ALIGNED_HEADER_SIZE: int = struct.calcsize("!BIIIIHH")
+_ALIGNED_ENTITY_SIZE: int = struct.calcsize("!HB")
+_ALIGNED_FIELD_SIZE: int = struct.calcsize("!H")
+
+# A float32 position message, as the relay mode's OtherPlayerPositionPacket used to be
+_FLOAT_POSITION_SIZE: int = struct.calcsize("!BHff")
+
+
+def _check_round_trip(name: str, quantiser: Quantiser, rng: random.Random) -> None:
+    worst: float = 0
+    for _ in range(SAMPLES):
+        value: float = rng.uniform(quantiser.minimum, quantiser.maximum)
+        worst = max(worst, abs(quantiser.dequantise(quantiser.quantise(value)) - value))
+    if worst > quantiser.max_error + 1e-9:
+        raise AssertionError(f"{name} round trip error {worst} is over {quantiser.max_error}")
+
+    for value, expected in ((quantiser.minimum - 100, quantiser.minimum), (1e9, quantiser.maximum)):
+        if abs(quantiser.dequantise(quantiser.quantise(value)) - expected) > quantiser.max_error:
+            raise AssertionError(f"{name} doesn't clamp {value} to {expected}")
+
+    print(
+        f"{name:<12} {quantiser.minimum:g} to {quantiser.maximum:g} in {quantiser.bits} bits, "
+        f"max round trip error {worst:.4f} px (bound {quantiser.max_error:.4f})"
+    )
+
+
+def _check_packet_round_trip(rng: random.Random) -> None:
+    worst: float = 0
+    for _ in range(SAMPLES // 10):
+        x: float = rng.uniform(0, shared.room_width)
+        y: float = rng.uniform(0, shared.room_height)
+        packet = pck.unpack(pck.OtherPlayerPositionPacket(1, x, y).pack())
+        assert isinstance(packet, pck.OtherPlayerPositionPacket)
+        worst = max(worst, abs(packet.x - x), abs(packet.y - y))
+    if worst > max(POSITION_X.max_error, POSITION_Y.max_error) + 1e-9:
+        raise AssertionError(f"Position packet round trip error {worst} is too big")
+    print(f"{'packets':<12} max round trip error {worst:.4f} px")
+
+
+def _aligned_size(delta: snap.SnapshotDelta) -> int:
+    size: int = _ALIGNED_HEADER_SIZE + len(delta.removed) * _ALIGNED_FIELD_SIZE
+    for change in delta.changed:
+        size += _ALIGNED_ENTITY_SIZE
+        size += _ALIGNED_FIELD_SIZE * bin(change.mask).count("1")
+    return size
+
+
+def _random_world(count: int, rng: random.Random) -> snap.Snapshot:
+    return {
+        entity_id: (
+            POSITION_X.quantise(rng.uniform(0, shared.room_width)),
+            POSITION_Y.quantise(rng.uniform(0, shared.room_height)),
+        )
+        for entity_id in range(count)
+    }
+
+
+def _moved(world: snap.Snapshot, rng: random.Random) -> snap.Snapshot:
+    """The world a tick later, with half the entities walking and a few of those falling too."""
+    moved: snap.Snapshot = dict(world)
+    for entity_id, (x, y) in world.items():
+        if rng.random() < 0.5:
+            fallen: int = min(y + 64, POSITION_Y.steps) if rng.random() < 0.2 else y
+            moved[entity_id] = (min(x + 48, POSITION_X.steps), fallen)
+    return moved
+
+
+def main() -> None:
+    rng = random.Random(1)
+
+    _check_round_trip("x", POSITION_X, rng)
+    _check_round_trip("y", POSITION_Y, rng)
+    _check_packet_round_trip(rng)
+    print()
+
+    print(
+        f"{'entities':>8} {'snapshot':>8}   {'float32':>8} {'aligned':>8} {'packed':>8}   "
+        f"{'saved vs float32':>16}"
+    )
+    for count in (1, 8, 32, 100):
+        world: snap.Snapshot = _random_world(count, rng)
+        for kind, base, current in (("full", None, world), ("delta", world, _moved(world, rng))):
+            delta: snap.SnapshotDelta = snap.diff(base, current)
+            float_size: int = (_LENGTH_PREFIX_SIZE + _FLOAT_POSITION_SIZE) * len(delta.changed)
+            aligned_size: int = _LENGTH_PREFIX_SIZE + _aligned_size(delta)
+            packet = pck.SnapshotPacket(1, None, delta)
+            unpacked = pck.unpack(packet.pack())
+            assert isinstance(unpacked, pck.SnapshotPacket)
+            if snap.apply(base, unpacked.delta) != current:
+                raise AssertionError(f"{count} entity {kind} snapshot didn't survive a round trip")
+
+            packed_size: int = _LENGTH_PREFIX_SIZE + packet.size()
+            saved: str = f"{1 - packed_size / float_size:.0%}" if float_size else "-"
+            print(
+                f"{count:>8} {kind:>8}   {float_size:>6} B {aligned_size:>6} B {packed_size:>6} B"
+                f"   {saved:>16}"
+            )
+    print()
+
+    # Bit-packing costs some time to pack and unpack, so make sure that stays small
+    snapshot = pck.SnapshotPacket(1, None, snap.diff(None, _random_world(32, rng)))
+    buffer = bytearray(snapshot.size())
+    data = snapshot.pack()
+    pack_time: float = timeit.timeit(lambda: snapshot.pack_into(buffer, 0), number=ITERATIONS)
+    unpack_time: float = timeit.timeit(lambda: pck.unpack(data), number=ITERATIONS)
+    print(
+        f"32 entity snapshot: pack {pack_time / ITERATIONS * 1e6:.1f} us, "
+        f"unpack {unpack_time / ITERATIONS * 1e6:.1f} us"
+    )
+
+
+if __name__ == "__main__":
+    main()
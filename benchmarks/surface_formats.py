@@ -0,0 +1,91 @@
+"""Compares blitting the demo projects' sprites and room backgrounds as they're decoded from PNG
+against blitting them once they've been converted to the display's pixel format, onto both the
+generic per-pixel alpha display the engine used to draw to and one in the screen's format.
+
+Run from the root of the repository with `python -m benchmarks.surface_formats`.
+"""
+
+from __future__ import annotations
+import os
+import timeit
+from pathlib import Path
+
+# The engine opens a window as soon as it's imported, which isn't needed to time blits
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame as pg
+import ajishio as aj
+from ajishio.pixel_format import optimise_surface
+
+BLITS: int = 2_000
+DISPLAY_SIZE: tuple[int, int] = (704, 384)
+
+_demo_projects: Path = Path(__file__).parent.parent / "demo_projects"
+
+
+def _describe(surface: pg.Surface) -> str:
+    if surface.get_colorkey() is not None:
+        return "colour key"
+    if surface.get_flags() & pg.SRCALPHA:
+        return "alpha"
+    return "opaque"
+
+
+def _time_blits(images: list[pg.Surface], display: pg.Surface) -> float:
+    positions: list[tuple[int, int]] = [
+        ((i * 37) % (DISPLAY_SIZE[0] - 16), (i * 23) % (DISPLAY_SIZE[1] - 16)) for i in range(BLITS)
+    ]
+    blits = [(images[i % len(images)], position) for i, position in enumerate(positions)]
+    return timeit.timeit(lambda: display.blits(blits, doreturn=False), number=5) / (5 * BLITS)
+
+
+def main() -> None:
+    screen: pg.Surface = pg.display.get_surface()
+    old_display = pg.Surface(DISPLAY_SIZE, flags=pg.SRCALPHA)
+    new_display = pg.Surface(DISPLAY_SIZE, 0, screen)
+    print(f"screen is {screen.get_bitsize()} bit, masks {screen.get_masks()}\n")
+
+    groups: dict[str, list[pg.Surface]] = {"sprite frames": [], "backgrounds": []}
+    for png_path in sorted(_demo_projects.glob("*/sprites/*/*.png")):
+        groups["sprite frames"].append(pg.image.load(png_path))
+    for png_path in sorted(_demo_projects.glob("*/*/**/simplified/*/*.png")):
+        if not png_path.name.startswith("_composite"):
+            groups["backgrounds"].append(pg.image.load(png_path))
+
+    print(f"{'':>14}   {'decoded':>20} {'converted':>20}")
+    print(f"{'':>14}   {'old':>9} {'new':>10} {'old':>9} {'new':>10}   speedup")
+    for name, images in groups.items():
+        converted: list[pg.Surface] = [optimise_surface(image) for image in images]
+        kinds: dict[str, int] = {}
+        for image in converted:
+            kinds[_describe(image)] = kinds.get(_describe(image), 0) + 1
+
+        times: list[float] = [
+            _time_blits(group, display)
+            for group in (images, converted)
+            for display in (old_display, new_display)
+        ]
+        print(
+            f"{name:>14}   "
+            + " ".join(f"{time * 1e6:>7.2f} us" for time in times)
+            + f"   {times[0] / times[3]:5.1f}x"
+        )
+        print(
+            f"{'':>14}   {len(images)} images: "
+            + ", ".join(f"{count} {kind}" for kind, count in sorted(kinds.items()))
+        )
+
+    # Converting mustn't change what's drawn
+    for image in groups["sprite frames"] + groups["backgrounds"]:
+        expected = pg.Surface(image.get_size(), 0, screen)
+        actual = pg.Surface(image.get_size(), 0, screen)
+        for surface, source in ((expected, image), (actual, optimise_surface(image))):
+            surface.fill(aj.c_teal)
+            surface.blit(source, (0, 0))
+        if pg.image.tobytes(expected, "RGB") != pg.image.tobytes(actual, "RGB"):
+            raise AssertionError("A converted image draws differently to the original")
+
+
+if __name__ == "__main__":
+    main()
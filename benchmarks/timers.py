@@ -0,0 +1,77 @@
+"""Compares objects which count down to something every few seconds by adding `delta_time` in their
+`step`, against the same objects using an alarm and no `step` of their own.
+
+Run from the root of the repository with `python -m benchmarks.timers`.
+"""
+
+from __future__ import annotations
+import os
+import random
+import timeit
+
+# The engine opens a window as soon as it's imported, which isn't needed to time stepping
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import ajishio as aj
+from ajishio.engine import _engine
+from ajishio.timers import _timers
+
+FRAMES: int = 120
+
+
+class CountingDown(aj.GameObject):
+    def __init__(self, interval: float, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.interval: float = interval
+        self.timer: float = 0
+        self.fired: int = 0
+
+    def step(self) -> None:
+        super().step()
+        self.timer += _engine.delta_time
+        if self.timer >= self.interval:
+            self.timer %= self.interval
+            self.fired += 1
+
+
+class Alarmed(aj.GameObject):
+    def __init__(self, interval: float, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.interval: float = interval
+        self.fired: int = 0
+        self.alarm[0] = interval
+
+    def on_alarm(self, index: int) -> None:
+        self.fired += 1
+        self.alarm[0] = self.interval
+
+
+def frame() -> None:
+    for obj in _engine._game_objects.values():
+        obj.step()
+    _timers.advance(_engine.delta_time, _engine._game_objects_to_destroy)
+
+
+def main() -> None:
+    _engine.delta_time = 1 / 60
+    print(f"{'objects':>7}   {'counting down':>13} {'alarms':>13}")
+    for count in (100, 1000, 10000):
+        times: list[float] = []
+        fired: list[int] = []
+        for cls in (CountingDown, Alarmed):
+            rng = random.Random(1)
+            _engine._game_objects.clear()
+            objects = [cls(rng.uniform(1, 5)) for _ in range(count)]
+            _engine._add_pending_objects()
+            times.append(timeit.timeit(frame, number=FRAMES) / FRAMES)
+            fired.append(sum(obj.fired for obj in objects))
+            for obj in objects:
+                _timers.cancel_owned(obj)
+        if abs(fired[0] - fired[1]) > count // 100:
+            raise AssertionError(f"Fired {fired[0]} times counting down but {fired[1]} with alarms")
+        print(f"{count:>7}   {times[0] * 1e3:>10.2f} ms {times[1] * 1e3:>10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
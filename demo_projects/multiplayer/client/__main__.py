@@ -1,105 +1,234 @@
 import ajishio as aj
-from uuid import UUID
-import socket
-import threading
+import argparse
+import logging
+import time
 import demo_projects.multiplayer.shared.game_objects as go
 import demo_projects.multiplayer.shared.packet as pck
+import demo_projects.multiplayer.shared.snapshot as snap
+from demo_projects.multiplayer.shared.quantise import POSITION_X, POSITION_Y
 import demo_projects.multiplayer.shared as shared
-from queue import Queue
+from demo_projects.multiplayer.shared.netcode import InputCommand, InputHistory, InterpolationBuffer
+from demo_projects.multiplayer.shared.netstats import add_netstats_args
+from demo_projects.multiplayer.shared.session import PlayerId, player_name
+from demo_projects.multiplayer.shared.transport import UdpTransport, Address, DEFAULT_PORT
+
+logger = logging.getLogger(__name__)
 
 
 class NetworkClient(aj.GameObject):
-    def __init__(self, *args, **kwargs) -> None:
-        super().__init__(*args, **kwargs)
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.socket.bind(("localhost", 0))
+    # How far the server's idea of where our player was can be from our prediction before we
+    # rewind to it and replay our inputs since
+    prediction_tolerance: float = 1
+
+    # How far in the past other players are drawn, so there's usually a snapshot either side of
+    # that time to blend between. Two snapshots at the server's default rate, plus a bit for jitter
+    interpolation_delay: float = 0.12
 
-        self.packet_queue: Queue = Queue()
+    # The server is pinged this often to measure the round trip time and packet loss
+    ping_interval: float = 1
 
-        self.listen_thread = threading.Thread(target=self.listen, daemon=True)
-        self.listen_thread.start()
+    # How long to keep resending our disconnect when quitting, waiting for the server to ack it
+    disconnect_timeout: float = 1
 
-        self.player_id: UUID | None = None
+    # Network statistics are logged at this level every this many seconds (or never, if 0), and
+    # drawn over the game if the overlay is enabled
+    netstats_interval: float = 10
+    netstats_level: int = logging.INFO
+    netstats_overlay: bool = False
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.transport = UdpTransport(("localhost", 0))
+        self.server_address: Address = ("localhost", DEFAULT_PORT)
+
+        self.player_id: PlayerId | None = None
         self.player: go.Player | None = None
 
-        self.others: dict[UUID, go.Player] = {}
+        self.others: dict[PlayerId, go.Player] = {}
 
         self.kicked = False
 
         self.last_input_x: int = 0
 
+        self.snapshots_received = snap.SnapshotHistory()
+        self.latest_snapshot_tick: int | None = None
+
+        # Only used for snapshot replication
+        self.time: float = 0
+        self.server_time_offset: float | None = None
+        self.input_sequence: int = 0
+        self.input_history = InputHistory()
+        self.interpolation: dict[PlayerId, InterpolationBuffer] = {}
+
+        aj.every(self.ping_interval, self.ping, self)
+        self.ping_id: int = 0
+        self.ping_send_times: dict[int, float] = {}
+
+        if self.netstats_interval > 0:
+            go.NetStatsReporter(
+                self.transport.stats,
+                self.netstats_interval,
+                self.netstats_level,
+                self.netstats_overlay,
+            )
+
+        self.handlers = pck.PacketHandlers()
+        self.handlers.register(pck.PlayerIdPacket, self.handle_player_id_packet)
+        self.handlers.register(pck.PlayerPositionPacket, self.handle_player_position_packet)
+        self.handlers.register(pck.PlayerCorrectionPacket, self.handle_player_correction_packet)
+        self.handlers.register(
+            pck.OtherPlayerPositionPacket, self.handle_other_player_position_packet
+        )
+        self.handlers.register(pck.PlayerXInputPacket, self.handle_player_x_input_packet)
+        self.handlers.register(pck.PlayerJumpPacket, self.handle_player_jump_packet)
+        self.handlers.register(pck.PlayerDisconnectPacket, self.handle_player_disconnect_packet)
+        self.handlers.register(
+            pck.PositionSyncRequestPacket, self.handle_position_sync_request_packet
+        )
+        self.handlers.register(pck.SnapshotPacket, self.handle_snapshot_packet)
+        self.handlers.register(pck.ShardRedirectPacket, self.handle_shard_redirect_packet)
+        self.handlers.register(pck.EntityDespawnPacket, self.handle_entity_despawn_packet)
+        self.handlers.register(pck.ServerInfoPacket, self.handle_server_info_packet)
+
         # Tell the server we want to connect
         self.send(pck.ConnectionRequestPacket())
 
     def send(self, packet: pck.Packet) -> None:
-        try:
-            self.socket.sendto(packet.pack(), ("localhost", 12345))
-        except OSError as e:
-            print("Got an error:", e)
-            return
-
-    def listen(self) -> None:
-        while True:
-            try:
-                data = self.socket.recv(1024)
-            except ConnectionResetError:
-                print("Connection reset")
-                aj.game_end()
-                return
-
-            except OSError as e:
-                print("Got an error:", e)
-                return
-
-            packet = pck.unpack(data)
-            self.packet_queue.put(packet)
+        self.transport.send(packet, self.server_address)
 
     def step(self) -> None:
         super().step()
 
+        start: float = time.perf_counter()
+        self.time += aj.delta_time
         self.process_packets()
 
-        if self.player_id is None or self.player is None:
+        if self.player_id is not None and self.player is not None:
+            if self.latest_snapshot_tick is None:
+                self.send_input()
+            else:
+                self.predict()
+
+        if self.server_time_offset is not None:
+            self.interpolate_others()
+
+        # Send everything this tick produced in as few datagrams as possible
+        self.transport.flush()
+        self.transport.stats.tick_time.add(time.perf_counter() - start)
+
+    def ping(self) -> None:
+        if self.player_id is None:
             return
 
+        # Pings which are never answered are only forgotten once they're well past any sensible
+        # round trip time
+        for ping_id in [p for p, t in self.ping_send_times.items() if time.monotonic() - t > 10]:
+            del self.ping_send_times[ping_id]
+
+        self.ping_id = (self.ping_id + 1) & 0xFFFFFFFF
+        self.ping_send_times[self.ping_id] = time.monotonic()
+        self.transport.stats.probe_sent(self.server_address)
+        self.send(pck.ServerInfoRequestPacket(self.ping_id))
+
+    def send_input(self) -> None:
+        assert self.player_id is not None and self.player is not None
+
         x_input: int = aj.keyboard_check(aj.vk_right) - aj.keyboard_check(aj.vk_left)
 
         if x_input != self.last_input_x:
             self.player.input_x = x_input
-
-            # For redundancy, send the change in input a few times and hope it gets through
-            for _ in range(3):
-                self.send(pck.PlayerXInputPacket(self.player_id, x_input))
+            self.send(pck.PlayerXInputPacket(self.player_id, x_input))
 
         if aj.keyboard_check_pressed(aj.vk_space):
             self.player.jump()
-            for _ in range(3):
-                # It won't matter if the server receives the jump packet multiple times, since
-                # on subsequent jumps, the player won't be on the ground so the jump won't be applied
-                self.send(pck.PlayerJumpPacket(self.player_id))
+            self.send(pck.PlayerJumpPacket(self.player_id))
 
         self.last_input_x = x_input
 
+    def predict(self) -> None:
+        # Run our own player straight away rather than waiting to hear back from the server, and
+        # remember what we did so we can do it again if the server turns out to disagree
+        assert self.player_id is not None and self.player is not None
+
+        # Frame times are sent in whole milliseconds, so predict with exactly what the server gets
+        delta_time_ms: int = min(round(aj.delta_time * 1000), 255)
+
+        self.input_sequence += 1
+        command = InputCommand(
+            self.input_sequence,
+            delta_time_ms / 1000,
+            aj.keyboard_check(aj.vk_right) - aj.keyboard_check(aj.vk_left),
+            aj.keyboard_check_pressed(aj.vk_space),
+        )
+        self.player.simulated = False
+        self.apply_input(command)
+        self.input_history.add(command)
+        self.send(
+            pck.PlayerInputPacket(
+                self.player_id, command.sequence, command.x_input, command.jump, delta_time_ms
+            )
+        )
+
+    def apply_input(self, command: InputCommand) -> None:
+        assert self.player is not None
+        self.player.input_x = command.x_input
+        if command.jump:
+            self.player.jump()
+        self.player.simulate(command.delta_time)
+        command.x, command.y = self.player.x, self.player.y
+        command.x_velocity, command.y_velocity = self.player.x_velocity, self.player.y_velocity
+
+    def reconcile(self, input_frame: int, x: float, y: float) -> None:
+        assert self.player is not None
+        acknowledged: InputCommand | None = self.input_history.acknowledge(input_frame)
+        if acknowledged is None:
+            return
+        if aj.point_distance(acknowledged.x, acknowledged.y, x, y) <= self.prediction_tolerance:
+            return
+
+        # Go back to where the server says we were and replay everything it hasn't seen yet
+        self.player.x, self.player.y = x, y
+        self.player.x_velocity = acknowledged.x_velocity
+        self.player.y_velocity = acknowledged.y_velocity
+        for command in self.input_history:
+            self.apply_input(command)
+
+    def interpolate_others(self) -> None:
+        assert self.server_time_offset is not None
+        render_time: float = self.time + self.server_time_offset - self.interpolation_delay
+        for player_id, other in self.others.items():
+            buffer: InterpolationBuffer | None = self.interpolation.get(player_id)
+            if buffer is None:
+                continue
+            position = buffer.sample(render_time)
+            if position is not None:
+                other.x, other.y = position
+
+    def remove_other(self, player_id: PlayerId) -> None:
+        self.interpolation.pop(player_id, None)
+        other_player: go.Player | None = self.others.pop(player_id, None)
+        if other_player is not None:
+            aj.instance_destroy(other_player)
+
     def process_packets(self) -> None:
-        while not self.packet_queue.empty():
-            packet = self.packet_queue.get()
-            self.handle_packet(packet)
-
-    def handle_packet(self, packet: pck.Packet) -> None:
-        if isinstance(packet, pck.PlayerIdPacket):
-            self.handle_player_id_packet(packet)
-        elif isinstance(packet, pck.PlayerPositionPacket):
-            self.handle_player_position_packet(packet)
-        elif isinstance(packet, pck.OtherPlayerPositionPacket):
-            self.handle_other_player_position_packet(packet)
-        elif isinstance(packet, pck.PlayerXInputPacket):
-            self.handle_player_x_input_packet(packet)
-        elif isinstance(packet, pck.PlayerJumpPacket):
-            self.handle_player_jump_packet(packet)
-        elif isinstance(packet, pck.PlayerDisconnectPacket):
-            self.handle_player_disconnect_packet(packet)
-        elif isinstance(packet, pck.PositionSyncRequestPacket):
-            self.handle_position_sync_request_packet()
+        for packet, _ in self.transport.poll():
+            self.handlers.dispatch(packet)
+
+        if self.transport.connection_reset:
+            logger.error("Connection reset")
+            aj.game_end()
+
+    def handle_shard_redirect_packet(self, packet: pck.ShardRedirectPacket) -> None:
+        # We reached the front door of a sharded server, which has picked a shard for us to join
+        if self.player_id is not None:
+            return
+        self.server_address = (self.server_address[0], packet.port)
+        self.send(pck.ConnectionRequestPacket())
+
+    def handle_server_info_packet(self, packet: pck.ServerInfoPacket) -> None:
+        send_time: float | None = self.ping_send_times.pop(packet.request_id, None)
+        if send_time is not None:
+            self.transport.stats.probe_answered(self.server_address, time.monotonic() - send_time)
 
     def handle_player_id_packet(self, packet: pck.PlayerIdPacket) -> None:
         self.player_id = packet.player_id
@@ -112,7 +241,12 @@ class NetworkClient(aj.GameObject):
             self.player = go.Player(packet.x, packet.y)
 
             if self.player_id is not None:
-                self.player.name = self.player_id.hex[:4]
+                self.player.name = player_name(self.player_id)
+
+    def handle_player_correction_packet(self, packet: pck.PlayerCorrectionPacket) -> None:
+        if self.player is not None:
+            self.player.x = packet.x
+            self.player.y = packet.y
 
     def handle_other_player_position_packet(self, packet: pck.OtherPlayerPositionPacket) -> None:
         if packet.player_id in self.others:
@@ -120,7 +254,7 @@ class NetworkClient(aj.GameObject):
             self.others[packet.player_id].y = packet.y
         else:
             self.others[packet.player_id] = go.Player(packet.x, packet.y)
-            self.others[packet.player_id].name = packet.player_id.hex[:4]
+            self.others[packet.player_id].name = player_name(packet.player_id)
 
     def handle_player_x_input_packet(self, packet: pck.PlayerXInputPacket) -> None:
         other_player: go.Player | None = self.others.get(packet.player_id)
@@ -133,27 +267,86 @@ class NetworkClient(aj.GameObject):
             other_player.jump()
 
     def handle_player_disconnect_packet(self, packet: pck.PlayerDisconnectPacket) -> None:
-        print("Received player disconnect packet")
         if packet.player_id == self.player_id:
             self.kicked = True
             aj.game_end()
             return
+        self.remove_other(packet.player_id)
 
-        other_player: go.Player | None = self.others.pop(packet.player_id, None)
-        if other_player is not None:
-            aj.instance_destroy(other_player)
+    def handle_entity_despawn_packet(self, packet: pck.EntityDespawnPacket) -> None:
+        self.remove_other(packet.player_id)
 
-    def handle_position_sync_request_packet(self) -> None:
+    def handle_position_sync_request_packet(self, packet: pck.PositionSyncRequestPacket) -> None:
         if self.player is not None and self.player_id is not None:
             self.send(pck.PositionSyncResponsePacket(self.player_id, self.player.x, self.player.y))
 
+    def handle_snapshot_packet(self, packet: pck.SnapshotPacket) -> None:
+        base: snap.Snapshot | None = self.snapshots_received.get(packet.base_tick)
+        if packet.base_tick is not None and base is None:
+            # We've forgotten what this is a delta against, so wait for one we can decode
+            return
+
+        snapshot: snap.Snapshot = snap.apply(base, packet.delta)
+        self.snapshots_received.add(packet.tick, snapshot)
+        self.send(pck.SnapshotAckPacket(packet.tick))
+
+        # Snapshots can arrive out of order, but older ones are only useful as delta bases
+        if self.latest_snapshot_tick is not None and packet.tick <= self.latest_snapshot_tick:
+            return
+        self.latest_snapshot_tick = packet.tick
+
+        # Keep a smoothed estimate of how far the server's clock is ahead of ours, so we know which
+        # point in the server's past to draw other players at
+        server_time: float = packet.server_time_ms / 1000
+        offset: float = server_time - self.time
+        if self.server_time_offset is None or abs(offset - self.server_time_offset) > 1:
+            self.server_time_offset = offset
+        else:
+            self.server_time_offset += (offset - self.server_time_offset) * 0.1
+
+        self.apply_snapshot(snapshot, server_time, packet.input_frame)
+
+    def apply_snapshot(
+        self, snapshot: snap.Snapshot, server_time: float, input_frame: int | None
+    ) -> None:
+        for player_id, (qx, qy) in snapshot.items():
+            x, y = POSITION_X.dequantise(qx), POSITION_Y.dequantise(qy)
+
+            if player_id == self.player_id:
+                if self.player is not None and input_frame is not None:
+                    self.reconcile(input_frame, x, y)
+                continue
+
+            other: go.Player | None = self.others.get(player_id)
+            if other is None:
+                other = go.Player(x, y)
+                other.name = player_name(player_id)
+                other.simulated = False
+                self.others[player_id] = other
+
+            buffer: InterpolationBuffer | None = self.interpolation.get(player_id)
+            if buffer is None:
+                buffer = self.interpolation[player_id] = InterpolationBuffer()
+            buffer.add(server_time, x, y)
+
+        for player_id in [p for p in self.others if p not in snapshot]:
+            self.remove_other(player_id)
+
     def on_game_end(self) -> None:
         if not self.kicked and self.player_id is not None:
             self.send(pck.PlayerDisconnectPacket(self.player_id))
-        self.socket.close()
+            self.transport.flush_until_acked(self.disconnect_timeout)
+        self.transport.close()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multiplayer demo client")
+    add_netstats_args(parser, NetworkClient.netstats_interval)
+    args = parser.parse_args()
+    NetworkClient.netstats_interval = args.netstats_interval
+    NetworkClient.netstats_level = args.netstats_level
+    NetworkClient.netstats_overlay = args.netstats_overlay
+
     aj.set_rooms(shared.rooms)
     aj.register_objects(go.Floor, NetworkClient)
     aj.room_set_caption("Multiplayer Client")
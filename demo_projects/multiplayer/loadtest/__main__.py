@@ -0,0 +1,392 @@
+"""Connects lots of simulated players to a multiplayer demo server from one process, to find out how
+many it can handle.
+
+Run from the root of the repository with, for example,
+`python -m demo_projects.multiplayer.loadtest --bots 200 --duration 60`, with a server (or the
+front door of a sharded server) already running.
+
+Each bot has its own UDP socket, speaks the same protocol as `NetworkClient` and plays with a
+scripted input pattern. Bots only walk around on servers using snapshots, otherwise they just
+jump. Every few seconds a line is logged with how many bots are connected, how
+many failed to connect, were kicked or stopped hearing from the server, the round trip time of
+requests to the server, and how long the server is taking per tick.
+"""
+
+from __future__ import annotations
+from dataclasses import dataclass, field
+import argparse
+import asyncio
+import logging
+import random
+import socket
+import statistics
+import struct
+from typing import cast
+import demo_projects.multiplayer.shared.packet as pck
+import demo_projects.multiplayer.shared.snapshot as snap
+from demo_projects.multiplayer.shared.quantise import POSITION_X, POSITION_Y
+from demo_projects.multiplayer.shared.reliability import Connection
+from demo_projects.multiplayer.shared.session import PlayerId
+from demo_projects.multiplayer.shared.transport import Address, DEFAULT_PORT
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LoadStats:
+    connected: int = 0
+    failed: int = 0  # never got a player ID
+    kicked: int = 0
+    dropped: int = 0  # stopped hearing from the server
+
+    # Round trip times in seconds, since the last report and over the whole run
+    latencies: list[float] = field(default_factory=list)
+    all_latencies: list[float] = field(default_factory=list)
+
+    # The latest reply from each server the bots are on (more than one for a sharded server)
+    server_infos: dict[Address, pck.ServerInfoPacket] = field(default_factory=dict)
+
+    def add_latency(self, latency: float) -> None:
+        self.latencies.append(latency)
+        self.all_latencies.append(latency)
+
+
+def percentiles(values: list[float]) -> tuple[float, float, float]:
+    """Return the median, 95th percentile and maximum of some values."""
+    if len(values) < 2:
+        value = values[0] if values else 0
+        return value, value, value
+    cut_points = statistics.quantiles(values, n=20)
+    return cut_points[9], cut_points[18], max(values)
+
+
+class Bot(asyncio.DatagramProtocol):
+    connect_timeout: float = 5
+    drop_timeout: float = 5
+    info_interval: float = 1
+
+    def __init__(
+        self, server_address: Address, stats: LoadStats, pattern: str, rng: random.Random
+    ) -> None:
+        self.server_address: Address = server_address
+        self.stats = stats
+        self.pattern = pattern
+        self.rng = rng
+        self.transport: asyncio.DatagramTransport | None = None
+        self.connection: Connection | None = None
+
+        self.player_id: PlayerId | None = None
+        self.x: float = 0
+        self.y: float = 0
+        self.finished: bool = False
+
+        self.x_input: int = 0
+        self.jump: bool = False
+        self.next_input_change: float = 0
+        self.input_sequence: int = 0
+
+        self.snapshots_received = snap.SnapshotHistory()
+        self.latest_snapshot_tick: int | None = None
+
+        self.started: float = 0
+        self.last_received: float = 0
+        self.next_info_request: float = 0
+        self.info_requests: dict[int, float] = {}
+        self.next_request_id: int = 0
+
+        self.handlers = pck.PacketHandlers()
+        self.handlers.register(pck.ShardRedirectPacket, self.handle_shard_redirect_packet)
+        self.handlers.register(pck.PlayerIdPacket, self.handle_player_id_packet)
+        self.handlers.register(pck.PlayerPositionPacket, self.handle_player_position_packet)
+        self.handlers.register(pck.PlayerCorrectionPacket, self.handle_player_position_packet)
+        self.handlers.register(
+            pck.PositionSyncRequestPacket, self.handle_position_sync_request_packet
+        )
+        self.handlers.register(pck.SnapshotPacket, self.handle_snapshot_packet)
+        self.handlers.register(pck.PlayerDisconnectPacket, self.handle_player_disconnect_packet)
+        self.handlers.register(pck.ServerInfoPacket, self.handle_server_info_packet)
+
+    @property
+    def loop_time(self) -> float:
+        return asyncio.get_running_loop().time()
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = cast(asyncio.DatagramTransport, transport)
+        self.started = self.last_received = self.loop_time
+        self.connection = Connection(self.loop_time)
+        self.send(pck.ConnectionRequestPacket())
+        self.flush()
+
+    def datagram_received(self, data: bytes, address: Address) -> None:
+        if self.finished or self.connection is None or address != self.server_address:
+            return
+        self.last_received = self.loop_time
+        try:
+            packets = self.connection.read_datagram(data, self.loop_time)
+        except (ValueError, IndexError, struct.error):
+            return
+        for packet in packets:
+            self.handlers.dispatch(packet, address)
+
+    def error_received(self, exc: Exception) -> None:
+        # e.g. the server isn't running yet, which shows up as a failure to connect
+        pass
+
+    def send(self, packet: pck.Packet) -> None:
+        assert self.connection is not None
+        self.connection.send(packet)
+
+    def flush(self) -> None:
+        if self.transport is None or self.connection is None:
+            return
+        for datagram in self.connection.write_datagrams(self.loop_time):
+            # The datagram is a view of a shared buffer, which the transport may hold on to
+            self.transport.sendto(bytes(datagram), self.server_address)
+
+    def finish(self) -> None:
+        self.finished = True
+        if self.transport is not None:
+            self.transport.close()
+
+    def disconnect(self) -> None:
+        if not self.finished and self.player_id is not None:
+            self.send(pck.PlayerDisconnectPacket(self.player_id))
+            self.flush()
+        self.finish()
+
+    def tick(self, now: float, delta_time: float) -> None:
+        if self.finished:
+            return
+
+        if self.player_id is None:
+            if now - self.started > self.connect_timeout:
+                self.stats.failed += 1
+                self.finish()
+            return
+
+        if now - self.last_received > self.drop_timeout:
+            self.stats.dropped += 1
+            self.stats.connected -= 1
+            self.finish()
+            return
+
+        self.play(now, delta_time)
+
+        if now >= self.next_info_request:
+            self.next_info_request = now + self.info_interval
+            self.next_request_id += 1
+            self.info_requests[self.next_request_id] = now
+            self.send(pck.ServerInfoRequestPacket(self.next_request_id))
+
+        self.flush()
+
+    def play(self, now: float, delta_time: float) -> None:
+        assert self.player_id is not None
+        self.jump = False
+
+        if now >= self.next_input_change:
+            if self.pattern == "walk":
+                self.x_input = -1 if self.x_input == 1 else 1
+                self.next_input_change = now + 2
+            elif self.pattern == "random":
+                self.x_input = self.rng.choice((-1, 0, 1))
+                self.jump = self.rng.random() < 0.3
+                self.next_input_change = now + self.rng.uniform(0.5, 2)
+            else:
+                self.next_input_change = now + 1
+
+        if self.latest_snapshot_tick is not None:
+            # The server wants every frame's input when it's sending snapshots
+            self.input_sequence += 1
+            self.send(
+                pck.PlayerInputPacket(
+                    self.player_id,
+                    self.input_sequence,
+                    self.x_input,
+                    self.jump,
+                    min(round(delta_time * 1000), 255),
+                )
+            )
+            return
+
+        # Without snapshots the server checks the positions players report against its own, and
+        # kicks them if they're too far off for too long. Bots don't run any physics so they can't
+        # know where walking would have taken them, but a jump always lands back where it started
+        self.x_input = 0
+        if self.jump:
+            self.send(pck.PlayerJumpPacket(self.player_id))
+
+    def handle_shard_redirect_packet(
+        self, packet: pck.ShardRedirectPacket, address: Address
+    ) -> None:
+        if self.player_id is not None:
+            return
+        # Ack the redirect so the front door doesn't resend it, then start afresh with the shard
+        self.flush()
+        self.server_address = (self.server_address[0], packet.port)
+        self.connection = Connection(self.loop_time)
+        self.send(pck.ConnectionRequestPacket())
+        self.flush()
+
+    def handle_player_id_packet(self, packet: pck.PlayerIdPacket, address: Address) -> None:
+        if self.player_id is None:
+            self.stats.connected += 1
+        self.player_id = packet.player_id
+
+    def handle_player_position_packet(
+        self, packet: pck.PlayerPositionPacket, address: Address
+    ) -> None:
+        self.x = packet.x
+        self.y = packet.y
+
+    def handle_position_sync_request_packet(
+        self, packet: pck.PositionSyncRequestPacket, address: Address
+    ) -> None:
+        if self.player_id is not None:
+            self.send(pck.PositionSyncResponsePacket(self.player_id, self.x, self.y))
+
+    def handle_snapshot_packet(self, packet: pck.SnapshotPacket, address: Address) -> None:
+        base: snap.Snapshot | None = self.snapshots_received.get(packet.base_tick)
+        if packet.base_tick is not None and base is None:
+            return
+        snapshot: snap.Snapshot = snap.apply(base, packet.delta)
+        self.snapshots_received.add(packet.tick, snapshot)
+        self.send(pck.SnapshotAckPacket(packet.tick))
+
+        if self.latest_snapshot_tick is not None and packet.tick <= self.latest_snapshot_tick:
+            return
+        self.latest_snapshot_tick = packet.tick
+        if self.player_id in snapshot:
+            qx, qy = snapshot[self.player_id]
+            self.x, self.y = POSITION_X.dequantise(qx), POSITION_Y.dequantise(qy)
+
+    def handle_player_disconnect_packet(
+        self, packet: pck.PlayerDisconnectPacket, address: Address
+    ) -> None:
+        if packet.player_id == self.player_id:
+            self.stats.kicked += 1
+            self.stats.connected -= 1
+            self.finish()
+
+    def handle_server_info_packet(self, packet: pck.ServerInfoPacket, address: Address) -> None:
+        sent: float | None = self.info_requests.pop(packet.request_id, None)
+        if sent is not None:
+            self.stats.add_latency(self.loop_time - sent)
+        self.stats.server_infos[address] = packet
+
+
+def report(stats: LoadStats, elapsed: float, num_bots: int) -> None:
+    p50, p95, worst = percentiles(stats.latencies)
+    stats.latencies.clear()
+
+    infos = list(stats.server_infos.values())
+    server_players: int = sum(info.player_count for info in infos)
+    tick_time: float = max((info.tick_time_us for info in infos), default=0) / 1000
+    max_tick_time: float = max((info.max_tick_time_us for info in infos), default=0) / 1000
+
+    logger.info(
+        "%5.1fs bots %d, connected %d, failed %d, kicked %d, dropped %d | "
+        "rtt p50 %.1f ms, p95 %.1f ms, max %.1f ms | "
+        "server %d players, %.2f ms per tick (%.2f ms max)",
+        elapsed,
+        num_bots,
+        stats.connected,
+        stats.failed,
+        stats.kicked,
+        stats.dropped,
+        p50 * 1000,
+        p95 * 1000,
+        worst * 1000,
+        server_players,
+        tick_time,
+        max_tick_time,
+    )
+
+
+async def run(args: argparse.Namespace) -> LoadStats:
+    loop = asyncio.get_running_loop()
+    rng = random.Random(args.seed)
+    stats = LoadStats()
+    bots: list[Bot] = []
+
+    start: float = loop.time()
+    last_tick: float = start
+    next_report: float = start + args.report_interval
+    tick_interval: float = 1 / args.tick_rate
+
+    # Datagrams come back from a numeric address, so compare against that rather than a host name
+    server_address: Address = (socket.gethostbyname(args.host), args.port)
+
+    try:
+        while (now := loop.time()) - start < args.duration:
+            # Connect bots gradually, so a capacity limit shows up as the point where things go
+            # wrong rather than everything failing at once
+            ramp_fraction: float = 1 if args.ramp <= 0 else min((now - start) / args.ramp, 1)
+            while len(bots) < max(1, round(args.bots * ramp_fraction)):
+                _, bot = await loop.create_datagram_endpoint(
+                    lambda: Bot(server_address, stats, args.pattern, rng),
+                    local_addr=("0.0.0.0", 0),
+                )
+                bots.append(bot)
+
+            for bot in bots:
+                bot.tick(now, now - last_tick)
+            last_tick = now
+
+            if now >= next_report:
+                next_report += args.report_interval
+                report(stats, now - start, len(bots))
+
+            await asyncio.sleep(max(0, last_tick + tick_interval - loop.time()))
+    finally:
+        for bot in bots:
+            bot.disconnect()
+
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test a multiplayer demo server")
+    parser.add_argument("--bots", type=int, default=100, help="how many bots to connect")
+    parser.add_argument("--duration", type=float, default=30, help="how many seconds to run for")
+    parser.add_argument(
+        "--ramp", type=float, default=10, help="how many seconds to spread connecting over"
+    )
+    parser.add_argument(
+        "--pattern",
+        choices=("idle", "walk", "random"),
+        default="random",
+        help="how the bots play",
+    )
+    parser.add_argument("--host", default="localhost", help="the server to connect to")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="the server's UDP port")
+    parser.add_argument(
+        "--tick-rate", type=float, default=60, help="how many times per second bots update"
+    )
+    parser.add_argument(
+        "--report-interval", type=float, default=2, help="how many seconds between log lines"
+    )
+    parser.add_argument("--seed", type=int, default=None, help="seed for the random pattern")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    stats = asyncio.run(run(args))
+
+    p50, p95, worst = percentiles(stats.all_latencies)
+    logger.info(
+        "Finished: %d of %d bots still connected, %d failed to connect, %d kicked, %d dropped. "
+        "Round trip p50 %.1f ms, p95 %.1f ms, max %.1f ms",
+        stats.connected,
+        args.bots,
+        stats.failed,
+        stats.kicked,
+        stats.dropped,
+        p50 * 1000,
+        p95 * 1000,
+        worst * 1000,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,80 +1,218 @@
+from __future__ import annotations
+from collections import deque
 from random import randrange
-from uuid import UUID, uuid4
-import socket
+from typing import TYPE_CHECKING
+import argparse
+import logging
+import time
 import demo_projects.multiplayer.shared.packet as pck
-from dataclasses import dataclass
-import threading
-from queue import Queue
+import demo_projects.multiplayer.shared.snapshot as snap
+from demo_projects.multiplayer.shared.quantise import POSITION_X, POSITION_Y
+from demo_projects.multiplayer.shared.interest import SpatialGrid, update_relevant
+from demo_projects.multiplayer.shared.netstats import add_netstats_args
+from demo_projects.multiplayer.shared.session import PlayerId, PlayerIdAllocator
+from demo_projects.multiplayer.shared.transport import UdpTransport, Address, DEFAULT_PORT
+from dataclasses import dataclass, field
 import ajishio as aj
 import demo_projects.multiplayer.shared as shared
 import demo_projects.multiplayer.shared.game_objects as go
 
+from demo_projects.multiplayer.server.shards import ShardStatus
 
-def send_packet(packet: pck.Packet, socket: socket.socket, address: tuple[str, int]) -> None:
-    socket.sendto(packet.pack(), address)
+if TYPE_CHECKING:
+    from multiprocessing.queues import Queue
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
 class PlayerNetstate:
     obj: go.Player
-    address: tuple[str, int]
+    address: Address
     requested_position_sync_timer: float = 0
+    sync_request_time: float | None = None  # when the newest unanswered sync request was sent
+
+    # The other players this player is told about, i.e. the ones near enough to matter to them
+    relevant: set[PlayerId] = field(default_factory=set)
+
+    # Only used for snapshot replication
+    snapshots_sent: snap.SnapshotHistory = field(default_factory=snap.SnapshotHistory)
+    acked_tick: int | None = None
+    last_ack_time: float = 0
+    snapshot_send_times: dict[int, float] = field(default_factory=dict)
+
+    # Inputs waiting to be applied one per tick, in the same order and with the same frame times
+    # the client applied them, and the sequence number of the last one applied
+    pending_inputs: deque[pck.PlayerInputPacket] = field(default_factory=deque)
+    input_frame: int | None = None
 
 
 class GameServer(aj.GameObject):
+    port: int = DEFAULT_PORT
+
+    # How busy the server is gets measured over this many seconds at a time. When running as one
+    # shard of a sharded server, each measurement is also reported to the status queue
+    status_interval: float = 1
+    status_queue: Queue[ShardStatus] | None = None
+
+    # When enabled, instead of relaying inputs and syncing positions once a second, the server sends
+    # every player a snapshot of the world which only contains what changed since the last one they
+    # acknowledged
+    snapshot_replication: bool = False
+    snapshot_rate: float = 20  # snapshots per second
+    snapshot_timeout: float = 5  # seconds without an ack before a player is dropped
+
+    # Players only receive updates about other players within this many pixels of them
+    interest_radius: float = 800
+    interest_rate: float = 10  # relevant sets are recalculated this many times per second
+
+    # Inputs queued beyond this many ticks are skipped, so that a burst of late packets (or the
+    # server not keeping up) can't leave a player lagging behind their client for good. Their
+    # client gets corrected instead
+    max_pending_inputs: int = 4
+
+    # Network statistics are logged at this level every this many seconds (or never, if 0), and
+    # drawn over the game if the overlay is enabled
+    netstats_interval: float = 10
+    netstats_level: int = logging.INFO
+    netstats_overlay: bool = False
+
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-
-        self.packet_queue: Queue = Queue()
+        self.transport = UdpTransport(("", self.port))
 
-        print("Server started")
+        logger.info("Server started on port %d", self.port)
 
-        self.players_netstates: dict[UUID, PlayerNetstate] = {}
+        self.players_netstates: dict[PlayerId, PlayerNetstate] = {}
+        self.player_ids_by_address: dict[Address, PlayerId] = {}
+        self.player_id_allocator = PlayerIdAllocator()
 
-        self.listen_thread = threading.Thread(target=self.listen, daemon=True)
-        self.listen_thread.start()
+        self.handlers = pck.PacketHandlers()
+        self.handlers.register(pck.ConnectionRequestPacket, self.handle_connection_request_packet)
+        self.handlers.register(pck.PlayerXInputPacket, self.handle_player_x_input_packet)
+        self.handlers.register(pck.PlayerJumpPacket, self.handle_player_jump_packet)
+        self.handlers.register(pck.PlayerDisconnectPacket, self.handle_player_disconnect_packet)
+        self.handlers.register(
+            pck.PositionSyncResponsePacket, self.handle_position_sync_response_packet
+        )
+        self.handlers.register(pck.SnapshotAckPacket, self.handle_snapshot_ack_packet)
+        self.handlers.register(pck.PlayerInputPacket, self.handle_player_input_packet)
+        self.handlers.register(pck.ServerInfoRequestPacket, self.handle_server_info_request_packet)
 
         self.running = True
 
-        self.sync_timer: float = 0
         self.sync_timeout: float = 1
 
-    def broadcast(self, packet: pck.Packet, exclude: UUID | None = None) -> None:
-        for player_id, player in self.players_netstates.items():
-            if not exclude or player_id != exclude:
-                send_packet(packet, self.socket, player.address)
-
-    def listen(self) -> None:
-        self.socket.bind(("", 12345))
-        while self.running:
-            try:
-                data, address = self.socket.recvfrom(1024)
-            except ConnectionResetError:
+        self.time: float = 0
+        self.snapshot_tick: int = 0
+
+        self.interest_grid = SpatialGrid(self.interest_radius)
+
+        # Work done every so often runs on engine timers, so the server's step doesn't count down
+        self.timers: list[aj.Timer] = [aj.every(1 / self.interest_rate, self.update_interest, self)]
+        if self.snapshot_replication:
+            self.timers.append(aj.every(1 / self.snapshot_rate, self.send_snapshots, self))
+        else:
+            self.timers.append(aj.every(self.sync_timeout, self.sync_positions, self))
+
+        # The mean and worst time spent per tick over the last status interval
+        self.tick_time: float = 0
+        self.max_tick_time: float = 0
+        self.status_timer: float = 0
+        self.status_ticks: int = 0
+        self.status_tick_time: float = 0
+        self.status_max_tick_time: float = 0
+
+        if self.netstats_interval > 0:
+            go.NetStatsReporter(
+                self.transport.stats,
+                self.netstats_interval,
+                self.netstats_level,
+                self.netstats_overlay,
+            )
+
+    def broadcast(self, packet: pck.Packet, origin: PlayerId) -> None:
+        # Only tell players about something which happened to a player that is relevant to them.
+        # Every one of them is sent the same bytes, so they're only packed once
+        packet.prepack()
+        for player in self.players_netstates.values():
+            if origin in player.relevant:
+                self.transport.send(packet, player.address)
+
+    def update_interest(self) -> None:
+        self.interest_grid.clear()
+        for player_id, ns in self.players_netstates.items():
+            self.interest_grid.insert(player_id, ns.obj.x, ns.obj.y)
+
+        for player_id, ns in self.players_netstates.items():
+            entered, left = update_relevant(
+                self.interest_grid, ns.relevant, player_id, ns.obj.x, ns.obj.y, self.interest_radius
+            )
+
+            # Snapshots are filtered by the relevant set, so spawning and despawning is implied by
+            # entities appearing in and disappearing from them
+            if self.snapshot_replication:
                 continue
-            packet: pck.Packet = pck.unpack(data)
-            self.packet_queue.put((packet, address))
+
+            for other_id in entered:
+                other = self.players_netstates[other_id].obj
+                self.transport.send(
+                    pck.OtherPlayerPositionPacket(other_id, other.x, other.y), ns.address
+                )
+            for other_id in left:
+                self.transport.send(pck.EntityDespawnPacket(other_id), ns.address)
 
     def step(self) -> None:
         super().step()
 
         if not self.running:
             return
+        start: float = time.perf_counter()
         try:
             self.process_packets()
         except KeyboardInterrupt:
             self.stop()
 
-        self.sync_timer += aj.delta_time
-        if self.sync_timer >= self.sync_timeout:
-            self.sync_timer = self.sync_timer % self.sync_timeout
-            self.sync_positions()
+        self.time += aj.delta_time
+
+        # Players step after the server, so these inputs apply to this tick's simulation
+        self.apply_inputs()
+
+        # Send everything this tick produced, one datagram per player where possible
+        self.transport.flush()
+
+        self.transport.stats.tick_time.add(time.perf_counter() - start)
+        self.update_status()
+
+    def update_status(self) -> None:
+        self.status_ticks += 1
+        self.status_tick_time += aj.tick_time
+        self.status_max_tick_time = max(self.status_max_tick_time, aj.tick_time)
+
+        self.status_timer += aj.delta_time
+        if self.status_timer < self.status_interval:
+            return
+        self.status_timer %= self.status_interval
+
+        self.tick_time = self.status_tick_time / self.status_ticks
+        self.max_tick_time = self.status_max_tick_time
+        if self.status_queue is not None:
+            self.status_queue.put(
+                ShardStatus(
+                    self.port, len(self.players_netstates), self.tick_time, self.max_tick_time
+                )
+            )
+
+        self.status_ticks = 0
+        self.status_tick_time = 0
+        self.status_max_tick_time = 0
 
     def stop(self) -> None:
-        print("Server stopped")
+        logger.info("Server stopped")
         self.running = False
-        self.listen_thread.join()
-        self.socket.close()
+        for timer in self.timers:
+            timer.cancel()
+        self.transport.close()
 
     def sync_positions(self) -> None:
         # We ask each player to report their position. If  they don't respond in time, we assume
@@ -84,117 +222,274 @@ class GameServer(aj.GameObject):
         # far away from ours, we snap them back to our position.
         for player_id, ns in self.players_netstates.copy().items():
             if ns.requested_position_sync_timer >= 5:
-                print("Player", ns.obj, "is not responding to sync requests!")
-                self.handle_player_disconnect_packet(pck.PlayerDisconnectPacket(player_id))
+                logger.info("Player %s is not responding to sync requests!", player_id)
+                self.disconnect_player(player_id)
                 continue
 
             ns.requested_position_sync_timer += 1
-            send_packet(pck.PositionSyncRequestPacket(), self.socket, ns.address)
+            ns.sync_request_time = time.monotonic()
+            self.transport.stats.probe_sent(ns.address)
+            self.transport.send(pck.PositionSyncRequestPacket(), ns.address)
+
+    def apply_inputs(self) -> None:
+        # Players sending inputs are simulated here rather than in their own step, once per input
+        # and with the client's frame time, so that we end up exactly where the client predicted
+        # they'd be unless something happened that the client couldn't know about
+        for ns in self.players_netstates.values():
+            while len(ns.pending_inputs) > self.max_pending_inputs:
+                ns.pending_inputs.popleft()
+            if not ns.pending_inputs:
+                continue
+            packet = ns.pending_inputs.popleft()
+            ns.obj.input_x = packet.x_input
+            if packet.jump:
+                ns.obj.jump()
+            ns.obj.simulate(packet.delta_time_ms / 1000)
+            ns.input_frame = packet.sequence
+
+    def send_snapshots(self) -> None:
+        self.snapshot_tick += 1
+        world: snap.Snapshot = {
+            player_id: (POSITION_X.quantise(ns.obj.x), POSITION_Y.quantise(ns.obj.y))
+            for player_id, ns in self.players_netstates.items()
+        }
 
-    def process_packets(self) -> None:
-        while not self.packet_queue.empty():
-            packet, address = self.packet_queue.get()
+        for player_id, ns in self.players_netstates.copy().items():
+            if self.time - ns.last_ack_time > self.snapshot_timeout:
+                logger.info("Player %s stopped acknowledging snapshots!", player_id)
+                self.disconnect_player(player_id)
+                continue
 
-            print("Received packet from", address)
+            # Delta against the newest snapshot this player is known to have, or send everything
+            base_tick: int | None = ns.acked_tick
+            base: snap.Snapshot | None = ns.snapshots_sent.get(base_tick)
+            if base is None:
+                base_tick = None
+
+            visible: snap.Snapshot = {
+                entity_id: world[entity_id]
+                for entity_id in ns.relevant | {player_id}
+                if entity_id in world
+            }
+            delta = snap.diff(base, visible)
+            ns.snapshots_sent.add(self.snapshot_tick, visible)
+
+            # Every snapshot should be acked, which measures the round trip and packet loss
+            ns.snapshot_send_times[self.snapshot_tick] = time.monotonic()
+            if len(ns.snapshot_send_times) > snap.HISTORY_SIZE:
+                del ns.snapshot_send_times[next(iter(ns.snapshot_send_times))]
+            self.transport.stats.probe_sent(ns.address)
+            self.transport.send(
+                pck.SnapshotPacket(
+                    self.snapshot_tick,
+                    base_tick,
+                    delta,
+                    int(self.time * 1000) & 0xFFFFFFFF,
+                    ns.input_frame,
+                ),
+                ns.address,
+            )
 
-            if isinstance(packet, pck.ConnectionRequestPacket):
-                self.handle_connection_request_packet(address)
-            elif isinstance(packet, pck.PlayerXInputPacket):
-                self.handle_player_x_input_packet(packet)
-            elif isinstance(packet, pck.PlayerJumpPacket):
-                self.handle_player_jump_packet(packet)
-            elif isinstance(packet, pck.PlayerDisconnectPacket):
-                self.handle_player_disconnect_packet(packet)
-            elif isinstance(packet, pck.PositionSyncResponsePacket):
-                self.handle_position_sync_response_packet(packet)
+    def process_packets(self) -> None:
+        for packet, address in self.transport.poll():
+            self.handlers.dispatch(packet, address)
+
+    def handle_connection_request_packet(
+        self, packet: pck.ConnectionRequestPacket, address: Address
+    ) -> None:
+        existing_id: PlayerId | None = self.player_ids_by_address.get(address)
+        if existing_id is not None:
+            # Our reply must have been lost, so send it again rather than adding another player
+            existing = self.players_netstates[existing_id].obj
+            self.transport.send(pck.PlayerIdPacket(existing_id), address)
+            self.transport.send(pck.PlayerPositionPacket(existing.x, existing.y), address)
+            return
 
-    def handle_connection_request_packet(self, address: tuple[str, int]) -> None:
-        print("Connection from: ", address[0], ":", address[1])
+        player_id: PlayerId | None = self.player_id_allocator.acquire()
+        if player_id is None:
+            logger.warning("Refusing connection from %s:%d, the server is full", *address)
+            return
+
+        logger.info("Connection from %s:%d", *address)
 
         num_player_spawners = aj.instance_count(go.PlayerSpawner)
         player_spawner = aj.instance_find(go.PlayerSpawner, randrange(num_player_spawners))
         assert player_spawner is not None
 
         player = go.Player(player_spawner.x, player_spawner.y)
-        player_id = uuid4()
 
         # Send the connecting player their ID and initial position
-        send_packet(pck.PlayerIdPacket(player_id), self.socket, address)
-        send_packet(pck.PlayerPositionPacket(player.x, player.y), self.socket, address)
-
-        # Also send the connecting player the positions of all other players
-        for other_player_id, other_player in self.players_netstates.items():
-            send_packet(
-                pck.OtherPlayerPositionPacket(
-                    other_player_id, other_player.obj.x, other_player.obj.y
-                ),
-                self.socket,
-                address,
-            )
+        self.transport.send(pck.PlayerIdPacket(player_id), address)
+        self.transport.send(pck.PlayerPositionPacket(player.x, player.y), address)
 
-        # Send other players the new player's position
-        self.broadcast(
-            pck.OtherPlayerPositionPacket(player_id, player.x, player.y),
-            exclude=player_id,
-        )
+        # The new player and those around them find out about each other on the next interest
+        # update
 
         # Finally, add the new player to the list of players
-        player_netstate = PlayerNetstate(player, address)
+        player_netstate = PlayerNetstate(player, address, last_ack_time=self.time)
         self.players_netstates[player_id] = player_netstate
-
-    def handle_player_x_input_packet(self, packet: pck.PlayerXInputPacket) -> None:
-        player = self.players_netstates[packet.player_id]
+        self.player_ids_by_address[address] = player_id
+
+    def sender(self, player_id: PlayerId, address: Address) -> PlayerNetstate | None:
+        """Return the player who sent a packet claiming to be from `player_id`, or None if it came
+        from anyone else (e.g. someone spoofing another player's ID, or a player who has left)."""
+        if self.player_ids_by_address.get(address) != player_id:
+            return None
+        return self.players_netstates.get(player_id)
+
+    def handle_player_x_input_packet(
+        self, packet: pck.PlayerXInputPacket, address: Address
+    ) -> None:
+        player = self.sender(packet.player_id, address)
+        if player is None:
+            return
         player.obj.input_x = packet.x_input
-        self.broadcast(packet, exclude=packet.player_id)
+        if not self.snapshot_replication:
+            self.broadcast(packet, packet.player_id)
 
-    def handle_player_jump_packet(self, packet: pck.PlayerJumpPacket) -> None:
-        player = self.players_netstates[packet.player_id]
+    def handle_player_jump_packet(self, packet: pck.PlayerJumpPacket, address: Address) -> None:
+        player = self.sender(packet.player_id, address)
+        if player is None:
+            return
         player.obj.jump()
-        self.broadcast(packet, exclude=packet.player_id)
+        if not self.snapshot_replication:
+            self.broadcast(packet, packet.player_id)
+
+    def handle_player_input_packet(self, packet: pck.PlayerInputPacket, address: Address) -> None:
+        player = self.sender(packet.player_id, address)
+        if player is None:
+            return
+
+        # Inputs older than ones we've already applied or queued arrived out of order, and are
+        # too late to use
+        latest: int | None = (
+            player.pending_inputs[-1].sequence if player.pending_inputs else player.input_frame
+        )
+        if latest is not None and packet.sequence <= latest:
+            return
+
+        player.obj.simulated = False
+        player.pending_inputs.append(packet)
+
+    def handle_player_disconnect_packet(
+        self, packet: pck.PlayerDisconnectPacket, address: Address
+    ) -> None:
+        if self.sender(packet.player_id, address) is not None:
+            self.disconnect_player(packet.player_id)
 
-    def handle_player_disconnect_packet(self, packet: pck.PlayerDisconnectPacket) -> None:
-        self.broadcast(packet)
-        player_disconnecting: PlayerNetstate | None = self.players_netstates.pop(
-            packet.player_id, None
+    def disconnect_player(self, player_id: PlayerId) -> None:
+        player_disconnecting: PlayerNetstate | None = self.players_netstates.get(player_id)
+        if player_disconnecting is None:
+            return
+
+        # Tell the player themself, in case we're kicking them, and everyone who could see them
+        packet = pck.PlayerDisconnectPacket(player_id)
+        self.broadcast(packet, player_id)
+        self.transport.send(packet, player_disconnecting.address)
+
+        del self.players_netstates[player_id]
+        self.player_ids_by_address.pop(player_disconnecting.address, None)
+        for ns in self.players_netstates.values():
+            ns.relevant.discard(player_id)
+        aj.instance_destroy(player_disconnecting.obj)
+        self.player_id_allocator.release(player_id)
+        self.transport.stats.forget_peer(player_disconnecting.address)
+
+    def handle_snapshot_ack_packet(self, packet: pck.SnapshotAckPacket, address: Address) -> None:
+        player_id: PlayerId | None = self.player_ids_by_address.get(address)
+        if player_id is None:
+            return
+        ns = self.players_netstates[player_id]
+        if ns.acked_tick is None or packet.tick > ns.acked_tick:
+            ns.acked_tick = packet.tick
+        ns.last_ack_time = self.time
+
+        send_time: float | None = ns.snapshot_send_times.pop(packet.tick, None)
+        if send_time is not None:
+            self.transport.stats.probe_answered(address, time.monotonic() - send_time)
+
+    def handle_server_info_request_packet(
+        self, packet: pck.ServerInfoRequestPacket, address: Address
+    ) -> None:
+        # Only answer players, so we can't be used to bounce traffic at someone else's address
+        if address not in self.player_ids_by_address:
+            return
+        self.transport.send(
+            pck.ServerInfoPacket(
+                packet.request_id,
+                len(self.players_netstates),
+                round(self.tick_time * 1_000_000),
+                round(self.max_tick_time * 1_000_000),
+            ),
+            address,
         )
-        if player_disconnecting is not None:
-            aj.instance_destroy(player_disconnecting.obj)
 
-    def handle_position_sync_response_packet(self, packet: pck.PositionSyncResponsePacket) -> None:
-        print("Received position sync response from", packet.player_id)
-        player = self.players_netstates[packet.player_id]
+    def handle_position_sync_response_packet(
+        self, packet: pck.PositionSyncResponsePacket, address: Address
+    ) -> None:
+        player = self.sender(packet.player_id, address)
+        if player is None:
+            return
+        if player.sync_request_time is not None:
+            self.transport.stats.probe_answered(
+                address, time.monotonic() - player.sync_request_time
+            )
+            player.sync_request_time = None
         distance = aj.point_distance(player.obj.x, player.obj.y, packet.x, packet.y)
         if distance < 10:
-            print(
-                "Player",
-                packet.player_id,
-                "reports position only",
-                distance,
-                "units away - accepting!",
-            )
             player.obj.x = packet.x
             player.obj.y = packet.y
             self.broadcast(
                 pck.OtherPlayerPositionPacket(packet.player_id, packet.x, packet.y),
-                exclude=packet.player_id,
+                packet.player_id,
             )
             player.requested_position_sync_timer = 0
         else:
-            print(
-                "Player",
+            logger.warning(
+                "Player %s is cheating! They reported a position %.1f units away! Snapping back!",
                 packet.player_id,
-                "is cheating! They reported a position",
                 distance,
-                "units away! Snapping back!",
             )
-            send_packet(
-                pck.PlayerPositionPacket(player.obj.x, player.obj.y),
-                self.socket,
-                player.address,
+            self.transport.send(
+                pck.PlayerCorrectionPacket(player.obj.x, player.obj.y), player.address
             )
 
 
-if __name__ == "__main__":
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Multiplayer demo server")
+    parser.add_argument(
+        "--port", type=int, default=GameServer.port, help="the UDP port to listen on"
+    )
+    parser.add_argument(
+        "--snapshots",
+        action="store_true",
+        help="replicate the world with delta-compressed snapshots instead of relaying inputs",
+    )
+    parser.add_argument(
+        "--snapshot-rate",
+        type=float,
+        default=GameServer.snapshot_rate,
+        help="how many snapshots to send each player per second when using --snapshots",
+    )
+    parser.add_argument(
+        "--interest-radius",
+        type=float,
+        default=GameServer.interest_radius,
+        help="only send players updates about other players within this many pixels of them",
+    )
+    add_netstats_args(parser, GameServer.netstats_interval)
+    return parser.parse_args(argv)
+
+
+def run(args: argparse.Namespace) -> None:
+    GameServer.port = args.port
+    GameServer.snapshot_replication = args.snapshots
+    GameServer.snapshot_rate = args.snapshot_rate
+    GameServer.interest_radius = args.interest_radius
+    GameServer.netstats_interval = args.netstats_interval
+    GameServer.netstats_level = args.netstats_level
+    GameServer.netstats_overlay = args.netstats_overlay
+
     aj.set_rooms(shared.rooms)
     aj.register_objects(go.Floor, GameServer, go.PlayerSpawner)
     aj.room_set_caption("Multiplayer Server")
@@ -205,4 +500,8 @@ if __name__ == "__main__":
     aj.view_set_hport(aj.view_current, aj.room_height)
     aj.room_set_background(shared.room_background_color)
     aj.game_start()
+
+
+if __name__ == "__main__":
+    run(parse_args())
     exit()
@@ -0,0 +1,174 @@
+"""Runs several independent copies of the multiplayer server, each in its own process with its own
+engine, behind a front door which sends each connecting client to the least busy one.
+
+Run from the root of the repository with, for example,
+`python -m demo_projects.multiplayer.server.shards --shards 4 --snapshots`. Any arguments other
+than the ones below are passed on to each shard.
+"""
+
+from __future__ import annotations
+from dataclasses import dataclass
+from multiprocessing.context import SpawnProcess
+from queue import Empty
+from typing import TYPE_CHECKING
+import argparse
+import logging
+import multiprocessing
+import os
+import select
+import time
+import demo_projects.multiplayer.shared.packet as pck
+from demo_projects.multiplayer.shared.transport import UdpTransport, Address, DEFAULT_PORT
+
+if TYPE_CHECKING:
+    from multiprocessing.queues import Queue
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ShardStatus:
+    port: int
+    player_count: int
+    tick_time: float  # mean seconds spent per tick since the last report
+    max_tick_time: float
+
+
+def run_shard(port: int, server_args: list[str], status_queue: Queue[ShardStatus]) -> None:
+    # Every shard has its own engine, which would otherwise open a window and an audio device as
+    # soon as it's imported
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    import demo_projects.multiplayer.server.__main__ as server
+
+    args = server.parse_args([*server_args, "--port", str(port)])
+    server.GameServer.status_queue = status_queue
+    server.run(args)
+
+
+class FrontDoor:
+    """Answers connection requests on the well-known port by redirecting them to a shard.
+
+    Shards are picked by how many players they last reported, plus how many clients have been sent
+    their way since, with the quickest ticking shard winning ties.
+    """
+
+    def __init__(self, port: int, shard_ports: list[int], status_queue: Queue[ShardStatus]) -> None:
+        self.transport = UdpTransport(("", port))
+        self.status_queue = status_queue
+        self.statuses: dict[int, ShardStatus] = {
+            shard_port: ShardStatus(shard_port, 0, 0, 0) for shard_port in shard_ports
+        }
+        self.redirected_since_status: dict[int, int] = {shard_port: 0 for shard_port in shard_ports}
+
+        self.handlers = pck.PacketHandlers()
+        self.handlers.register(pck.ConnectionRequestPacket, self.handle_connection_request_packet)
+
+    def least_loaded_shard(self) -> int:
+        return min(
+            self.statuses.values(),
+            key=lambda status: (
+                status.player_count + self.redirected_since_status[status.port],
+                status.tick_time,
+            ),
+        ).port
+
+    def handle_connection_request_packet(
+        self, packet: pck.ConnectionRequestPacket, address: Address
+    ) -> None:
+        port: int = self.least_loaded_shard()
+        self.redirected_since_status[port] += 1
+        self.transport.send(pck.ShardRedirectPacket(port), address)
+        logger.info("Sending %s:%d to shard on port %d", *address, port)
+
+    def process_statuses(self) -> None:
+        while True:
+            try:
+                status: ShardStatus = self.status_queue.get_nowait()
+            except Empty:
+                return
+            self.statuses[status.port] = status
+            self.redirected_since_status[status.port] = 0
+
+    def log_statuses(self) -> None:
+        for status in self.statuses.values():
+            logger.info(
+                "Shard on port %d: %d players, %.2f ms per tick (%.2f ms max)",
+                status.port,
+                status.player_count,
+                status.tick_time * 1000,
+                status.max_tick_time * 1000,
+            )
+
+    def forget_shard(self, port: int) -> None:
+        self.statuses.pop(port, None)
+        self.redirected_since_status.pop(port, None)
+
+    def serve(self, processes: dict[int, SpawnProcess], log_interval: float = 10) -> None:
+        last_log: float = time.monotonic()
+        while self.statuses:
+            # Nothing here needs to happen at a fixed rate, so sleep until a packet arrives
+            select.select([self.transport.socket], [], [], 0.1)
+            for packet, address in self.transport.poll():
+                self.handlers.dispatch(packet, address)
+            self.transport.flush()
+
+            self.process_statuses()
+
+            for port, process in processes.items():
+                if port in self.statuses and not process.is_alive():
+                    logger.error("Shard on port %d exited with code %s", port, process.exitcode)
+                    self.forget_shard(port)
+
+            if time.monotonic() - last_log >= log_interval:
+                last_log = time.monotonic()
+                self.log_statuses()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Multiplayer demo server split across several processes"
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="how many shards to run, defaulting to one per CPU core",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_PORT,
+        help="the UDP port clients connect to, with shards listening on the ports after it",
+    )
+    args, server_args = parser.parse_known_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    # Spawn rather than fork, so each shard starts from a clean interpreter with its own engine
+    context = multiprocessing.get_context("spawn")
+    status_queue: Queue[ShardStatus] = context.Queue()
+    processes: dict[int, SpawnProcess] = {}
+    for i in range(args.shards):
+        port: int = args.port + 1 + i
+        processes[port] = context.Process(
+            target=run_shard, args=(port, server_args, status_queue), daemon=True
+        )
+        processes[port].start()
+
+    front_door = FrontDoor(args.port, list(processes), status_queue)
+    logger.info("Front door listening on port %d for %d shards", args.port, args.shards)
+    try:
+        front_door.serve(processes)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        front_door.transport.close()
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
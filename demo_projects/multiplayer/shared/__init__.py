@@ -1,10 +1,35 @@
+from __future__ import annotations
 from pathlib import Path
-import ajishio as aj
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    import ajishio as aj
 
 project_dir: Path = Path(__file__).parent
-sprites: dict[str, aj.GameSprite] = aj.load_aseprite_sprites(project_dir / "sprites")
-rooms: list[aj.GameLevel] = aj.load_ldtk_levels(project_dir / "room_data" / "level" / "simplified")
 
 room_width: int = 704
 room_height: int = 384
-room_background_color: aj.Color = aj.Color(155, 207, 239)
+
+# These are loaded the first time they're used, since importing the engine opens a window. That
+# way the parts of the demo which only need the packet definitions (the front door of a sharded
+# server and the load tester) can import them without one
+sprites: dict[str, aj.GameSprite]
+rooms: list[aj.GameLevel]
+room_background_color: aj.Color
+
+
+def __getattr__(name: str) -> Any:
+    import ajishio as aj
+
+    value: Any
+    if name == "sprites":
+        value = aj.load_aseprite_sprites(project_dir / "sprites")
+    elif name == "rooms":
+        value = aj.load_ldtk_levels(project_dir / "room_data" / "level" / "simplified")
+    elif name == "room_background_color":
+        value = aj.Color(155, 207, 239)
+    else:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+    globals()[name] = value
+    return value
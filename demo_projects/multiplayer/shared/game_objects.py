@@ -1,5 +1,9 @@
 import ajishio as aj
+import logging
 from demo_projects.multiplayer.shared import sprites
+from demo_projects.multiplayer.shared.netstats import NetStats
+
+logger = logging.getLogger(__name__)
 
 
 class PlayerSpawner(aj.GameObject):
@@ -8,6 +12,8 @@ class PlayerSpawner(aj.GameObject):
 
 
 class Floor(aj.GameObject):
+    merge_tiles: bool = True
+
     def __init__(self, x: float, y: float, *args, **kwargs) -> None:
         super().__init__(x, y, *args, **kwargs)
         self.collision_mask = aj.CollisionMask(
@@ -44,6 +50,10 @@ class Player(aj.GameObject):
 
         self.name = ""
 
+        # Players positioned by something else (e.g. from snapshots, or by the client predicting
+        # its own player) don't run physics in `step`
+        self.simulated: bool = True
+
     def jump(self) -> None:
         if self.place_meeting(self.x, self.y + 1, Floor):
             self.y_velocity = self.jump_height
@@ -51,8 +61,12 @@ class Player(aj.GameObject):
     def step(self) -> None:
         super().step()
 
+        if self.simulated:
+            self.simulate(aj.delta_time)
+
+    def simulate(self, delta_time: float) -> None:
         # Clamp delta_time to avoid large steps
-        delta_time = min(aj.delta_time, self.max_delta_time)
+        delta_time = min(delta_time, self.max_delta_time)
 
         # Apply gravity
         self.y_velocity += self.gravity * delta_time
@@ -110,3 +124,51 @@ class Player(aj.GameObject):
             self.name,
             aj.Color(240, 240, 16),
         )
+
+
+class NetStatsReporter(aj.GameObject):
+    """Summarises a transport's network statistics every `interval` seconds, logging the summary at
+    `level` and, if `overlay` is set, drawing it over the game until the next one."""
+
+    def __init__(
+        self,
+        stats: NetStats,
+        interval: float = 5,
+        level: int = logging.INFO,
+        overlay: bool = False,
+        *args,
+        **kwargs,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.stats = stats
+        self.interval = interval
+        self.level = level
+        self.overlay = overlay
+
+        self.summary: list[str] = []
+        aj.every(self.interval, self.report, self)
+
+        # Draw on top of everything else
+        self.depth = -999
+
+    def report(self) -> None:
+        self.summary = self.stats.summary()
+        for line in self.summary:
+            logger.log(self.level, line)
+        self.stats.reset()
+
+    def draw(self) -> None:
+        super().draw()
+
+        if not self.overlay or not self.summary:
+            return
+
+        x = aj.view_xport[aj.view_current] + 10
+        y = aj.view_yport[aj.view_current] + 10
+        line_height = max(aj.text_height(line) for line in self.summary)
+        w = max(aj.text_width(line) for line in self.summary)
+        aj.draw_rectangle(
+            x - 4, y - 4, w + 8, line_height * len(self.summary) + 8, color=aj.c_black, alpha=0.5
+        )
+        for i, line in enumerate(self.summary):
+            aj.draw_text(x, y + i * line_height, line, aj.c_white)
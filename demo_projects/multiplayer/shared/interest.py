@@ -0,0 +1,56 @@
+from __future__ import annotations
+from demo_projects.multiplayer.shared.session import PlayerId
+
+
+class SpatialGrid:
+    """Buckets entities into square cells so that everything near a point can be found by only
+    looking at the cells around it, rather than at every entity."""
+
+    def __init__(self, cell_size: float) -> None:
+        self.cell_size: float = cell_size
+        self._cells: dict[tuple[int, int], list[tuple[PlayerId, float, float]]] = {}
+
+    def clear(self) -> None:
+        self._cells.clear()
+
+    def insert(self, entity_id: PlayerId, x: float, y: float) -> None:
+        cell = (int(x // self.cell_size), int(y // self.cell_size))
+        self._cells.setdefault(cell, []).append((entity_id, x, y))
+
+    def query(self, x: float, y: float, radius: float) -> set[PlayerId]:
+        found: set[PlayerId] = set()
+        radius_squared: float = radius * radius
+        min_cx, max_cx = int((x - radius) // self.cell_size), int((x + radius) // self.cell_size)
+        min_cy, max_cy = int((y - radius) // self.cell_size), int((y + radius) // self.cell_size)
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                for entity_id, ex, ey in self._cells.get((cx, cy), ()):
+                    if (ex - x) * (ex - x) + (ey - y) * (ey - y) <= radius_squared:
+                        found.add(entity_id)
+        return found
+
+
+def update_relevant(
+    grid: SpatialGrid,
+    relevant: set[PlayerId],
+    observer_id: PlayerId,
+    x: float,
+    y: float,
+    radius: float,
+    hysteresis: float = 1.25,
+) -> tuple[set[PlayerId], set[PlayerId]]:
+    """Update an observer's set of relevant entities in place, returning the (entered, left) sets.
+
+    Entities come into the set within `radius`, but only leave once they're `hysteresis` times
+    further away, so that something hovering on the edge doesn't spawn and despawn every update.
+    """
+    near: set[PlayerId] = grid.query(x, y, radius)
+    if relevant:
+        near |= relevant & grid.query(x, y, radius * hysteresis)
+    near.discard(observer_id)
+
+    entered: set[PlayerId] = near - relevant
+    left: set[PlayerId] = relevant - near
+    relevant.clear()
+    relevant.update(near)
+    return entered, left
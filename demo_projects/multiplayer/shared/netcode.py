@@ -0,0 +1,79 @@
+from __future__ import annotations
+from collections import deque
+from dataclasses import dataclass
+from typing import Iterator
+
+
+@dataclass
+class InputCommand:
+    """The input a client applied to its own player on one frame, and where that left the player
+    according to the client's prediction."""
+
+    sequence: int
+    delta_time: float
+    x_input: int
+    jump: bool
+    x: float = 0
+    y: float = 0
+    x_velocity: float = 0
+    y_velocity: float = 0
+
+
+class InputHistory:
+    """The inputs a client has predicted with but the server hasn't confirmed yet, oldest first."""
+
+    def __init__(self, size: int = 256) -> None:
+        self._commands: deque[InputCommand] = deque(maxlen=size)
+
+    def __iter__(self) -> Iterator[InputCommand]:
+        return iter(self._commands)
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+    def add(self, command: InputCommand) -> None:
+        self._commands.append(command)
+
+    def acknowledge(self, sequence: int) -> InputCommand | None:
+        """Forget every command up to and including `sequence`, which the server has now applied,
+        returning that command if it was still remembered."""
+        acknowledged: InputCommand | None = None
+        while self._commands and self._commands[0].sequence <= sequence:
+            acknowledged = self._commands.popleft()
+        if acknowledged is not None and acknowledged.sequence != sequence:
+            return None
+        return acknowledged
+
+
+class InterpolationBuffer:
+    """Timestamped positions of one remote entity, so it can be drawn where it was a fixed delay
+    ago by blending between the two positions either side of that time. The delay should be long
+    enough that there's usually a newer position already waiting, even if a packet is lost.
+    """
+
+    def __init__(self, size: int = 32) -> None:
+        self._samples: deque[tuple[float, float, float]] = deque(maxlen=size)
+
+    def add(self, time: float, x: float, y: float) -> None:
+        # Anything older than what we already have arrived out of order and is no use
+        if self._samples and time <= self._samples[-1][0]:
+            return
+        self._samples.append((time, x, y))
+
+    def sample(self, time: float) -> tuple[float, float] | None:
+        if not self._samples:
+            return None
+
+        # Drop samples which are no longer needed to interpolate to `time` or later
+        while len(self._samples) >= 2 and self._samples[1][0] <= time:
+            self._samples.popleft()
+
+        t0, x0, y0 = self._samples[0]
+        if time <= t0 or len(self._samples) == 1:
+            # Either we're ahead of what's arrived and hold the last known position rather than
+            # guessing, or we're still waiting for the delay to catch up to the first sample
+            return x0, y0
+
+        t1, x1, y1 = self._samples[1]
+        amount: float = (time - t0) / (t1 - t0)
+        return x0 + (x1 - x0) * amount, y0 + (y1 - y0) * amount
@@ -0,0 +1,241 @@
+from __future__ import annotations
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+import argparse
+import logging
+import time
+import demo_projects.multiplayer.shared.packet as pck
+
+if TYPE_CHECKING:
+    from demo_projects.multiplayer.shared.transport import Address
+
+# Upper bounds of each histogram bucket. Anything above the last bound goes in one overflow bucket
+TIME_BUCKETS: list[float] = [0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1]
+SIZE_BUCKETS: list[float] = [16, 32, 64, 128, 256, 512, 1024, 1200, 1500]
+DEPTH_BUCKETS: list[float] = [0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096]
+
+
+class Histogram:
+    """Counts values into fixed buckets, so percentiles can be estimated without keeping every
+    value around. Estimates assume values are spread evenly within each bucket."""
+
+    def __init__(self, bounds: list[float]) -> None:
+        self.bounds: list[float] = bounds
+        self.counts: list[int] = [0] * (len(bounds) + 1)
+        self.count: int = 0
+        self.total: float = 0
+        self.max: float = 0
+
+    def add(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: Histogram) -> None:
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0
+
+    def percentile(self, fraction: float) -> float:
+        if not self.count:
+            return 0
+        target: float = fraction * self.count
+        seen: int = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= target:
+                lower: float = self.bounds[i - 1] if i > 0 else 0
+                upper: float = min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+                return lower + (upper - lower) * max(target - seen, 0) / count
+            seen += count
+        return self.max
+
+    def reset(self) -> None:
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+
+@dataclass
+class PeerStats:
+    """Round trip times to one peer, measured by requests it's expected to answer (e.g. position
+    sync requests or snapshots, which are acknowledged). Requests which never get an answer are
+    counted as lost."""
+
+    rtt: Histogram = field(default_factory=lambda: Histogram(TIME_BUCKETS))
+    last_rtt: float | None = None
+    probes_sent: int = 0
+    probes_answered: int = 0
+
+    @property
+    def loss(self) -> float | None:
+        """The fraction of requests since the last reset which went unanswered. Requests still in
+        flight count as unanswered, so this reads slightly high at short intervals."""
+        if not self.probes_sent:
+            return None
+        return max(0, 1 - self.probes_answered / self.probes_sent)
+
+    def reset(self) -> None:
+        self.rtt.reset()
+        self.probes_sent = 0
+        self.probes_answered = 0
+
+
+class NetStats:
+    """Traffic counters for one transport, counted since `window_start`. Whoever reports them calls
+    `reset` to start the next window, so rates are per reporting interval."""
+
+    def __init__(self) -> None:
+        self.packets_in: list[int] = [0] * 256
+        self.bytes_in: list[int] = [0] * 256
+        self.packets_out: list[int] = [0] * 256
+        self.bytes_out: list[int] = [0] * 256
+
+        self.datagrams_in: int = 0
+        self.datagrams_out: int = 0
+        self.datagram_size_in = Histogram(SIZE_BUCKETS)
+        self.datagram_size_out = Histogram(SIZE_BUCKETS)
+
+        # Reliable messages sent again because the datagram they were in was lost
+        self.messages_resent: int = 0
+
+        # How many datagrams were waiting each time the socket was drained
+        self.queue_depth = Histogram(DEPTH_BUCKETS)
+
+        # Time spent handling networking and simulation each tick, measured by the owner
+        self.tick_time = Histogram(TIME_BUCKETS)
+
+        self.peers: dict[Address, PeerStats] = {}
+        self.window_start: float = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        return max(time.monotonic() - self.window_start, 1e-6)
+
+    def record_sent(self, packet: pck.Packet) -> None:
+        self.packets_out[packet._type_byte] += 1
+        self.bytes_out[packet._type_byte] += packet.size()
+
+    def record_received(self, packet: pck.Packet) -> None:
+        self.packets_in[packet._type_byte] += 1
+        self.bytes_in[packet._type_byte] += packet.size()
+
+    def record_datagram_sent(self, size: int) -> None:
+        self.datagrams_out += 1
+        self.datagram_size_out.add(size)
+
+    def record_datagram_received(self, size: int) -> None:
+        self.datagrams_in += 1
+        self.datagram_size_in.add(size)
+
+    def peer(self, address: Address) -> PeerStats:
+        peer: PeerStats | None = self.peers.get(address)
+        if peer is None:
+            peer = self.peers[address] = PeerStats()
+        return peer
+
+    def probe_sent(self, address: Address) -> None:
+        self.peer(address).probes_sent += 1
+
+    def probe_answered(self, address: Address, rtt: float) -> None:
+        peer = self.peer(address)
+        peer.probes_answered += 1
+        peer.last_rtt = rtt
+        peer.rtt.add(rtt)
+
+    def forget_peer(self, address: Address) -> None:
+        self.peers.pop(address, None)
+
+    def rtt(self) -> Histogram:
+        """Round trip times to every peer together."""
+        combined = Histogram(TIME_BUCKETS)
+        for peer in self.peers.values():
+            combined.merge(peer.rtt)
+        return combined
+
+    def loss(self) -> float | None:
+        """Unanswered requests as a fraction of all requests sent to every peer."""
+        sent: int = sum(peer.probes_sent for peer in self.peers.values())
+        if not sent:
+            return None
+        answered: int = sum(peer.probes_answered for peer in self.peers.values())
+        return max(0, 1 - answered / sent)
+
+    def summary(self, top_types: int = 3) -> list[str]:
+        """A few human readable lines describing the current window."""
+        elapsed: float = self.elapsed
+        rtt: Histogram = self.rtt()
+        loss: float | None = self.loss()
+
+        def busiest(packets: list[int], num_bytes: list[int]) -> str:
+            types = sorted(
+                (t for t in range(len(packets)) if packets[t]), key=lambda t: -num_bytes[t]
+            )
+            return ", ".join(
+                f"{pck.MessageType(t).name} {packets[t] / elapsed:.0f}/s "
+                f"{num_bytes[t] / elapsed / 1024:.1f} KiB/s"
+                for t in types[:top_types]
+            )
+
+        return [
+            f"in: {sum(self.packets_in) / elapsed:.0f} packets/s in "
+            f"{self.datagrams_in / elapsed:.0f} datagrams/s, "
+            f"{sum(self.bytes_in) / elapsed / 1024:.1f} KiB/s",
+            f"out: {sum(self.packets_out) / elapsed:.0f} packets/s in "
+            f"{self.datagrams_out / elapsed:.0f} datagrams/s, "
+            f"{sum(self.bytes_out) / elapsed / 1024:.1f} KiB/s, "
+            f"{self.messages_resent / elapsed:.1f} resent/s",
+            f"top in: {busiest(self.packets_in, self.bytes_in) or '-'}",
+            f"top out: {busiest(self.packets_out, self.bytes_out) or '-'}",
+            f"tick: mean {self.tick_time.mean * 1000:.2f} ms, "
+            f"p95 {self.tick_time.percentile(0.95) * 1000:.2f} ms, "
+            f"max {self.tick_time.max * 1000:.2f} ms, "
+            f"queue depth p95 {self.queue_depth.percentile(0.95):.0f} "
+            f"max {self.queue_depth.max:.0f}",
+            f"rtt: {len(self.peers)} peers, p50 {rtt.percentile(0.5) * 1000:.0f} ms, "
+            f"p95 {rtt.percentile(0.95) * 1000:.0f} ms, max {rtt.max * 1000:.0f} ms, "
+            f"loss {'-' if loss is None else f'{loss:.1%}'}",
+        ]
+
+    def reset(self) -> None:
+        for counters in (self.packets_in, self.bytes_in, self.packets_out, self.bytes_out):
+            counters[:] = [0] * len(counters)
+        self.datagrams_in = 0
+        self.datagrams_out = 0
+        self.messages_resent = 0
+        self.datagram_size_in.reset()
+        self.datagram_size_out.reset()
+        self.queue_depth.reset()
+        self.tick_time.reset()
+        for peer in self.peers.values():
+            peer.reset()
+        self.window_start = time.monotonic()
+
+
+def add_netstats_args(parser: argparse.ArgumentParser, default_interval: float) -> None:
+    parser.add_argument(
+        "--netstats-interval",
+        type=float,
+        default=default_interval,
+        help="log network statistics every this many seconds, or never if 0",
+    )
+    parser.add_argument(
+        "--netstats-level",
+        type=lambda name: logging.getLevelNamesMapping()[name.upper()],
+        default=logging.INFO,
+        help="the level network statistics are logged at, e.g. DEBUG or INFO",
+    )
+    parser.add_argument(
+        "--netstats-overlay",
+        action="store_true",
+        help="draw the latest network statistics over the game",
+    )
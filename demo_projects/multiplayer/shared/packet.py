@@ -2,32 +2,109 @@ from __future__ import annotations
 import enum
 from abc import ABC, abstractmethod
 import struct
-from uuid import UUID
-
-
-def unpack(data: bytes) -> Packet:
-    header_byte, body = data[0], data[1:]
-    match MessageType(header_byte):
-        case MessageType.PLAYER_POSITION:
-            return PlayerPositionPacket.unpack(body)
-        case MessageType.PLAYER_ID:
-            return PlayerIdPacket.unpack(body)
-        case MessageType.PLAYER_X_INPUT:
-            return PlayerXInputPacket.unpack(body)
-        case MessageType.PLAYER_JUMP:
-            return PlayerJumpPacket.unpack(body)
-        case MessageType.OTHER_PLAYER_POSITION:
-            return OtherPlayerPositionPacket.unpack(body)
-        case MessageType.CONNECTION_REQUEST:
-            return ConnectionRequestPacket.unpack(body)
-        case MessageType.PLAYER_DISCONNECT:
-            return PlayerDisconnectPacket.unpack(body)
-        case MessageType.POSITION_SYNC_REQUEST:
-            return PositionSyncRequestPacket.unpack(body)
-        case MessageType.POSITION_SYNC_RESPONSE:
-            return PositionSyncResponsePacket.unpack(body)
-        case _:
-            raise ValueError("Invalid packet type")
+from math import floor
+from typing import Any, Callable, ClassVar, Iterator, TypeVar
+from demo_projects.multiplayer.shared.snapshot import (
+    SnapshotDelta,
+    EntityDelta,
+    FIELD_X,
+    FIELD_Y,
+)
+from demo_projects.multiplayer.shared.session import PlayerId
+from demo_projects.multiplayer.shared.quantise import POSITION_X, POSITION_Y, BitReader, BitWriter
+
+# Keep datagrams under the smallest MTU we're likely to see so they never get fragmented
+MAX_DATAGRAM_SIZE: int = 1200
+
+# The largest payload a UDP datagram can carry
+_MAX_UDP_PAYLOAD: int = 65507
+
+_length_prefix = struct.Struct("!H")
+
+# Messages on a reliable channel are followed by their message ID, inside the length prefix
+_message_id = struct.Struct("!H")
+
+# Batches are packed into this buffer rather than into fresh bytes objects for every message
+_scratch = bytearray(_MAX_UDP_PAYLOAD)
+
+# Position packets are packed often enough that they quantise inline rather than through
+# `Quantiser.quantise`. Positions outside the room's margin are still clamped to its edge
+_X_SCALE: float = POSITION_X.scale
+_X_BIAS: float = POSITION_X.bias
+_X_STEPS: int = POSITION_X.steps
+_Y_SCALE: float = POSITION_Y.scale
+_Y_BIAS: float = POSITION_Y.bias
+_Y_STEPS: int = POSITION_Y.steps
+
+# Decoders indexed by message type byte, filled in as each packet class is defined
+_decoders: list[Callable[[memoryview, int], Packet] | None] = [None] * 256
+
+# Whether each message type is sent on a reliable channel, and so carries a message ID
+_reliable: list[bool] = [False] * 256
+
+
+def pack_batch(
+    messages: list[Message], max_size: int = MAX_DATAGRAM_SIZE, header_size: int = 0
+) -> Iterator[tuple[memoryview, int]]:
+    """Coalesce messages into as few datagrams as possible, each one a run of length-prefixed
+    messages no bigger than `max_size` (unless a single message is bigger). Each datagram starts
+    with `header_size` bytes left for the caller to fill in, and comes with how many of `messages`
+    it holds.
+
+    The datagrams are views into a shared buffer, so each one is only valid until the next one is
+    requested. Send it straight away rather than holding on to it.
+    """
+    offset: int = header_size
+    count: int = 0
+    for packet, message_id in messages:
+        size: int = packet.size()
+        framed_size: int = _length_prefix.size + size
+        if message_id is not None:
+            framed_size += _message_id.size
+        if count and offset + framed_size > max_size:
+            yield memoryview(_scratch)[:offset], count
+            offset = header_size
+            count = 0
+        if header_size + framed_size > _MAX_UDP_PAYLOAD:
+            raise ValueError(f"{type(packet).__name__} is too big to send ({size} bytes)")
+        _length_prefix.pack_into(_scratch, offset, framed_size - _length_prefix.size)
+        packed: bytes | None = packet._packed
+        if packed is None:
+            packet.pack_into(_scratch, offset + _length_prefix.size)
+        else:
+            _scratch[offset + _length_prefix.size : offset + _length_prefix.size + size] = packed
+        if message_id is not None:
+            _message_id.pack_into(_scratch, offset + _length_prefix.size + size, message_id)
+        offset += framed_size
+        count += 1
+    if count:
+        yield memoryview(_scratch)[:offset], count
+
+
+def unpack_batch(data: bytes | memoryview, offset: int = 0) -> list[Message]:
+    view = data if isinstance(data, memoryview) else memoryview(data)
+    messages: list[Message] = []
+    while offset < len(view):
+        (length,) = _length_prefix.unpack_from(view, offset)
+        offset += _length_prefix.size
+        if offset + length > len(view) or length == 0:
+            raise ValueError("Truncated message in batch")
+        if _reliable[view[offset]]:
+            end: int = offset + length - _message_id.size
+            (message_id,) = _message_id.unpack_from(view, end)
+            messages.append((unpack(view[offset:end]), message_id))
+        else:
+            messages.append((unpack(view[offset : offset + length]), None))
+        offset += length
+    return messages
+
+
+def unpack(data: bytes | memoryview) -> Packet:
+    view = data if isinstance(data, memoryview) else memoryview(data)
+    decoder = _decoders[view[0]]
+    if decoder is None:
+        raise ValueError("Invalid packet type")
+    return decoder(view, 0)
 
 
 class MessageType(enum.Enum):
@@ -40,141 +117,503 @@ class MessageType(enum.Enum):
     PLAYER_DISCONNECT = 6
     POSITION_SYNC_REQUEST = 7
     POSITION_SYNC_RESPONSE = 8
+    SNAPSHOT = 9
+    SNAPSHOT_ACK = 10
+    ENTITY_DESPAWN = 11
+    PLAYER_INPUT = 12
+    SHARD_REDIRECT = 13
+    SERVER_INFO_REQUEST = 14
+    SERVER_INFO = 15
+    PLAYER_CORRECTION = 16
+
+
+class Channel(enum.Enum):
+    """How a message type is delivered. Unreliable messages may be lost, duplicated or arrive out
+    of order. Reliable messages are resent until they arrive and are delivered exactly once, and
+    reliable ordered ones are also delivered in the order they were sent."""
+
+    UNRELIABLE = 0
+    RELIABLE_UNORDERED = 1
+    RELIABLE_ORDERED = 2
 
 
 class Packet(ABC):
-    def __init__(self, message_type: MessageType) -> None:
-        self.message_type = message_type
-        self.header = struct.pack("!B", self.message_type.value)
+    message_type: ClassVar[MessageType]
+    channel: ClassVar[Channel] = Channel.UNRELIABLE
+
+    # The whole message including the leading message type byte. Packets with a variable size
+    # override `size`, `pack_into` and `unpack_from` to use more than one struct
+    _struct: ClassVar[struct.Struct] = struct.Struct("!B")
+    _type_byte: ClassVar[int]
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        cls._type_byte = cls.message_type.value
+        _decoders[cls._type_byte] = cls.unpack_from
+        _reliable[cls._type_byte] = cls.channel is not Channel.UNRELIABLE
+
+    # Set by `prepack`, and copied into batches instead of packing the packet again
+    _packed: bytes | None = None
+
+    def size(self) -> int:
+        return self._struct.size
 
-    @abstractmethod
     def pack(self) -> bytes:
+        buffer = bytearray(self.size())
+        self.pack_into(buffer, 0)
+        return bytes(buffer)
+
+    def prepack(self) -> None:
+        """Pack the packet once up front, for when the same packet is sent to many peers. Its fields
+        mustn't change afterwards."""
+        self._packed = self.pack()
+
+    @abstractmethod
+    def pack_into(self, buffer: bytearray, offset: int) -> None:
+        pass
+
+    @classmethod
+    @abstractmethod
+    def unpack_from(cls, data: memoryview, offset: int) -> Packet:
         pass
 
 
+# A packet along with its message ID if it's sent on a reliable channel
+Message = tuple[Packet, int | None]
+
+P = TypeVar("P", bound=Packet)
+
+
+class PacketHandlers:
+    """Routes each packet to the handler registered for its message type, passing along any extra
+    arguments given to `dispatch` (e.g. the address it came from)."""
+
+    def __init__(self) -> None:
+        self._handlers: list[Callable[..., None] | None] = [None] * 256
+
+    def register(self, packet_type: type[P], handler: Callable[..., None]) -> None:
+        self._handlers[packet_type._type_byte] = handler
+
+    def dispatch(self, packet: Packet, *args: Any) -> None:
+        handler = self._handlers[packet._type_byte]
+        if handler is not None:
+            handler(packet, *args)
+
+
 class PlayerPositionPacket(Packet):
+    message_type = MessageType.PLAYER_POSITION
+    # This spawns the client's own player, so it mustn't be lost
+    channel = Channel.RELIABLE_ORDERED
+    # Positions are sent as fixed point numbers, so arrive within `POSITION_X.max_error` and
+    # `POSITION_Y.max_error` of what was sent
+    _struct = struct.Struct("!BHH")
+
     def __init__(self, x: float, y: float) -> None:
-        super().__init__(MessageType.PLAYER_POSITION)
         self.x = x
         self.y = y
 
-    def pack(self) -> bytes:
-        return self.header + struct.pack("!ff", self.x, self.y)
+    def pack_into(self, buffer: bytearray, offset: int) -> None:
+        x: int = floor(self.x * _X_SCALE + _X_BIAS)
+        y: int = floor(self.y * _Y_SCALE + _Y_BIAS)
+        self._struct.pack_into(
+            buffer,
+            offset,
+            self._type_byte,
+            0 if x < 0 else _X_STEPS if x > _X_STEPS else x,
+            0 if y < 0 else _Y_STEPS if y > _Y_STEPS else y,
+        )
+
+    @classmethod
+    def unpack_from(cls, data: memoryview, offset: int) -> PlayerPositionPacket:
+        _, x, y = cls._struct.unpack_from(data, offset)
+        return cls(POSITION_X.dequantise(x), POSITION_Y.dequantise(y))
+
 
-    @staticmethod
-    def unpack(data: bytes) -> PlayerPositionPacket:
-        x, y = struct.unpack("!ff", data)
-        return PlayerPositionPacket(x, y)
+class PlayerCorrectionPacket(PlayerPositionPacket):
+    """Snaps an already spawned player back to where the server has them. A lost one is sent again
+    the next time the client reports a position the server won't accept."""
+
+    message_type = MessageType.PLAYER_CORRECTION
+    channel = Channel.UNRELIABLE
 
 
 class PlayerIdPacket(Packet):
-    def __init__(self, player_id: UUID) -> None:
-        super().__init__(MessageType.PLAYER_ID)
+    message_type = MessageType.PLAYER_ID
+    channel = Channel.RELIABLE_ORDERED
+    _struct = struct.Struct("!BH")
+
+    def __init__(self, player_id: PlayerId) -> None:
         self.player_id = player_id
 
-    def pack(self) -> bytes:
-        return self.header + struct.pack("!16s", self.player_id.bytes)
+    def pack_into(self, buffer: bytearray, offset: int) -> None:
+        self._struct.pack_into(buffer, offset, self._type_byte, self.player_id)
 
-    @staticmethod
-    def unpack(data: bytes) -> PlayerIdPacket:
-        player_id = struct.unpack("!16s", data)[0]
-        return PlayerIdPacket(UUID(bytes=player_id))
+    @classmethod
+    def unpack_from(cls, data: memoryview, offset: int) -> PlayerIdPacket:
+        _, player_id = cls._struct.unpack_from(data, offset)
+        return cls(player_id)
 
 
 class OtherPlayerPositionPacket(Packet):
-    def __init__(self, player_id: UUID, x: float, y: float) -> None:
-        super().__init__(MessageType.OTHER_PLAYER_POSITION)
+    message_type = MessageType.OTHER_PLAYER_POSITION
+    channel = Channel.RELIABLE_ORDERED
+    _struct = struct.Struct("!BHHH")
+
+    def __init__(self, player_id: PlayerId, x: float, y: float) -> None:
         self.player_id = player_id
         self.x = x
         self.y = y
 
-    def pack(self) -> bytes:
-        return self.header + struct.pack("!16sff", self.player_id.bytes, self.x, self.y)
+    def pack_into(self, buffer: bytearray, offset: int) -> None:
+        x: int = floor(self.x * _X_SCALE + _X_BIAS)
+        y: int = floor(self.y * _Y_SCALE + _Y_BIAS)
+        self._struct.pack_into(
+            buffer,
+            offset,
+            self._type_byte,
+            self.player_id,
+            0 if x < 0 else _X_STEPS if x > _X_STEPS else x,
+            0 if y < 0 else _Y_STEPS if y > _Y_STEPS else y,
+        )
 
-    @staticmethod
-    def unpack(data: bytes) -> OtherPlayerPositionPacket:
-        player_id, x, y = struct.unpack("!16sff", data)
-        return OtherPlayerPositionPacket(UUID(bytes=player_id), x, y)
+    @classmethod
+    def unpack_from(cls, data: memoryview, offset: int) -> OtherPlayerPositionPacket:
+        _, player_id, x, y = cls._struct.unpack_from(data, offset)
+        return cls(player_id, POSITION_X.dequantise(x), POSITION_Y.dequantise(y))
 
 
 class PlayerXInputPacket(Packet):
-    def __init__(self, player_id: UUID, x_input: int) -> None:
-        super().__init__(MessageType.PLAYER_X_INPUT)
+    message_type = MessageType.PLAYER_X_INPUT
+    channel = Channel.RELIABLE_ORDERED
+    _struct = struct.Struct("!BHb")
+
+    def __init__(self, player_id: PlayerId, x_input: int) -> None:
         self.player_id = player_id
         self.x_input = x_input
 
-    def pack(self) -> bytes:
-        return self.header + struct.pack("!16sb", self.player_id.bytes, self.x_input)
+    def pack_into(self, buffer: bytearray, offset: int) -> None:
+        self._struct.pack_into(buffer, offset, self._type_byte, self.player_id, self.x_input)
 
-    @staticmethod
-    def unpack(data: bytes) -> PlayerXInputPacket:
-        player_id, x_input = struct.unpack("!16sb", data)
-        return PlayerXInputPacket(UUID(bytes=player_id), x_input)
+    @classmethod
+    def unpack_from(cls, data: memoryview, offset: int) -> PlayerXInputPacket:
+        _, player_id, x_input = cls._struct.unpack_from(data, offset)
+        return cls(player_id, x_input)
 
 
 class PlayerJumpPacket(Packet):
-    def __init__(self, player_id: UUID) -> None:
-        super().__init__(MessageType.PLAYER_JUMP)
+    message_type = MessageType.PLAYER_JUMP
+    channel = Channel.RELIABLE_ORDERED
+    _struct = struct.Struct("!BH")
+
+    def __init__(self, player_id: PlayerId) -> None:
         self.player_id = player_id
 
-    def pack(self) -> bytes:
-        return self.header + struct.pack("!16s", self.player_id.bytes)
+    def pack_into(self, buffer: bytearray, offset: int) -> None:
+        self._struct.pack_into(buffer, offset, self._type_byte, self.player_id)
 
-    @staticmethod
-    def unpack(data: bytes) -> PlayerJumpPacket:
-        player_id = struct.unpack("!16s", data)[0]
-        return PlayerJumpPacket(UUID(bytes=player_id))
+    @classmethod
+    def unpack_from(cls, data: memoryview, offset: int) -> PlayerJumpPacket:
+        _, player_id = cls._struct.unpack_from(data, offset)
+        return cls(player_id)
 
 
 class ConnectionRequestPacket(Packet):
-    def __init__(self) -> None:
-        super().__init__(MessageType.CONNECTION_REQUEST)
+    message_type = MessageType.CONNECTION_REQUEST
+    channel = Channel.RELIABLE_UNORDERED
 
-    def pack(self) -> bytes:
-        return self.header
+    def pack_into(self, buffer: bytearray, offset: int) -> None:
+        self._struct.pack_into(buffer, offset, self._type_byte)
 
-    @staticmethod
-    def unpack(_) -> ConnectionRequestPacket:
-        return ConnectionRequestPacket()
+    @classmethod
+    def unpack_from(cls, data: memoryview, offset: int) -> ConnectionRequestPacket:
+        return cls()
 
 
 class PlayerDisconnectPacket(Packet):
-    def __init__(self, player_id: UUID) -> None:
-        super().__init__(MessageType.PLAYER_DISCONNECT)
+    message_type = MessageType.PLAYER_DISCONNECT
+    channel = Channel.RELIABLE_UNORDERED
+    _struct = struct.Struct("!BH")
+
+    def __init__(self, player_id: PlayerId) -> None:
         self.player_id = player_id
 
-    def pack(self) -> bytes:
-        return self.header + struct.pack("!16s", self.player_id.bytes)
+    def pack_into(self, buffer: bytearray, offset: int) -> None:
+        self._struct.pack_into(buffer, offset, self._type_byte, self.player_id)
 
-    @staticmethod
-    def unpack(data: bytes) -> PlayerDisconnectPacket:
-        player_id = struct.unpack("!16s", data)[0]
-        return PlayerDisconnectPacket(UUID(bytes=player_id))
+    @classmethod
+    def unpack_from(cls, data: memoryview, offset: int) -> PlayerDisconnectPacket:
+        _, player_id = cls._struct.unpack_from(data, offset)
+        return cls(player_id)
+
+
+class EntityDespawnPacket(Packet):
+    # Sent when a player moves out of range of another, unlike PlayerDisconnectPacket they are
+    # still in the game
+    message_type = MessageType.ENTITY_DESPAWN
+    channel = Channel.RELIABLE_ORDERED
+    _struct = struct.Struct("!BH")
+
+    def __init__(self, player_id: PlayerId) -> None:
+        self.player_id = player_id
+
+    def pack_into(self, buffer: bytearray, offset: int) -> None:
+        self._struct.pack_into(buffer, offset, self._type_byte, self.player_id)
+
+    @classmethod
+    def unpack_from(cls, data: memoryview, offset: int) -> EntityDespawnPacket:
+        _, player_id = cls._struct.unpack_from(data, offset)
+        return cls(player_id)
 
 
 class PositionSyncRequestPacket(Packet):
-    def __init__(self) -> None:
-        super().__init__(MessageType.POSITION_SYNC_REQUEST)
+    message_type = MessageType.POSITION_SYNC_REQUEST
 
-    def pack(self) -> bytes:
-        return self.header
+    def pack_into(self, buffer: bytearray, offset: int) -> None:
+        self._struct.pack_into(buffer, offset, self._type_byte)
 
-    @staticmethod
-    def unpack(_) -> PositionSyncRequestPacket:
-        return PositionSyncRequestPacket()
+    @classmethod
+    def unpack_from(cls, data: memoryview, offset: int) -> PositionSyncRequestPacket:
+        return cls()
 
 
 class PositionSyncResponsePacket(Packet):
-    def __init__(self, player_id: UUID, x: float, y: float) -> None:
-        super().__init__(MessageType.POSITION_SYNC_RESPONSE)
+    message_type = MessageType.POSITION_SYNC_RESPONSE
+    _struct = struct.Struct("!BHHH")
+
+    def __init__(self, player_id: PlayerId, x: float, y: float) -> None:
         self.player_id = player_id
         self.x = x
         self.y = y
 
-    def pack(self) -> bytes:
-        return self.header + struct.pack("!16sff", self.player_id.bytes, self.x, self.y)
-
-    @staticmethod
-    def unpack(data: bytes) -> PositionSyncResponsePacket:
-        player_id, x, y = struct.unpack("!16sff", data)
-        return PositionSyncResponsePacket(UUID(bytes=player_id), x, y)
+    def pack_into(self, buffer: bytearray, offset: int) -> None:
+        x: int = floor(self.x * _X_SCALE + _X_BIAS)
+        y: int = floor(self.y * _Y_SCALE + _Y_BIAS)
+        self._struct.pack_into(
+            buffer,
+            offset,
+            self._type_byte,
+            self.player_id,
+            0 if x < 0 else _X_STEPS if x > _X_STEPS else x,
+            0 if y < 0 else _Y_STEPS if y > _Y_STEPS else y,
+        )
+
+    @classmethod
+    def unpack_from(cls, data: memoryview, offset: int) -> PositionSyncResponsePacket:
+        _, player_id, x, y = cls._struct.unpack_from(data, offset)
+        return cls(player_id, POSITION_X.dequantise(x), POSITION_Y.dequantise(y))
+
+
+class SnapshotPacket(Packet):
+    message_type = MessageType.SNAPSHOT
+    _struct = struct.Struct("!BIIIIHH")
+
+    # After the header, entities and removals are bit-packed rather than byte aligned: each changed
+    # entity is its ID, a field mask and whichever of its position fields changed, each only as
+    # wide as its quantiser needs
+    _ID_BITS: int = 16
+    _MASK_BITS: int = 2
+
+    # Used as the base tick of a snapshot which isn't a delta against anything, and as the input
+    # frame when the server hasn't had any inputs from the recipient yet
+    NO_BASE: int = 0xFFFFFFFF
+    NO_INPUT_FRAME: int = 0xFFFFFFFF
+
+    def __init__(
+        self,
+        tick: int,
+        base_tick: int | None,
+        delta: SnapshotDelta,
+        server_time_ms: int = 0,
+        input_frame: int | None = None,
+    ) -> None:
+        self.tick = tick
+        self.base_tick = base_tick
+        self.delta = delta
+
+        # When the snapshot was taken, for interpolating between snapshots on the client
+        self.server_time_ms = server_time_ms
+
+        # The recipient's own input sequence number which their player's state in this snapshot
+        # corresponds to, for reconciling their prediction
+        self.input_frame = input_frame
+
+    def size(self) -> int:
+        bits: int = len(self.delta.removed) * self._ID_BITS
+        for change in self.delta.changed:
+            bits += self._ID_BITS + self._MASK_BITS
+            if change.mask & FIELD_X:
+                bits += POSITION_X.bits
+            if change.mask & FIELD_Y:
+                bits += POSITION_Y.bits
+        return self._struct.size + (bits + 7) // 8
+
+    def pack_into(self, buffer: bytearray, offset: int) -> None:
+        base_tick = self.NO_BASE if self.base_tick is None else self.base_tick
+        input_frame = self.NO_INPUT_FRAME if self.input_frame is None else self.input_frame
+        self._struct.pack_into(
+            buffer,
+            offset,
+            self._type_byte,
+            self.tick,
+            base_tick,
+            self.server_time_ms,
+            input_frame,
+            len(self.delta.changed),
+            len(self.delta.removed),
+        )
+
+        writer = BitWriter()
+        for change in self.delta.changed:
+            writer.write(change.entity_id, self._ID_BITS)
+            writer.write(change.mask, self._MASK_BITS)
+            if change.mask & FIELD_X:
+                writer.write(change.x, POSITION_X.bits)
+            if change.mask & FIELD_Y:
+                writer.write(change.y, POSITION_Y.bits)
+        for entity_id in self.delta.removed:
+            writer.write(entity_id, self._ID_BITS)
+        writer.pack_into(buffer, offset + self._struct.size)
+
+    @classmethod
+    def unpack_from(cls, data: memoryview, offset: int) -> SnapshotPacket:
+        _, tick, base_tick, server_time_ms, input_frame, num_changed, num_removed = (
+            cls._struct.unpack_from(data, offset)
+        )
+
+        reader = BitReader(data, offset + cls._struct.size)
+        delta = SnapshotDelta()
+        for _ in range(num_changed):
+            change = EntityDelta(reader.read(cls._ID_BITS), reader.read(cls._MASK_BITS))
+            if change.mask & FIELD_X:
+                change.x = reader.read(POSITION_X.bits)
+            if change.mask & FIELD_Y:
+                change.y = reader.read(POSITION_Y.bits)
+            delta.changed.append(change)
+
+        for _ in range(num_removed):
+            delta.removed.append(reader.read(cls._ID_BITS))
+
+        return cls(
+            tick,
+            None if base_tick == cls.NO_BASE else base_tick,
+            delta,
+            server_time_ms,
+            None if input_frame == cls.NO_INPUT_FRAME else input_frame,
+        )
+
+
+class SnapshotAckPacket(Packet):
+    message_type = MessageType.SNAPSHOT_ACK
+    _struct = struct.Struct("!BI")
+
+    def __init__(self, tick: int) -> None:
+        self.tick = tick
+
+    def pack_into(self, buffer: bytearray, offset: int) -> None:
+        self._struct.pack_into(buffer, offset, self._type_byte, self.tick)
+
+    @classmethod
+    def unpack_from(cls, data: memoryview, offset: int) -> SnapshotAckPacket:
+        _, tick = cls._struct.unpack_from(data, offset)
+        return cls(tick)
+
+
+class PlayerInputPacket(Packet):
+    # Sent every frame by clients being sent snapshots, so the server can simulate their player
+    # exactly as they did and tell them which input each snapshot has caught up to
+    message_type = MessageType.PLAYER_INPUT
+    _struct = struct.Struct("!BHIb?B")
+
+    def __init__(
+        self, player_id: PlayerId, sequence: int, x_input: int, jump: bool, delta_time_ms: int
+    ) -> None:
+        self.player_id = player_id
+        self.sequence = sequence
+        self.x_input = x_input
+        self.jump = jump
+        self.delta_time_ms = delta_time_ms
+
+    def pack_into(self, buffer: bytearray, offset: int) -> None:
+        self._struct.pack_into(
+            buffer,
+            offset,
+            self._type_byte,
+            self.player_id,
+            self.sequence,
+            self.x_input,
+            self.jump,
+            self.delta_time_ms,
+        )
+
+    @classmethod
+    def unpack_from(cls, data: memoryview, offset: int) -> PlayerInputPacket:
+        _, player_id, sequence, x_input, jump, delta_time_ms = cls._struct.unpack_from(data, offset)
+        return cls(player_id, sequence, x_input, jump, delta_time_ms)
+
+
+class ShardRedirectPacket(Packet):
+    # Sent by the front door of a sharded server in reply to a connection request, telling the
+    # client which port to send its connection request to instead
+    message_type = MessageType.SHARD_REDIRECT
+    channel = Channel.RELIABLE_UNORDERED
+    _struct = struct.Struct("!BH")
+
+    def __init__(self, port: int) -> None:
+        self.port = port
+
+    def pack_into(self, buffer: bytearray, offset: int) -> None:
+        self._struct.pack_into(buffer, offset, self._type_byte, self.port)
+
+    @classmethod
+    def unpack_from(cls, data: memoryview, offset: int) -> ShardRedirectPacket:
+        _, port = cls._struct.unpack_from(data, offset)
+        return cls(port)
+
+
+class ServerInfoRequestPacket(Packet):
+    # Asks the server how busy it is. The server echoes `request_id` back so the sender can match
+    # up the reply and time the round trip
+    message_type = MessageType.SERVER_INFO_REQUEST
+    _struct = struct.Struct("!BI")
+
+    def __init__(self, request_id: int) -> None:
+        self.request_id = request_id
+
+    def pack_into(self, buffer: bytearray, offset: int) -> None:
+        self._struct.pack_into(buffer, offset, self._type_byte, self.request_id)
+
+    @classmethod
+    def unpack_from(cls, data: memoryview, offset: int) -> ServerInfoRequestPacket:
+        _, request_id = cls._struct.unpack_from(data, offset)
+        return cls(request_id)
+
+
+class ServerInfoPacket(Packet):
+    message_type = MessageType.SERVER_INFO
+    _struct = struct.Struct("!BIHII")
+
+    def __init__(
+        self, request_id: int, player_count: int, tick_time_us: int, max_tick_time_us: int
+    ) -> None:
+        self.request_id = request_id
+        self.player_count = player_count
+        self.tick_time_us = tick_time_us
+        self.max_tick_time_us = max_tick_time_us
+
+    def pack_into(self, buffer: bytearray, offset: int) -> None:
+        self._struct.pack_into(
+            buffer,
+            offset,
+            self._type_byte,
+            self.request_id,
+            self.player_count,
+            self.tick_time_us,
+            self.max_tick_time_us,
+        )
+
+    @classmethod
+    def unpack_from(cls, data: memoryview, offset: int) -> ServerInfoPacket:
+        _, request_id, player_count, tick_time_us, max_tick_time_us = cls._struct.unpack_from(
+            data, offset
+        )
+        return cls(request_id, player_count, tick_time_us, max_tick_time_us)
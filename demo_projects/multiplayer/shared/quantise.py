@@ -0,0 +1,83 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from demo_projects.multiplayer.shared import room_width, room_height
+
+
+@dataclass(frozen=True)
+class Quantiser:
+    """Maps floats between `minimum` and `maximum` onto the integers 0 to `steps`, so they can be
+    sent as fixed point numbers in `bits` bits. Values outside the range are clamped, and values
+    inside it come back within `precision / 2` of where they started."""
+
+    minimum: float
+    maximum: float
+    precision: float
+    steps: int = field(init=False)
+    bits: int = field(init=False)
+
+    # `floor(value * scale + bias)`, clamped to 0 to `steps`, quantises without a division or a
+    # method call, for hot loops to inline. It only differs from `quantise` on exact ties
+    scale: float = field(init=False)
+    bias: float = field(init=False)
+
+    def __post_init__(self) -> None:
+        steps: int = round((self.maximum - self.minimum) / self.precision)
+        object.__setattr__(self, "steps", steps)
+        object.__setattr__(self, "bits", steps.bit_length())
+        object.__setattr__(self, "scale", 1 / self.precision)
+        object.__setattr__(self, "bias", 0.5 - self.minimum / self.precision)
+
+    @property
+    def max_error(self) -> float:
+        return self.precision / 2
+
+    def quantise(self, value: float) -> int:
+        step: int = round((value - self.minimum) / self.precision)
+        return 0 if step < 0 else self.steps if step > self.steps else step
+
+    def dequantise(self, value: int) -> float:
+        return self.minimum + value * self.precision
+
+
+# Positions are sent in 1/16ths of a pixel, within the room plus a margin for players who have
+# wandered or fallen a little way off its edge. At the demo's room size x takes 14 bits and y 13
+POSITION_PRECISION: float = 1 / 16
+ROOM_MARGIN: float = 32
+POSITION_X = Quantiser(-ROOM_MARGIN, room_width + ROOM_MARGIN, POSITION_PRECISION)
+POSITION_Y = Quantiser(-ROOM_MARGIN, room_height + ROOM_MARGIN, POSITION_PRECISION)
+
+
+class BitWriter:
+    """Packs fields of any number of bits one after another, rather than each taking whole bytes.
+    The last byte is padded with zeros."""
+
+    def __init__(self) -> None:
+        self._value: int = 0
+        self.bit_count: int = 0
+
+    @property
+    def byte_count(self) -> int:
+        return (self.bit_count + 7) // 8
+
+    def write(self, value: int, bits: int) -> None:
+        self._value = (self._value << bits) | (value & ((1 << bits) - 1))
+        self.bit_count += bits
+
+    def pack_into(self, buffer: bytearray, offset: int) -> None:
+        byte_count: int = self.byte_count
+        padding: int = byte_count * 8 - self.bit_count
+        buffer[offset : offset + byte_count] = (self._value << padding).to_bytes(byte_count, "big")
+
+
+class BitReader:
+    """Reads back fields written by a `BitWriter`, from `offset` to the end of `data`."""
+
+    def __init__(self, data: bytes | memoryview, offset: int = 0) -> None:
+        self._value: int = int.from_bytes(data[offset:], "big")
+        self._remaining: int = (len(data) - offset) * 8
+
+    def read(self, bits: int) -> int:
+        self._remaining -= bits
+        if self._remaining < 0:
+            raise ValueError("Read past the end of the bit-packed data")
+        return (self._value >> self._remaining) & ((1 << bits) - 1)
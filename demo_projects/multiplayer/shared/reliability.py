@@ -0,0 +1,220 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Iterator
+import struct
+import demo_projects.multiplayer.shared.packet as pck
+from demo_projects.multiplayer.shared.netstats import NetStats
+
+# Every datagram starts with its own sequence number, then the newest sequence number received from
+# the peer and a bitfield saying which of the 32 before that were received too
+_header = struct.Struct("!HHI")
+HEADER_SIZE: int = _header.size
+
+ACK_BITS: int = 32
+SEQUENCE_MODULO: int = 0x10000
+
+# How many reliable unordered message IDs are remembered to spot duplicates
+_UNORDERED_WINDOW: int = 1024
+
+
+def sequence_newer(a: int, b: int) -> bool:
+    """Whether sequence number `a` comes after `b`, allowing for them wrapping around."""
+    return a != b and (a - b) % SEQUENCE_MODULO < SEQUENCE_MODULO // 2
+
+
+@dataclass
+class _SentDatagram:
+    time: float
+    message_keys: list[tuple[pck.Channel, int]]
+
+
+class Connection:
+    """Sequencing and acknowledgement state for talking to one peer over UDP.
+
+    Every datagram carries a sequence number along with acks for the last 33 datagrams received
+    from the peer, so acks ride along with whatever is being sent anyway. If there's nothing to
+    send but a reliable message arrived, a datagram with only the header is sent to ack it.
+
+    Messages on a reliable channel are remembered until a datagram holding them is acked, and are
+    only sent again once that datagram is given up on as lost. Reliable ordered messages are held
+    back until every earlier one has arrived.
+    """
+
+    # A datagram which hasn't been acked after this many round trips is assumed lost
+    resend_round_trips: float = 2
+    min_resend_timeout: float = 0.05
+    max_resend_timeout: float = 1
+
+    def __init__(self, now: float, stats: NetStats | None = None) -> None:
+        self.stats = stats
+        self.last_received: float = now
+        self.rtt: float = 0.1  # smoothed from acks
+
+        # Starting at 1 means a peer which hasn't received anything yet, and so acks 0, can't be
+        # mistaken for acking our first datagram
+        self.local_sequence: int = 1
+        self.remote_sequence: int | None = None
+        self.received_bits: int = 0  # bit n set if remote_sequence - 1 - n was received
+        self.ack_pending: bool = False
+
+        self.queue: list[pck.Message] = []
+        self.next_message_ids: dict[pck.Channel, int] = {
+            pck.Channel.RELIABLE_UNORDERED: 0,
+            pck.Channel.RELIABLE_ORDERED: 0,
+        }
+        self.unacked: dict[tuple[pck.Channel, int], pck.Packet] = {}
+        self.sent: dict[int, _SentDatagram] = {}
+
+        self.received_unordered: dict[int, None] = {}  # insertion ordered, oldest first
+        self.next_ordered_id: int = 0
+        self.ordered_buffer: dict[int, pck.Packet] = {}
+
+    @property
+    def resend_timeout(self) -> float:
+        return min(
+            max(self.rtt * self.resend_round_trips, self.min_resend_timeout),
+            self.max_resend_timeout,
+        )
+
+    def send(self, packet: pck.Packet) -> None:
+        channel: pck.Channel = packet.channel
+        if channel is pck.Channel.UNRELIABLE:
+            self.queue.append((packet, None))
+            return
+        message_id: int = self.next_message_ids[channel]
+        self.next_message_ids[channel] = (message_id + 1) % SEQUENCE_MODULO
+        self.unacked[(channel, message_id)] = packet
+        self.queue.append((packet, message_id))
+
+    def write_datagrams(self, now: float) -> Iterator[memoryview]:
+        """Pack everything queued, plus any reliable messages which need resending, into datagrams.
+        Like `pck.pack_batch`, each one must be sent before asking for the next."""
+        self.detect_loss(now)
+        if not self.queue and not self.ack_pending:
+            return
+
+        messages, self.queue = self.queue, []
+        ack: int = self.remote_sequence if self.remote_sequence is not None else 0
+        self.ack_pending = False
+
+        if not messages:
+            datagram = bytearray(HEADER_SIZE)
+            _header.pack_into(datagram, 0, self.next_sequence(now, []), ack, self.received_bits)
+            yield memoryview(datagram)
+            return
+
+        start: int = 0
+        for datagram_view, count in pck.pack_batch(messages, header_size=HEADER_SIZE):
+            keys = [
+                (packet.channel, message_id)
+                for packet, message_id in messages[start : start + count]
+                if message_id is not None
+            ]
+            start += count
+            sequence: int = self.next_sequence(now, keys)
+            _header.pack_into(datagram_view, 0, sequence, ack, self.received_bits)
+            yield datagram_view
+
+    def next_sequence(self, now: float, keys: list[tuple[pck.Channel, int]]) -> int:
+        sequence: int = self.local_sequence
+        self.local_sequence = (sequence + 1) % SEQUENCE_MODULO
+        self.sent[sequence] = _SentDatagram(now, keys)
+        return sequence
+
+    def detect_loss(self, now: float) -> None:
+        # Datagrams are remembered in the order they were sent, so stop at the first which might
+        # still be acked
+        timeout: float = self.resend_timeout
+        while self.sent:
+            sequence, datagram = next(iter(self.sent.items()))
+            if now - datagram.time < timeout:
+                break
+            del self.sent[sequence]
+            for key in datagram.message_keys:
+                packet: pck.Packet | None = self.unacked.get(key)
+                if packet is None:
+                    continue
+                self.queue.append((packet, key[1]))
+                if self.stats is not None:
+                    self.stats.messages_resent += 1
+
+    def read_datagram(self, data: bytes | memoryview, now: float) -> list[pck.Packet]:
+        """Process a datagram from the peer, returning the packets in it which are ready to be
+        handled. Raises ValueError, IndexError or struct.error if the datagram is malformed."""
+        view = data if isinstance(data, memoryview) else memoryview(data)
+        sequence, ack, ack_bits = _header.unpack_from(view, 0)
+        messages: list[pck.Message] = pck.unpack_batch(view, HEADER_SIZE)
+
+        if not self.record_received(sequence):
+            return []
+        self.last_received = now
+        self.process_acks(ack, ack_bits, now)
+
+        delivered: list[pck.Packet] = []
+        for packet, message_id in messages:
+            if message_id is None:
+                delivered.append(packet)
+                continue
+
+            self.ack_pending = True
+            if packet.channel is pck.Channel.RELIABLE_UNORDERED:
+                if message_id in self.received_unordered:
+                    continue
+                self.received_unordered[message_id] = None
+                if len(self.received_unordered) > _UNORDERED_WINDOW:
+                    del self.received_unordered[next(iter(self.received_unordered))]
+                delivered.append(packet)
+            elif message_id == self.next_ordered_id:
+                delivered.append(packet)
+                self.next_ordered_id = (self.next_ordered_id + 1) % SEQUENCE_MODULO
+                while self.next_ordered_id in self.ordered_buffer:
+                    delivered.append(self.ordered_buffer.pop(self.next_ordered_id))
+                    self.next_ordered_id = (self.next_ordered_id + 1) % SEQUENCE_MODULO
+            elif sequence_newer(message_id, self.next_ordered_id):
+                self.ordered_buffer[message_id] = packet
+        return delivered
+
+    def record_received(self, sequence: int) -> bool:
+        """Remember that a datagram arrived, returning False if it's a duplicate or too old to tell
+        whether it is."""
+        if self.remote_sequence is None:
+            self.remote_sequence = sequence
+            return True
+
+        if sequence_newer(sequence, self.remote_sequence):
+            shift: int = (sequence - self.remote_sequence) % SEQUENCE_MODULO
+            self.received_bits = ((self.received_bits << shift) | (1 << (shift - 1))) & (
+                (1 << ACK_BITS) - 1
+            )
+            self.remote_sequence = sequence
+            return True
+
+        behind: int = (self.remote_sequence - sequence) % SEQUENCE_MODULO
+        if behind == 0:
+            return False
+        if behind > ACK_BITS:
+            # Too old to tell whether it's been seen before, so it's safest to drop it
+            return False
+        bit: int = 1 << (behind - 1)
+        if self.received_bits & bit:
+            return False
+        self.received_bits |= bit
+        return True
+
+    def process_acks(self, ack: int, ack_bits: int, now: float) -> None:
+        datagram: _SentDatagram | None = self.sent.pop(ack, None)
+        if datagram is not None:
+            self.rtt += (now - datagram.time - self.rtt) * 0.1
+            self.acknowledge(datagram)
+
+        while ack_bits:
+            lowest: int = ack_bits & -ack_bits
+            ack_bits ^= lowest
+            sequence: int = (ack - lowest.bit_length()) % SEQUENCE_MODULO
+            datagram = self.sent.pop(sequence, None)
+            if datagram is not None:
+                self.acknowledge(datagram)
+
+    def acknowledge(self, datagram: _SentDatagram) -> None:
+        for key in datagram.message_keys:
+            self.unacked.pop(key, None)
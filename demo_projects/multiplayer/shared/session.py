@@ -0,0 +1,38 @@
+from __future__ import annotations
+from collections import deque
+
+# Players are identified on the wire by an unsigned 16-bit number handed out by the server when
+# they connect, rather than a 16 byte UUID in every message
+PlayerId = int
+
+MAX_PLAYER_ID: PlayerId = 0xFFFF
+
+
+def player_name(player_id: PlayerId) -> str:
+    return f"{player_id:04x}"
+
+
+class PlayerIdAllocator:
+    """Hands out player IDs which are unique among the players currently connected.
+
+    Released IDs go to the back of the queue, so an ID is only reused once every other free one has
+    been handed out. This stops packets still in flight for a player who just left being mistaken
+    for a player who just joined.
+    """
+
+    def __init__(self, max_id: PlayerId = MAX_PLAYER_ID) -> None:
+        self._free: deque[PlayerId] = deque()
+        self._next: PlayerId = 0
+        self._max_id: PlayerId = max_id
+
+    def acquire(self) -> PlayerId | None:
+        """Return a free ID, or None if every ID is in use."""
+        if self._next <= self._max_id:
+            self._next += 1
+            return self._next - 1
+        if self._free:
+            return self._free.popleft()
+        return None
+
+    def release(self, player_id: PlayerId) -> None:
+        self._free.append(player_id)
@@ -0,0 +1,86 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from demo_projects.multiplayer.shared.session import PlayerId
+
+# How many snapshots each side remembers, which bounds how stale a delta base can be
+HISTORY_SIZE: int = 64
+
+# Bits set in an entity delta's mask to say which fields follow
+FIELD_X: int = 1 << 0
+FIELD_Y: int = 1 << 1
+
+# A snapshot maps each entity to its (x, y) position, quantised by `POSITION_X` and `POSITION_Y`
+Snapshot = dict[PlayerId, tuple[int, int]]
+
+
+@dataclass
+class EntityDelta:
+    entity_id: PlayerId
+    mask: int
+    x: int = 0
+    y: int = 0
+
+
+@dataclass
+class SnapshotDelta:
+    changed: list[EntityDelta] = field(default_factory=list)
+    removed: list[PlayerId] = field(default_factory=list)
+
+
+def diff(base: Snapshot | None, current: Snapshot) -> SnapshotDelta:
+    """Work out what has to be sent for someone who has `base` to end up with `current`. Only
+    fields which changed are included, and entities new since `base` get every field."""
+    delta = SnapshotDelta()
+    if base is None:
+        base = {}
+
+    for entity_id, (x, y) in current.items():
+        old = base.get(entity_id)
+        mask: int = 0
+        if old is None or old[0] != x:
+            mask |= FIELD_X
+        if old is None or old[1] != y:
+            mask |= FIELD_Y
+        if mask:
+            delta.changed.append(EntityDelta(entity_id, mask, x, y))
+
+    for entity_id in base:
+        if entity_id not in current:
+            delta.removed.append(entity_id)
+
+    return delta
+
+
+def apply(base: Snapshot | None, delta: SnapshotDelta) -> Snapshot:
+    snapshot: Snapshot = dict(base) if base is not None else {}
+    for change in delta.changed:
+        old_x, old_y = snapshot.get(change.entity_id, (0, 0))
+        snapshot[change.entity_id] = (
+            change.x if change.mask & FIELD_X else old_x,
+            change.y if change.mask & FIELD_Y else old_y,
+        )
+    for entity_id in delta.removed:
+        snapshot.pop(entity_id, None)
+    return snapshot
+
+
+class SnapshotHistory:
+    """The last few snapshots sent to (or received from) one peer, keyed by tick."""
+
+    def __init__(self, size: int = HISTORY_SIZE) -> None:
+        self.size: int = size
+        self._snapshots: dict[int, Snapshot] = {}
+
+    def add(self, tick: int, snapshot: Snapshot) -> None:
+        self._snapshots[tick] = snapshot
+        # Dicts keep insertion order and ticks only go up, so the first key is the oldest
+        while len(self._snapshots) > self.size:
+            del self._snapshots[next(iter(self._snapshots))]
+
+    def get(self, tick: int | None) -> Snapshot | None:
+        if tick is None:
+            return None
+        return self._snapshots.get(tick)
+
+    def clear(self) -> None:
+        self._snapshots.clear()
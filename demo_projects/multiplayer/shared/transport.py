@@ -0,0 +1,135 @@
+from __future__ import annotations
+import socket
+import struct
+import time
+import demo_projects.multiplayer.shared.packet as pck
+from demo_projects.multiplayer.shared.netstats import NetStats
+from demo_projects.multiplayer.shared.reliability import Connection
+
+Address = tuple[str, int]
+
+DEFAULT_PORT: int = 12345
+
+
+class UdpTransport:
+    """A non-blocking UDP socket which is drained once per game tick.
+
+    Datagrams wait in the kernel's receive buffer (sized by `recv_buffer_size`) until `poll` is
+    called, so there is no listener thread and no queue handoff. At most `max_datagrams_per_tick`
+    are read each poll so a flood of packets can't stall a frame; the rest wait for the next one.
+
+    Sending only buffers the packet for its peer. Call `flush` once at the end of the tick to send
+    everything buffered for each peer coalesced into as few datagrams as possible.
+
+    Each peer gets a `Connection`, which numbers datagrams, acks the peer's and resends lost
+    messages sent on a reliable channel. Peers nothing has been heard from in `connection_timeout`
+    seconds are forgotten, along with anything still waiting to be resent to them.
+
+    Everything sent and received is counted in `stats`.
+    """
+
+    connection_timeout: float = 10
+
+    def __init__(
+        self,
+        bind_address: Address = ("", 0),
+        max_datagrams_per_tick: int = 4096,
+        recv_buffer_size: int = 1024 * 1024,
+    ) -> None:
+        self.max_datagrams_per_tick: int = max_datagrams_per_tick
+        self.connection_reset: bool = False
+        self.closed: bool = False
+        self.connections: dict[Address, Connection] = {}
+        self._resolved: dict[Address, Address] = {}
+        self.stats = NetStats()
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, recv_buffer_size)
+        self.socket.bind(bind_address)
+        self.socket.setblocking(False)
+
+    @property
+    def address(self) -> Address:
+        return self.socket.getsockname()
+
+    def connection(self, address: Address) -> Connection:
+        connection: Connection | None = self.connections.get(address)
+        if connection is None:
+            connection = self.connections[address] = Connection(time.monotonic(), self.stats)
+        return connection
+
+    def resolve(self, address: Address) -> Address:
+        """The numeric address datagrams from `address` will arrive from, so that a peer given by
+        host name shares a connection with the replies it sends."""
+        resolved: Address | None = self._resolved.get(address)
+        if resolved is None:
+            resolved = self._resolved[address] = (socket.gethostbyname(address[0]), address[1])
+        return resolved
+
+    def send(self, packet: pck.Packet, address: Address) -> None:
+        self.stats.record_sent(packet)
+        self.connection(self.resolve(address)).send(packet)
+
+    def flush(self) -> None:
+        if self.closed:
+            self.connections.clear()
+            return
+        now: float = time.monotonic()
+        for address, connection in list(self.connections.items()):
+            if now - connection.last_received > self.connection_timeout:
+                del self.connections[address]
+                continue
+            for datagram in connection.write_datagrams(now):
+                self.stats.record_datagram_sent(len(datagram))
+                try:
+                    self.socket.sendto(datagram, address)
+                except BlockingIOError:
+                    # The send buffer is full, which UDP is allowed to treat as packet loss
+                    pass
+                except ConnectionResetError:
+                    self.connection_reset = True
+
+    def poll(self) -> list[tuple[pck.Packet, Address]]:
+        received: list[tuple[pck.Packet, Address]] = []
+        if self.closed:
+            return received
+        depth: int = 0
+        for _ in range(self.max_datagrams_per_tick):
+            try:
+                data, address = self.socket.recvfrom(2048)
+            except BlockingIOError:
+                break
+            except ConnectionResetError:
+                # Windows reports an ICMP port unreachable from a previous send this way
+                self.connection_reset = True
+                continue
+            depth += 1
+            self.stats.record_datagram_received(len(data))
+
+            try:
+                packets = self.connection(address).read_datagram(data, time.monotonic())
+            except (ValueError, IndexError, struct.error):
+                # Malformed or unknown packet, drop the whole datagram
+                continue
+            for packet in packets:
+                self.stats.record_received(packet)
+                received.append((packet, address))
+        self.stats.queue_depth.add(depth)
+        return received
+
+    def flush_until_acked(self, timeout: float) -> None:
+        """Keep flushing, and polling for acks, until every reliable message sent has been acked or
+        `timeout` seconds have passed. Anything else received meanwhile is dropped, so this is only
+        for shutting down."""
+        deadline: float = time.monotonic() + timeout
+        self.flush()
+        while any(connection.unacked for connection in self.connections.values()):
+            if self.connection_reset or time.monotonic() >= deadline:
+                return
+            time.sleep(0.01)
+            self.poll()
+            self.flush()
+
+    def close(self) -> None:
+        self.closed = True
+        self.socket.close()
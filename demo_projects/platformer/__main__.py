@@ -4,6 +4,8 @@ from typing import Any
 
 
 class Floor(aj.GameObject):
+    merge_tiles: bool = True
+
     def __init__(self, x: float, y: float, *args, **kwargs) -> None:
         super().__init__(x, y, *args, **kwargs)
         self.collision_mask = aj.CollisionMask(
@@ -287,6 +289,9 @@ coins_collected: set[str] = set()
 aj.set_rooms(levels)
 aj.register_objects(Floor, Player, Camera, Enemy, Coin, Doorway)
 
+# Keep every level as it was left, so walking back through a doorway doesn't build it again
+aj.room_set_cache_size(len(levels))
+
 aj.room_set_caption("Platformer")
 aspect_ratio: float = levels[0].level_size[0] / levels[0].level_size[1]
 aj.window_set_size(960, int(960 / aspect_ratio))
@@ -3,12 +3,18 @@ from pathlib import Path
 
 GRID_SIZE = 32
 
+# Walls never move, so they go on a static collision layer which is indexed by position
+LAYER_WALLS: int = 2
+aj.collision_layer_set_static(LAYER_WALLS)
+
 
 class Wall(aj.GameObject):
+    merge_tiles: bool = True
+
     def __init__(self, x: float, y: float, *args, **kwargs) -> None:
         super().__init__(x, y, *args, **kwargs)
         self.collision_mask = aj.CollisionMask(
-            bbleft=0, bbtop=0, bbright=self.width, bbbottom=self.height
+            bbleft=0, bbtop=0, bbright=self.width, bbbottom=self.height, layer=LAYER_WALLS
         )
 
 
@@ -75,7 +81,7 @@ class Player(aj.GameObject):
                     self.target_grid_y = to_door_grid_y + self.last_y_direction + tiles_to_door_down
 
         if not self.place_meeting(
-            self.target_grid_x * GRID_SIZE, self.target_grid_y * GRID_SIZE, Wall
+            self.target_grid_x * GRID_SIZE, self.target_grid_y * GRID_SIZE, LAYER_WALLS
         ):
             self.grid_x = self.target_grid_x
             self.grid_y = self.target_grid_y
@@ -109,6 +115,9 @@ rooms: list[aj.GameLevel] = aj.load_ldtk_levels(project_dir / "rooms" / "rooms"
 aj.set_rooms(rooms)
 aj.register_objects(Wall, Doorway, Player)
 
+# Keep every room as it was left, so walking back through a doorway doesn't build it again
+aj.room_set_cache_size(len(rooms))
+
 sprites: dict[str, aj.GameSprite] = aj.load_aseprite_sprites(project_dir / "sprites")
 
 aj.room_set_caption("Roguelike")
@@ -4,6 +4,16 @@ import random
 PADDING: int = 64
 level: int = 1
 
+EXPLOSION = aj.ParticleType(
+    size=4,
+    colors=[aj.c_white, aj.c_yellow, aj.c_orange, aj.c_purple],
+    alpha=(1, 0),
+    life=(0.3, 0.8),
+    speed=(40, 200),
+    friction=2,
+)
+explosions: aj.ParticleSystem
+
 
 class Player(aj.GameObject):
     width = 32
@@ -113,6 +123,7 @@ class Bullet(aj.GameObject):
         elif not self.hurts_player and (enemy := self.place_meeting(self.x, self.y, Enemy)):
             aj.instance_destroy(self)
             aj.instance_destroy(enemy)
+            explosions.burst(enemy.x + Enemy.width / 2, enemy.y + Enemy.height / 2, 60)
             if not aj.instance_exists(Enemy):
                 global level
                 level += 1
@@ -130,8 +141,10 @@ def spawn_wave(difficulty: int) -> None:
 
 
 def main() -> None:
+    global explosions
 
     Player()
+    explosions = aj.ParticleSystem(EXPLOSION, depth=-1)
 
     aj.register_objects(Player, Enemy, Bullet)
     spawn_wave(level)